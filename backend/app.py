@@ -1,10 +1,12 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, make_response, g
 from flask_cors import CORS
-import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
 from functools import wraps
+from collections import namedtuple
+from concurrent.futures import wait
+from urllib.parse import urlencode
 import time
 import os
 from dotenv import load_dotenv
@@ -15,7 +17,20 @@ load_dotenv()
 from routes.ai_routes import ai_bp
 from routes.news_routes import news_bp
 from routes.portfolio_routes import portfolio_bp
-from config import config
+from config import config, get_current_config
+from utils.cache import build_cache
+from utils.singleflight import SingleFlight
+from utils.market_client import market_client, is_upstream_failure
+from utils.rate_limit import rate_limiter, rate_limit_headers, rate_limit_error
+from utils.bulkhead import bulkheads, upstream_health, yahoo_bulkhead
+from utils.bar_store import bar_store
+from utils.covariance import covariance_cache
+from utils.optimizer import portfolio_optimizer
+from utils.news_ai import news_cache, news_flight
+from utils.llm_cache import llm_cache
+from utils.market_data import (
+    market_data, format_chart_data, CHART_FORMATS, BINARY_CONTENT_TYPE
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,9 +44,15 @@ app.register_blueprint(ai_bp)
 app.register_blueprint(news_bp)
 app.register_blueprint(portfolio_bp)
 
-# Cache for storing stock data (in production, use Redis or similar)
-stock_cache = {}
-cache_duration = 300  # 5 minutes
+# Active configuration for module-level services
+current_config = get_current_config()
+
+# Endpoint result cache: bounded in-process LRU, optionally backed by Redis
+stock_cache = build_cache(current_config)
+
+# Coalesce concurrent yfinance lookups for the same symbol onto one fetch
+stock_info_flight = SingleFlight('stock_info')
+history_flight = SingleFlight('history')
 
 # Load API keys from environment variables
 GROQ_API_KEY = os.getenv('GROQ_API_KEY')
@@ -53,24 +74,66 @@ def log_api_key_status():
 # Log API key status on startup
 log_api_key_status()
 
+@app.before_request
+def enforce_rate_limit():
+    """Charge the request to the client's token bucket and reject it with 429 when empty"""
+    if rate_limiter is None or request.method == 'OPTIONS':
+        return None
+    
+    client = rate_limiter.client_id(request.remote_addr, request.headers.get('X-Forwarded-For'))
+    decision = rate_limiter.check(client, request.path)
+    if decision is None or decision.allowed:
+        g.rate_limit = decision
+        return None
+    
+    logger.warning(f"Rate limited {client} on {request.path} ({decision.group})")
+    response = jsonify(rate_limit_error(decision))
+    response.headers.update(rate_limit_headers(decision))
+    return response, 429
+
+@app.after_request
+def add_rate_limit_headers(response):
+    """Tell clients how much of their bucket is left"""
+    decision = g.pop('rate_limit', None)
+    if decision is not None:
+        response.headers.update(rate_limit_headers(decision))
+    return response
+
+# Pre-serialized response body as stored in the cache
+CachedResponse = namedtuple('CachedResponse', ['body', 'status', 'content_type'])
+
+def make_cache_key(endpoint_name):
+    """Build a cache key from the normalized request path and sorted query params"""
+    path = request.path.rstrip('/').lower() or '/'
+    query = urlencode(sorted(request.args.items(multi=True)))
+    return f"{endpoint_name}:{path}?{query}"
+
 def cache_result(func):
-    """Decorator to cache API results"""
+    """Decorator to cache successful API responses as serialized bytes"""
     @wraps(func)
     def wrapper(*args, **kwargs):
-        cache_key = f"{func.__name__}_{str(args)}_{str(kwargs)}"
-        current_time = time.time()
+        cache_key = make_cache_key(func.__name__)
+        fresh = {}
+        
+        def load():
+            # Only successful responses are stored, as pre-serialized bytes
+            response = make_response(func(*args, **kwargs))
+            fresh['response'] = response
+            if 200 <= response.status_code < 300 and not response.is_streamed:
+                return CachedResponse(response.get_data(), response.status_code, response.content_type)
+            return None
         
-        # Check if cached data is still valid
-        if cache_key in stock_cache:
-            cached_data, timestamp = stock_cache[cache_key]
-            if current_time - timestamp < cache_duration:
-                logger.info(f"Returning cached data for {cache_key}")
-                return cached_data
+        cached = stock_cache.get_or_load(cache_key, load)
+        if 'response' in fresh:
+            fresh['response'].headers['X-Cache'] = 'MISS'
+            return fresh['response']
         
-        # Get fresh data
-        result = func(*args, **kwargs)
-        stock_cache[cache_key] = (result, current_time)
-        return result
+        # Serve cached bytes directly without re-running the view
+        logger.info(f"Returning cached data for {cache_key}")
+        cached = CachedResponse(*cached)
+        response = app.response_class(cached.body, status=cached.status, content_type=cached.content_type)
+        response.headers['X-Cache'] = 'HIT'
+        return response
     
     return wrapper
 
@@ -92,9 +155,15 @@ def format_number(num):
 
 def get_stock_info(symbol):
     """Get comprehensive stock information"""
+    stock_data = stock_info_flight.do(symbol.upper(), lambda: fetch_stock_info(symbol))
+    # Callers may annotate the result, so never hand out the shared dict
+    return dict(stock_data) if stock_data else None
+
+def fetch_stock_info(symbol):
+    """Fetch stock information from yfinance, falling back to the last good response while Yahoo is down"""
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        info = yahoo_bulkhead.call(lambda: market_client.info(symbol), key=('info', symbol.upper()),
+                                   is_failure=is_upstream_failure)
         
         # Get current price and change
         current_price = info.get('currentPrice') or info.get('regularMarketPrice')
@@ -144,40 +213,29 @@ def get_stock_info(symbol):
         logger.error(f"Error fetching stock info for {symbol}: {str(e)}")
         return None
 
-def get_historical_data(symbol, period='1y', interval='1d'):
+def get_historical_data(symbol, period='1y', interval='1d', fmt='records'):
     """Get historical price data for charts"""
+    history = history_flight.do(
+        (symbol.upper(), period, interval),
+        lambda: fetch_historical_data(symbol, period, interval)
+    )
+    return format_chart_data(history, interval, fmt)
+
+def fetch_historical_data(symbol, period='1y', interval='1d'):
+    """Fetch historical OHLCV bars, preferring the local bar store"""
     try:
-        ticker = yf.Ticker(symbol)
-        history = ticker.history(period=period, interval=interval)
-        
-        if history.empty:
-            return []
-        
-        # Convert to list of dictionaries
-        chart_data = []
-        for index, row in history.iterrows():
-            # Handle different date formats for intraday vs daily data
-            if interval in ['1m', '2m', '5m', '15m', '30m', '60m', '90m']:
-                # Intraday data - include time
-                date_str = index.strftime('%Y-%m-%d %H:%M:%S')
-            else:
-                # Daily data - just date
-                date_str = index.strftime('%Y-%m-%d')
-            
-            chart_data.append({
-                'date': date_str,
-                'price': round(row['Close'], 2),
-                'volume': int(row['Volume']),
-                'open': round(row['Open'], 2),
-                'high': round(row['High'], 2),
-                'low': round(row['Low'], 2)
-            })
+        if bar_store is not None:
+            return bar_store.get_history(symbol, period, interval)
         
-        return chart_data
+        return yahoo_bulkhead.call(
+            lambda: market_client.history(symbol, period=period, interval=interval, raise_errors=True),
+            key=('history', symbol.upper(), period, interval),
+            is_failure=is_upstream_failure
+        )
     
     except Exception as e:
         logger.error(f"Error fetching historical data for {symbol}: {str(e)}")
-        return []
+        return pd.DataFrame()
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -188,9 +246,11 @@ def health_check():
     
     # Get API status
     api_status = current_config.get_api_status()
+    upstreams = upstream_health()
     
     return jsonify({
-        'status': 'healthy',
+        # Still serving (possibly stale data) while an upstream's circuit is open
+        'status': 'degraded' if any(u['state'] != 'closed' for u in upstreams.values()) else 'healthy',
         'timestamp': datetime.now().isoformat(),
         'service': 'Stock Comparison API',
         'environment': env,
@@ -199,7 +259,26 @@ def health_check():
             'ai_analysis': api_status['ai_analysis_available'],
             'stock_data': True,  # YFinance is always available
             'portfolio_analysis': True
-        }
+        },
+        'upstreams': upstreams
+    })
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Get endpoint cache statistics"""
+    return jsonify({
+        'stock_cache': stock_cache.stats(),
+        'single_flight': [stock_info_flight.stats(), history_flight.stats()],
+        'market_data': market_data.stats(),
+        'market_client': market_client.stats(),
+        'rate_limit': rate_limiter.stats() if rate_limiter is not None else None,
+        'bulkheads': {name: bulkhead.stats() for name, bulkhead in bulkheads.items()},
+        'bar_store': bar_store.stats() if bar_store is not None else None,
+        'covariance': covariance_cache.stats(),
+        'optimizer': portfolio_optimizer.stats(),
+        'news': {'cache': news_cache.stats(), 'single_flight': news_flight.stats()},
+        'llm': llm_cache.stats() if llm_cache is not None else None,
+        'timestamp': datetime.now().isoformat()
     })
 
 @app.route('/api/stock/info/<symbol>', methods=['GET'])
@@ -224,9 +303,16 @@ def get_stock_history_endpoint(symbol):
     try:
         period = request.args.get('period', '1y')
         interval = request.args.get('interval', '1d')
+        fmt = request.args.get('format', 'records')
+        
+        if fmt not in CHART_FORMATS:
+            return jsonify({'error': f"format must be one of {', '.join(CHART_FORMATS)}"}), 400
         
-        chart_data = get_historical_data(symbol, period, interval)
-        return jsonify({'data': chart_data})
+        chart_data = get_historical_data(symbol, period, interval, fmt)
+        if fmt == 'binary':
+            return app.response_class(chart_data, content_type=BINARY_CONTENT_TYPE)
+        
+        return jsonify({'data': chart_data, 'format': fmt})
     
     except Exception as e:
         logger.error(f"Error in stock history endpoint: {str(e)}")
@@ -240,23 +326,40 @@ def compare_stocks():
         symbols = data.get('symbols', [])
         period = data.get('period', '1y')  # Default to 1 year
         interval = data.get('interval', '1d')  # Default to daily
+        fmt = data.get('format', 'records')  # 'records' or 'columnar' chartData
         
         if not symbols:
             return jsonify({'error': 'No symbols provided'}), 400
         
-        if len(symbols) > 5:  # Limit to 5 stocks for performance
-            return jsonify({'error': 'Maximum 5 stocks allowed'}), 400
+        max_symbols = current_config.MAX_STOCKS_COMPARE
+        if len(symbols) > max_symbols:
+            return jsonify({'error': f'Maximum {max_symbols} stocks allowed'}), 400
+        
+        if fmt not in ('records', 'columnar'):
+            return jsonify({'error': 'format must be records or columnar'}), 400
+        
+        symbols = [symbol.upper().strip() for symbol in symbols]
+        
+        # Fetch info and history for every symbol concurrently under one deadline
+        info_futures = [market_data.executor.submit(get_stock_info, symbol) for symbol in symbols]
+        history_futures = [
+            market_data.executor.submit(get_historical_data, symbol, period, interval, fmt)
+            for symbol in symbols
+        ]
+        _, pending = wait(info_futures + history_futures, timeout=current_config.YFINANCE_TIMEOUT)
+        for future in pending:
+            future.cancel()
         
+        # Assemble in request order
         results = []
-        for symbol in symbols:
-            symbol = symbol.upper().strip()
-            
-            # Get stock info
-            stock_info = get_stock_info(symbol)
+        for symbol, info_future, history_future in zip(symbols, info_futures, history_futures):
+            stock_info = info_future.result() if info_future.done() and not info_future.cancelled() else None
             if stock_info:
-                # Get historical data with the specified period and interval
-                chart_data = get_historical_data(symbol, period, interval)
-                stock_info['chartData'] = chart_data
+                if history_future.done() and not history_future.cancelled():
+                    stock_info['chartData'] = history_future.result()
+                else:
+                    logger.warning(f"Timed out fetching historical data for {symbol}")
+                    stock_info['chartData'] = format_chart_data(None, interval, fmt)
                 results.append(stock_info)
             else:
                 logger.warning(f"Could not fetch data for {symbol}")
@@ -334,8 +437,7 @@ def search_stocks():
 def get_financials(symbol):
     """Get detailed financial information"""
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        info = market_client.info(symbol)
         
         financials = {
             'symbol': symbol.upper(),
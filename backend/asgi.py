@@ -0,0 +1,425 @@
+"""
+ASGI entry point with asyncio-native handlers for the I/O-bound endpoints
+
+Stock, compare, portfolio performance and news analysis requests are
+served on the event loop: Yahoo chart data comes from one pooled httpx
+client with asyncio.gather fan-out, and news analyses await the shared
+stage pools instead of parking a request thread on them. Everything else
+(AI, optimizer, simulation, job status and events, ...) falls through to
+the Flask app, so both entry points expose the same API.
+
+Run with:
+    python run.py asgi
+    uvicorn asgi:application --workers 2
+"""
+
+import asyncio
+import logging
+import warnings
+from contextlib import asynccontextmanager
+from urllib.parse import urlencode
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Mount, Route
+
+from app import (
+    app as flask_app, stock_cache, current_config, get_stock_info, get_historical_data, CachedResponse
+)
+from routes.news_routes import (
+    get_news_agent, submit_job, is_truthy, add_analysis_metadata, combine_complete_analysis
+)
+from routes.portfolio_routes import calculate_portfolio_performance
+from utils.async_market_data import async_market_data
+from utils.backtest import timeframe_period, BENCHMARK_SYMBOL
+from utils.bar_store import bar_store
+from utils.jobs import QueueFullError
+from utils.market_data import format_chart_data, normalize_symbols, CHART_FORMATS, BINARY_CONTENT_TYPE
+from utils.news_ai import process_portfolio_input
+from utils.rate_limit import rate_limiter, rate_limit_headers, rate_limit_error
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        from starlette.middleware.wsgi import WSGIMiddleware
+
+logger = logging.getLogger(__name__)
+
+NEWS_UNAVAILABLE = 'News analysis service not available - GROQ_API_KEY_NEWS not configured'
+
+
+def json_response(data, status: int = 200, headers=None) -> Response:
+    """Serialize like Flask's jsonify so both entry points return identical bodies"""
+    return Response(flask_app.json.dumps(data) + '\n', status_code=status,
+                    media_type='application/json', headers=headers)
+
+
+async def read_json(request):
+    """Request body as JSON, or None if it is missing or malformed"""
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def make_cache_key(endpoint_name: str, request) -> str:
+    """Same key as app.make_cache_key, so Flask and ASGI share cached responses"""
+    path = request.url.path.rstrip('/').lower() or '/'
+    query = urlencode(sorted(request.query_params.multi_items()))
+    return f"{endpoint_name}:{path}?{query}"
+
+
+async def cached(endpoint_name: str, request, handler) -> Response:
+    """Serve a cached response, or await handler() and cache it if it succeeded"""
+    cache_key = make_cache_key(endpoint_name, request)
+    hit = stock_cache.get(cache_key)
+    if hit is not None:
+        hit = CachedResponse(*hit)
+        return Response(hit.body, status_code=hit.status, media_type=hit.content_type,
+                        headers={'X-Cache': 'HIT'})
+
+    response = await handler()
+    if 200 <= response.status_code < 300:
+        stock_cache.set(cache_key, CachedResponse(response.body, response.status_code,
+                                                  response.headers.get('content-type')))
+    response.headers['X-Cache'] = 'MISS'
+    return response
+
+
+def run_blocking(fn, *args):
+    """Run a blocking call on the event loop's default thread pool
+
+    Not on market_data.executor: calls such as calculate_portfolio_performance
+    fan out onto that pool and wait for it, so running them there too could
+    leave every worker blocked on tasks queued behind it.
+    """
+    return asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+async def load_chart_data(symbol: str, period: str, interval: str, fmt: str):
+    """Chart data from the async client, or from the local bar store when one is configured"""
+    if bar_store is not None:
+        return await run_blocking(get_historical_data, symbol, period, interval, fmt)
+    history = await async_market_data.history(symbol, period, interval)
+    return format_chart_data(history, interval, fmt)
+
+
+async def serve_stock_info(request, endpoint_name: str, not_found: str) -> Response:
+    symbol = request.path_params['symbol']
+
+    async def handler():
+        try:
+            # quoteSummary needs yfinance's cookie/crumb handshake, so it stays on the thread pool
+            stock_data = await run_blocking(get_stock_info, symbol)
+            if stock_data:
+                return json_response(stock_data)
+            return json_response({'error': f'{not_found} {symbol}'}, 404)
+
+        except Exception as e:
+            logger.error(f"Error in stock info endpoint: {str(e)}")
+            return json_response({'error': 'Internal server error'}, 500)
+
+    return await cached(endpoint_name, request, handler)
+
+
+async def stock_info(request):
+    """Get basic stock information"""
+    return await serve_stock_info(request, 'get_stock_info_endpoint', 'Could not fetch data for')
+
+
+async def stock_quote(request):
+    """Get real-time quote"""
+    return await serve_stock_info(request, 'get_quote', 'Could not fetch quote for')
+
+
+async def stock_history(request):
+    """Get historical data for charts"""
+    symbol = request.path_params['symbol']
+
+    async def handler():
+        try:
+            period = request.query_params.get('period', '1y')
+            interval = request.query_params.get('interval', '1d')
+            fmt = request.query_params.get('format', 'records')
+
+            if fmt not in CHART_FORMATS:
+                return json_response({'error': f"format must be one of {', '.join(CHART_FORMATS)}"}, 400)
+
+            chart_data = await load_chart_data(symbol, period, interval, fmt)
+            if fmt == 'binary':
+                return Response(chart_data, media_type=BINARY_CONTENT_TYPE)
+
+            return json_response({'data': chart_data, 'format': fmt})
+
+        except Exception as e:
+            logger.error(f"Error in stock history endpoint: {str(e)}")
+            return json_response({'error': 'Internal server error'}, 500)
+
+    return await cached('get_stock_history_endpoint', request, handler)
+
+
+async def compare_stocks(request):
+    """Compare multiple stocks"""
+    try:
+        data = await read_json(request) or {}
+        symbols = data.get('symbols', [])
+        period = data.get('period', '1y')
+        interval = data.get('interval', '1d')
+        fmt = data.get('format', 'records')
+
+        if not symbols:
+            return json_response({'error': 'No symbols provided'}, 400)
+
+        max_symbols = current_config.MAX_STOCKS_COMPARE
+        if len(symbols) > max_symbols:
+            return json_response({'error': f'Maximum {max_symbols} stocks allowed'}, 400)
+
+        if fmt not in ('records', 'columnar'):
+            return json_response({'error': 'format must be records or columnar'}, 400)
+
+        symbols = [symbol.upper().strip() for symbol in symbols]
+
+        # Fetch info and history for every symbol concurrently under one deadline
+        info_tasks = [asyncio.ensure_future(run_blocking(get_stock_info, symbol)) for symbol in symbols]
+        history_tasks = [asyncio.ensure_future(load_chart_data(symbol, period, interval, fmt)) for symbol in symbols]
+        _, pending = await asyncio.wait(info_tasks + history_tasks, timeout=current_config.YFINANCE_TIMEOUT)
+        for task in pending:
+            task.cancel()
+
+        # Assemble in request order
+        results = []
+        for symbol, info_task, history_task in zip(symbols, info_tasks, history_tasks):
+            stock_data = info_task.result() if info_task.done() and not info_task.cancelled() else None
+            if stock_data:
+                if history_task.done() and not history_task.cancelled() and history_task.exception() is None:
+                    stock_data['chartData'] = history_task.result()
+                else:
+                    logger.warning(f"Timed out fetching historical data for {symbol}")
+                    stock_data['chartData'] = format_chart_data(None, interval, fmt)
+                results.append(stock_data)
+            else:
+                logger.warning(f"Could not fetch data for {symbol}")
+
+        return json_response(results)
+
+    except Exception as e:
+        logger.error(f"Error in compare stocks endpoint: {str(e)}")
+        return json_response({'error': 'Internal server error'}, 500)
+
+
+async def portfolio_performance(request):
+    """Get portfolio performance with S&P 500 comparison"""
+    try:
+        data = await read_json(request)
+
+        if not data:
+            return json_response({'error': 'No data provided'}, 400)
+
+        holdings = data.get('holdings', [])
+        timeframe = data.get('timeframe', '1M')
+
+        if not holdings:
+            return json_response({'error': 'No holdings provided'}, 400)
+
+        if bar_store is not None:
+            performance = await run_blocking(calculate_portfolio_performance, holdings, timeframe)
+            return json_response(performance)
+
+        # Quotes and the close matrix (holdings plus benchmark) are fetched side by side
+        symbols = normalize_symbols(holding['symbol'] for holding in holdings)
+        quotes, closes = await asyncio.gather(
+            async_market_data.quotes(symbols),
+            async_market_data.close_matrix(symbols + [BENCHMARK_SYMBOL], timeframe_period(timeframe))
+        )
+        performance = calculate_portfolio_performance(
+            holdings, timeframe,
+            prices={symbol: quote['price'] for symbol, quote in quotes.items()},
+            metadata={symbol: {'name': quote['name']} for symbol, quote in quotes.items()},
+            closes=closes
+        )
+        return json_response(performance)
+
+    except Exception as e:
+        logger.error(f"Error calculating portfolio performance: {str(e)}")
+        return json_response({'error': 'Failed to calculate portfolio performance'}, 500)
+
+
+def enqueue_job(kind: str, run) -> Response:
+    """Queue run(progress) as a background job; status and events are served by the Flask routes"""
+    try:
+        job = submit_job(kind, run)
+    except QueueFullError as e:
+        logger.warning(f"Rejecting {kind} job: {str(e)}")
+        return json_response({'error': 'Analysis queue is full, try again shortly'}, 503,
+                             headers={'Retry-After': '30'})
+
+    status_url = f"/api/jobs/{job.id}"
+    return json_response({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url,
+        'events_url': f"{status_url}/events"
+    }, 202, headers={'Location': status_url})
+
+
+async def shared_news_agent():
+    # The first call builds the agent and its LLM client, so keep it off the loop
+    return await asyncio.get_running_loop().run_in_executor(None, get_news_agent)
+
+
+async def portfolio_news(request):
+    """Analyze news for stocks in the portfolio using CrewAI and Groq"""
+    try:
+        data = await read_json(request)
+
+        if not data:
+            return json_response({'error': 'No data provided'}, 400)
+
+        portfolio_data = data.get('portfolio_data', {})
+
+        if not portfolio_data:
+            return json_response({'error': 'Portfolio data is required'}, 400)
+
+        news_agent = await shared_news_agent()
+        if not news_agent:
+            return json_response({'error': NEWS_UNAVAILABLE}, 503)
+
+        if is_truthy(data.get('async', request.query_params.get('async', False))):
+            return enqueue_job('news-analysis', lambda progress: add_analysis_metadata(
+                news_agent.analyze_portfolio_news(portfolio_data, progress), 'portfolio_news'))
+
+        analysis_result = add_analysis_metadata(
+            await news_agent.analyze_portfolio_news_async(portfolio_data), 'portfolio_news')
+
+        if 'error' in analysis_result:
+            return json_response(analysis_result, 400)
+
+        return json_response(analysis_result)
+
+    except Exception as e:
+        logger.error(f"Error analyzing portfolio news: {str(e)}")
+        return json_response({'error': f'Failed to analyze portfolio news: {str(e)}'}, 500)
+
+
+async def stock_news(request):
+    """Get news analysis for a specific stock symbol"""
+    symbol = request.path_params['symbol']
+    try:
+        news_agent = await shared_news_agent()
+        if not news_agent:
+            return json_response({'error': NEWS_UNAVAILABLE}, 503)
+
+        analysis_result = await news_agent.analyze_portfolio_news_async({'stocks': [symbol.upper()]})
+
+        if 'error' in analysis_result:
+            return json_response(analysis_result, 400)
+
+        return json_response(add_analysis_metadata(analysis_result, 'single_stock_news', symbol=symbol.upper()))
+
+    except Exception as e:
+        logger.error(f"Error getting stock news for {symbol}: {str(e)}")
+        return json_response({'error': f'Failed to get stock news: {str(e)}'}, 500)
+
+
+async def complete_analysis(request):
+    """Complete portfolio analysis including input processing and news analysis"""
+    try:
+        data = await read_json(request)
+
+        if not data:
+            return json_response({'error': 'No data provided'}, 400)
+
+        portfolio_input = data.get('portfolio_input', '')
+
+        if not portfolio_input:
+            return json_response({'error': 'Portfolio input is required'}, 400)
+
+        processed_data = process_portfolio_input(portfolio_input)
+
+        if 'error' in processed_data:
+            return json_response(processed_data, 400)
+
+        news_agent = await shared_news_agent()
+        if is_truthy(data.get('async', request.query_params.get('async', False))):
+            return enqueue_job('complete-analysis', lambda progress: combine_complete_analysis(
+                processed_data, news_agent.analyze_portfolio_news(processed_data, progress) if news_agent else None))
+
+        news_analysis = await news_agent.analyze_portfolio_news_async(processed_data) if news_agent else None
+        return json_response(combine_complete_analysis(processed_data, news_analysis))
+
+    except Exception as e:
+        logger.error(f"Error in complete portfolio analysis: {str(e)}")
+        return json_response({'error': f'Failed to complete portfolio analysis: {str(e)}'}, 500)
+
+
+class RateLimitMiddleware:
+    """The Flask app's rate limit, for routes served on the event loop"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if rate_limiter is None or scope['type'] != 'http' or scope['method'] == 'OPTIONS':
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        client = rate_limiter.client_id(request.client.host if request.client else None,
+                                        request.headers.get('x-forwarded-for'))
+        if rate_limiter.backend == 'redis':
+            # The shared store is a network round trip; keep it off the loop
+            decision = await asyncio.get_running_loop().run_in_executor(
+                None, rate_limiter.check, client, scope['path'])
+        else:
+            decision = rate_limiter.check(client, scope['path'])
+        if decision is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = rate_limit_headers(decision)
+        if not decision.allowed:
+            logger.warning(f"Rate limited {client} on {scope['path']} ({decision.group})")
+            await json_response(rate_limit_error(decision), 429, headers=headers)(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                MutableHeaders(scope=message).update(headers)
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await async_market_data.aclose()
+
+
+# Same CORS policy and rate limit as the Flask app, whose hooks these routes bypass;
+# preflights fall through to Flask
+route_middleware = [
+    Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+    Middleware(RateLimitMiddleware)
+]
+
+routes = [
+    Route('/api/stock/info/{symbol}', stock_info, methods=['GET'], middleware=route_middleware),
+    Route('/api/stock/quote/{symbol}', stock_quote, methods=['GET'], middleware=route_middleware),
+    Route('/api/stock/history/{symbol}', stock_history, methods=['GET'], middleware=route_middleware),
+    Route('/api/stocks/compare', compare_stocks, methods=['POST'], middleware=route_middleware),
+    Route('/api/portfolio/performance', portfolio_performance, methods=['POST'], middleware=route_middleware),
+    Route('/api/portfolio/news-analysis', portfolio_news, methods=['POST'], middleware=route_middleware),
+    Route('/api/stocks/news/{symbol}', stock_news, methods=['GET'], middleware=route_middleware),
+    Route('/api/portfolio/complete-analysis', complete_analysis, methods=['POST'], middleware=route_middleware),
+    # Everything else, including the job status and event stream routes
+    Mount('/', app=WSGIMiddleware(flask_app))
+]
+
+application = Starlette(routes=routes, lifespan=lifespan)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark chart-data conversion of a synthetic history frame
+
+Compares the old per-row iterrows() conversion with the columnar
+history_to_chart_data used by get_historical_data.
+
+Usage (from the backend directory):
+    python benchmarks/bench_history.py [rows]
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.market_data import history_to_chart_data, INTRADAY_INTERVALS
+
+
+def make_history(rows: int) -> pd.DataFrame:
+    """Build a synthetic 1-minute OHLCV frame with a tz-aware index"""
+    rng = np.random.default_rng(42)
+    index = pd.date_range('2015-01-02 09:30', periods=rows, freq='min', tz='America/New_York')
+    close = 100 + rng.standard_normal(rows).cumsum()
+    return pd.DataFrame({
+        'Open': close + rng.standard_normal(rows) * 0.1,
+        'High': close + 0.5,
+        'Low': close - 0.5,
+        'Close': close,
+        'Volume': rng.integers(1_000, 1_000_000, rows).astype(float)
+    }, index=index)
+
+
+def iterrows_chart_data(history: pd.DataFrame, interval: str) -> list:
+    """The original row-by-row conversion, kept for comparison"""
+    chart_data = []
+    for index, row in history.iterrows():
+        if interval in INTRADAY_INTERVALS:
+            date_str = index.strftime('%Y-%m-%d %H:%M:%S')
+        else:
+            date_str = index.strftime('%Y-%m-%d')
+        chart_data.append({
+            'date': date_str,
+            'price': round(row['Close'], 2),
+            'volume': int(row['Volume']),
+            'open': round(row['Open'], 2),
+            'high': round(row['High'], 2),
+            'low': round(row['Low'], 2)
+        })
+    return chart_data
+
+
+def best_of(func, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    history = make_history(rows)
+
+    for interval in ('1m', '1d'):
+        legacy = iterrows_chart_data(history, interval)
+        columnar = history_to_chart_data(history, interval)
+        assert legacy == columnar
+
+        legacy_time = best_of(lambda: iterrows_chart_data(history, interval), repeat=1)
+        columnar_time = best_of(lambda: history_to_chart_data(history, interval))
+        print(f"{rows} rows, interval={interval}: "
+              f"iterrows {legacy_time * 1000:.0f} ms, columnar {columnar_time * 1000:.0f} ms, "
+              f"speedup {legacy_time / columnar_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
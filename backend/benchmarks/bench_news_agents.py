@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request setup cost of the news analysis pipeline
+
+Compares three ways of setting up one request's stage crews:
+
+- a new NewsAnalysisAgent (LLM client included) and two Agents per stage,
+  as get_news_agent() used to
+- the shared NewsAnalysisAgent building one Agent per stage from
+  AGENT_DEFINITIONS and its LLM client (what the routes do)
+- the shared NewsAnalysisAgent copying prebuilt Agents with Agent.copy()
+
+No LLM calls are made; set NEWS_LLM_MODEL to a provider that can be constructed
+offline (e.g. ollama/llama3) if the Groq provider is not installed.
+
+Usage (from the backend directory):
+    python benchmarks/bench_news_agents.py [requests]
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('GROQ_API_KEY_NEWS', 'benchmark-key')
+
+from crewai import Crew, Process
+
+from utils.news_ai import NewsAnalysisAgent, get_shared_news_agent
+
+SYMBOLS = ['AAPL']
+NEWS_DATA = {'stocks': [{'symbol': 'AAPL', 'news_summary': 'Benchmark summary'}]}
+
+
+def build_crews(agent: NewsAnalysisAgent, agents_per_stage: int, prebuilt: list = None) -> list:
+    """Build the three stage crews the way one request does"""
+    creators = (agent.create_news_agent, agent.create_sentiment_analysis_agent, agent.create_headline_agent)
+    if prebuilt is not None:
+        creators = tuple(built.copy for built in prebuilt)
+    stages = zip(creators, (
+        lambda built: agent.create_news_analysis_task(SYMBOLS, built),
+        lambda built: agent.create_sentiment_analysis_task(NEWS_DATA, built),
+        lambda built: agent.create_headline_generation_task(NEWS_DATA, built)
+    ))
+    crews = []
+    for create_agent, create_task in stages:
+        # The old code built one Agent for the crew and another inside create_*_task
+        crew_agent = create_agent()
+        task = create_task(create_agent() if agents_per_stage > 1 else crew_agent)
+        crews.append(Crew(agents=[crew_agent], tasks=[task], verbose=False, process=Process.sequential))
+    return crews
+
+
+def measure(label: str, fn, repeat: int) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    keep = [fn() for _ in range(repeat)]
+    elapsed = (time.perf_counter() - started) / repeat
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} {elapsed * 1000:9.2f} ms {current / repeat / 1024:10.1f} KiB retained "
+          f"{peak / 1024:10.1f} KiB peak")
+    del keep
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    shared = get_shared_news_agent()
+    startup = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{'startup (shared agent)':<32} {startup * 1000:9.2f} ms {current / 1024:10.1f} KiB retained "
+          f"{peak / 1024:10.1f} KiB peak")
+
+    # Warm imports and lazy provider state before comparing steady-state requests
+    build_crews(shared, 1)
+    measure('per request, new agent', lambda: build_crews(NewsAnalysisAgent(), 2), repeat)
+    measure('per request, shared agent', lambda: build_crews(shared, 1), repeat)
+    prebuilt = [shared.create_news_agent(), shared.create_sentiment_analysis_agent(), shared.create_headline_agent()]
+    measure('per request, Agent.copy()', lambda: build_crews(shared, 1, prebuilt), repeat)
+
+
+if __name__ == '__main__':
+    main()
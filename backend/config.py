@@ -15,16 +15,61 @@ class Config:
     
     # Cache Configuration
     CACHE_DURATION = int(os.environ.get('CACHE_DURATION', 300))  # 5 minutes
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 2048))
+    CACHE_MAX_BYTES = int(os.environ.get('CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 64 MB
     REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')  # 'memory' or 'redis'
+    CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'finanalytica:')
+    CACHE_L1_DURATION = int(os.environ.get('CACHE_L1_DURATION', 30))  # seconds, when Redis is enabled
+    CACHE_LOCK_TIMEOUT = int(os.environ.get('CACHE_LOCK_TIMEOUT', 10))  # seconds
     
     # Rate Limiting
     RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
-    RATE_LIMIT_REQUESTS = int(os.environ.get('RATE_LIMIT_REQUESTS', 100))  # requests per hour
+    RATE_LIMIT_REQUESTS = int(os.environ.get('RATE_LIMIT_REQUESTS', 600))  # requests per hour
     RATE_LIMIT_WINDOW = int(os.environ.get('RATE_LIMIT_WINDOW', 3600))  # 1 hour
+    RATE_LIMIT_LLM_COST = int(os.environ.get('RATE_LIMIT_LLM_COST', 60))  # tokens per news/AI analysis
+    RATE_LIMIT_COMPUTE_COST = int(os.environ.get('RATE_LIMIT_COMPUTE_COST', 30))  # tokens per simulate/optimize
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')  # 'memory' or 'redis' (shared by workers)
+    RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', 'False').lower() == 'true'  # use X-Forwarded-For
     
     # YFinance Configuration
-    YFINANCE_TIMEOUT = int(os.environ.get('YFINANCE_TIMEOUT', 10))  # seconds
+    YFINANCE_TIMEOUT = int(os.environ.get('YFINANCE_TIMEOUT', 10))  # seconds, retries included
+    YFINANCE_RETRIES = int(os.environ.get('YFINANCE_RETRIES', 2))  # extra attempts on transient errors
+    YFINANCE_BACKOFF = float(os.environ.get('YFINANCE_BACKOFF', 0.25))  # base of the jittered backoff, seconds
+    YFINANCE_BACKOFF_MAX = float(os.environ.get('YFINANCE_BACKOFF_MAX', 2.0))  # longest single backoff, seconds
+    YFINANCE_MAX_CONNECTIONS = int(os.environ.get('YFINANCE_MAX_CONNECTIONS', 32))  # pooled connections per host
     MAX_STOCKS_COMPARE = int(os.environ.get('MAX_STOCKS_COMPARE', 5))
+    MARKET_DATA_WORKERS = int(os.environ.get('MARKET_DATA_WORKERS', 16))  # concurrent upstream fetches
+    METADATA_CACHE_DURATION = int(os.environ.get('METADATA_CACHE_DURATION', 86400))  # name/sector, 1 day
+    # Pooled async client used by the ASGI app (python run.py asgi)
+    ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get('ASYNC_HTTP_MAX_CONNECTIONS', 200))  # in flight per worker
+    ASYNC_HTTP_MAX_KEEPALIVE = int(os.environ.get('ASYNC_HTTP_MAX_KEEPALIVE', 50))  # idle connections kept open
+    # Upstream bulkheads and circuit breakers (Yahoo Finance, LLM provider)
+    BULKHEAD_YAHOO_MAX_CONCURRENT = int(os.environ.get('BULKHEAD_YAHOO_MAX_CONCURRENT', 16))  # Yahoo calls in flight
+    BULKHEAD_YAHOO_QUEUE_TIMEOUT = float(os.environ.get('BULKHEAD_YAHOO_QUEUE_TIMEOUT', 2))  # seconds to wait for a slot
+    BULKHEAD_LLM_MAX_CONCURRENT = int(os.environ.get('BULKHEAD_LLM_MAX_CONCURRENT', 4))  # LLM calls in flight
+    BULKHEAD_LLM_QUEUE_TIMEOUT = float(os.environ.get('BULKHEAD_LLM_QUEUE_TIMEOUT', 30))  # seconds to wait for a slot
+    BULKHEAD_STALE_DURATION = int(os.environ.get('BULKHEAD_STALE_DURATION', 86400))  # last good result kept, 1 day
+    BREAKER_WINDOW = int(os.environ.get('BREAKER_WINDOW', 60))  # seconds of outcomes considered
+    BREAKER_MIN_CALLS = int(os.environ.get('BREAKER_MIN_CALLS', 10))  # calls in the window before it can trip
+    BREAKER_ERROR_RATE = float(os.environ.get('BREAKER_ERROR_RATE', 0.5))  # failed share that opens the circuit
+    BREAKER_SLOW_CALL_RATE = float(os.environ.get('BREAKER_SLOW_CALL_RATE', 0.5))  # slow share that opens it
+    BREAKER_YAHOO_SLOW_SECONDS = float(os.environ.get('BREAKER_YAHOO_SLOW_SECONDS', 8))  # a slow Yahoo call
+    BREAKER_LLM_SLOW_SECONDS = float(os.environ.get('BREAKER_LLM_SLOW_SECONDS', 60))  # a slow LLM call
+    BREAKER_OPEN_SECONDS = int(os.environ.get('BREAKER_OPEN_SECONDS', 30))  # cool-down before a probe call
+    
+    # Production server (python run.py serve, or python run.py asgi)
+    SERVER_HOST = os.environ.get('SERVER_HOST', '0.0.0.0')
+    SERVER_PORT = int(os.environ.get('PORT', 5000))
+    # Background jobs live in the worker that accepted them, so more than one
+    # worker needs sticky routing for job polls and event streams
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 1))
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 8))  # per worker; LLM and Yahoo calls mostly wait
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 180))  # seconds before a silent worker is restarted
+    SERVER_GRACEFUL_TIMEOUT = int(os.environ.get('SERVER_GRACEFUL_TIMEOUT', 30))  # drain time on SIGTERM
+    SERVER_KEEPALIVE = int(os.environ.get('SERVER_KEEPALIVE', 5))
+    SERVER_MAX_REQUESTS = int(os.environ.get('SERVER_MAX_REQUESTS', 0))  # recycle workers; 0 disables
+    SERVER_MAX_REQUESTS_JITTER = int(os.environ.get('SERVER_MAX_REQUESTS_JITTER', 0))
     
     # Logging Configuration
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -33,9 +78,24 @@ class Config:
     # CORS Configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
     
-    # Database Configuration (for future use)
+    # Database Configuration
+    # Relative sqlite:/// paths resolve against DATA_DIR (default: the backend directory),
+    # not the working directory the server happens to be started from
+    DATA_DIR = os.environ.get('DATA_DIR', os.path.dirname(os.path.abspath(__file__)))
     DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///stocks.db')
     
+    # Local OHLCV bar store (SQLite at DATABASE_URL)
+    BAR_STORE_ENABLED = os.environ.get('BAR_STORE_ENABLED', 'True').lower() == 'true'
+    BAR_STORE_INTRADAY_RETENTION_DAYS = int(os.environ.get('BAR_STORE_INTRADAY_RETENTION_DAYS', 60))
+    BAR_STORE_COMPACT_EVERY = int(os.environ.get('BAR_STORE_COMPACT_EVERY', 500))  # intraday writes between prunes, 0 = never
+
+    # Monte Carlo portfolio simulation
+    SIMULATION_WORKERS = int(os.environ.get('SIMULATION_WORKERS', os.cpu_count() or 1))  # worker processes
+    SIMULATION_MEMORY_MB = int(os.environ.get('SIMULATION_MEMORY_MB', 64))  # kept value paths, and each chunk of random draws
+    SIMULATION_DEFAULT_PATHS = int(os.environ.get('SIMULATION_DEFAULT_PATHS', 10000))
+    SIMULATION_MAX_PATHS = int(os.environ.get('SIMULATION_MAX_PATHS', 100000))  # fewer for long horizons, see SIMULATION_MEMORY_MB
+    SIMULATION_MAX_YEARS = int(os.environ.get('SIMULATION_MAX_YEARS', 50))
+    
     # Security Configuration
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-key-change-in-production'
     JWT_ACCESS_TOKEN_EXPIRES = int(os.environ.get('JWT_ACCESS_TOKEN_EXPIRES', 3600))  # 1 hour
@@ -43,6 +103,31 @@ class Config:
     # AI Configuration
     GROQ_API_KEY = os.environ.get('GROQ_API_KEY')
     CREWAI_VERBOSE = os.environ.get('CREWAI_VERBOSE', 'False').lower() == 'true'
+    NEWS_LLM_MODEL = os.environ.get('NEWS_LLM_MODEL', 'groq/llama-3.3-70b-versatile')
+    NEWS_STAGE_TIMEOUT = int(os.environ.get('NEWS_STAGE_TIMEOUT', 90))  # seconds per crew stage
+    NEWS_STAGE_WORKERS = int(os.environ.get('NEWS_STAGE_WORKERS', 8))  # concurrent crew kickoffs
+    NEWS_SYMBOL_WORKERS = int(os.environ.get('NEWS_SYMBOL_WORKERS', 4))  # symbols analyzed at once
+    NEWS_CACHE_DURATION = int(os.environ.get('NEWS_CACHE_DURATION', 1800))  # per-symbol analysis, 30 minutes
+
+    # Persistent LLM response cache (SQLite), keyed by model, temperature and prompt
+    LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'True').lower() == 'true'
+    LLM_CACHE_URL = os.environ.get('LLM_CACHE_URL', 'sqlite:///llm_cache.db')
+    LLM_CACHE_DURATION = int(os.environ.get('LLM_CACHE_DURATION', 600))  # 10 minutes
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 5000))
+    LLM_CACHE_MAX_BYTES = int(os.environ.get('LLM_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # 64 MB
+
+    # Background analysis jobs (async=true on the news analysis endpoints)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 4))  # analyses running at once per process
+    JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 100))  # queued or running before 503
+    JOB_RETENTION = int(os.environ.get('JOB_RETENTION', 3600))  # seconds finished jobs stay pollable
+    JOB_EVENT_HEARTBEAT = int(os.environ.get('JOB_EVENT_HEARTBEAT', 15))  # seconds between SSE keep-alives
+
+    # Raw AI response traces served by /api/ai/debug-files
+    AI_TRACE_CAPACITY = int(os.environ.get('AI_TRACE_CAPACITY', 200))  # traces kept in memory
+    AI_TRACE_SAMPLE_RATE = float(os.environ.get('AI_TRACE_SAMPLE_RATE', 1.0))  # fraction of responses kept
+    AI_TRACE_LOG_PATH = os.environ.get('AI_TRACE_LOG_PATH', '')  # JSON-lines log, rotated into .gz; empty disables
+    AI_TRACE_LOG_MAX_BYTES = int(os.environ.get('AI_TRACE_LOG_MAX_BYTES', 10 * 1024 * 1024))  # 10 MB
+    AI_TRACE_LOG_BACKUPS = int(os.environ.get('AI_TRACE_LOG_BACKUPS', 5))
 
 
 
@@ -88,6 +173,10 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     CACHE_DURATION = 0  # No caching for tests
+    BAR_STORE_ENABLED = False
+    SIMULATION_WORKERS = 1
+    LLM_CACHE_ENABLED = False
+    RATE_LIMIT_ENABLED = False
 
 # Configuration dictionary
 config = {
@@ -95,4 +184,8 @@ config = {
     'production': ProductionConfig,
     'testing': TestingConfig,
     'default': DevelopmentConfig
-} 
\ No newline at end of file
+}
+
+def get_current_config():
+    """Get the configuration class for the active FLASK_ENV"""
+    return config.get(os.environ.get('FLASK_ENV', 'development'), config['default'])
@@ -10,6 +10,8 @@ from typing import Dict, Any
 import json
 
 from utils.ai_agents import create_simple_stock_analysis
+from utils.llm_cache import llm_cache
+from utils.trace_sink import trace_sink
 
 logger = logging.getLogger(__name__)
 ai_bp = Blueprint('ai', __name__)
@@ -111,13 +113,29 @@ def get_ai_status():
 def ai_cache_stats_route():
     """Get AI cache statistics"""
     try:
-        stats = {
-            'cache_enabled': False,
-            'cache_size': 0,
-            'cache_hits': 0,
-            'cache_misses': 0,
-            'timestamp': datetime.now().isoformat()
-        }
+        if llm_cache is None:
+            stats = {
+                'cache_enabled': False,
+                'cache_size': 0,
+                'cache_hits': 0,
+                'cache_misses': 0
+            }
+        else:
+            details = llm_cache.stats()
+            stats = {
+                'cache_enabled': True,
+                'cache_size': details['entries'],
+                'cache_bytes': details['bytes'],
+                'cache_hits': details['hits'],
+                'cache_misses': details['misses'],
+                'hit_rate': details['hit_rate'],
+                'evictions': details['evictions'],
+                'ttl': details['ttl'],
+                'max_entries': details['max_entries'],
+                'max_bytes': details['max_bytes'],
+                'coalesced': details['single_flight']['coalesced']
+            }
+        stats['timestamp'] = datetime.now().isoformat()
         
         return jsonify(stats)
         
@@ -129,8 +147,13 @@ def ai_cache_stats_route():
 def ai_clear_cache_route():
     """Clear AI analysis cache"""
     try:
+        if llm_cache is None:
+            return jsonify({'error': 'AI response cache is disabled'}), 400
+
+        removed = llm_cache.clear()
         result = {
             'message': 'Cache cleared successfully',
+            'entries_removed': removed,
             'timestamp': datetime.now().isoformat()
         }
         
@@ -142,10 +165,11 @@ def ai_clear_cache_route():
 
 @ai_bp.route('/api/ai/debug-files', methods=['GET'])
 def ai_debug_files_route():
-    """Get list of debug files"""
+    """Get list of debug files (recent raw AI responses, newest first)"""
     try:
         files = {
-            'debug_files': [],
+            'debug_files': trace_sink.list(),
+            'stats': trace_sink.stats(),
             'timestamp': datetime.now().isoformat()
         }
         
@@ -159,11 +183,14 @@ def ai_debug_files_route():
 def ai_debug_file_content_route(filename):
     """Get content of a specific debug file"""
     try:
-        content = {
-            'filename': filename,
-            'content': 'Debug file not found',
-            'timestamp': datetime.now().isoformat()
-        }
+        trace = trace_sink.get(filename)
+        if trace is None and trace_sink.flush(timeout=1):
+            # The trace may still be waiting on the writer thread
+            trace = trace_sink.get(filename)
+        if trace is None:
+            return jsonify({'error': f'Debug file {filename} not found or no longer buffered'}), 404
+        
+        content = dict(trace, filename=filename, timestamp=datetime.now().isoformat(), created=trace['timestamp'])
         
         return jsonify(content)
         
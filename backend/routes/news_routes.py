@@ -2,27 +2,73 @@
 News Analysis Routes using CrewAI Framework
 """
 
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, stream_with_context, url_for
 import logging
 import os
 from datetime import datetime
 from typing import Dict, Any
 import json
 
-from utils.news_ai import NewsAnalysisAgent, process_portfolio_input
+from utils.news_ai import get_shared_news_agent, process_portfolio_input
+from utils.jobs import job_queue, follow_events, QueueFullError
+from config import get_current_config
 
 logger = logging.getLogger(__name__)
 news_bp = Blueprint('news', __name__)
 
-# Initialize the news analysis agent
+current_config = get_current_config()
+
+# The news analysis agent is created once and shared by all requests
 def get_news_agent():
-    """Get or create the news analysis agent"""
+    """Get the shared news analysis agent"""
     groq_api_key = os.getenv('GROQ_API_KEY_NEWS')
     if not groq_api_key:
         logger.error("GROQ_API_KEY_NEWS not configured")
         return None
     
-    return NewsAnalysisAgent(groq_api_key)
+    try:
+        return get_shared_news_agent(groq_api_key)
+    except Exception as e:
+        logger.error(f"Error creating news analysis agent: {str(e)}")
+        return None
+
+def wants_async(data: Dict[str, Any]) -> bool:
+    """Whether the client asked for a background job instead of a blocking response"""
+    return is_truthy(data.get('async', request.args.get('async', False)))
+
+def is_truthy(flag) -> bool:
+    """Interpret a JSON or query-string flag"""
+    return flag is True or str(flag).lower() in ('1', 'true', 'yes')
+
+def submit_job(kind: str, run):
+    """Queue run(progress) on the job queue; raises QueueFullError when it is full"""
+    def job_fn(job):
+        result = run(lambda stage: job.emit('stage', stage))
+        if 'error' in result:
+            raise RuntimeError(result['error'])
+        return result
+    
+    return job_queue.submit(kind, job_fn)
+
+def enqueue_job(kind: str, run):
+    """Queue run(progress) as a background job and answer 202 with where to follow it"""
+    try:
+        job = submit_job(kind, run)
+    except QueueFullError as e:
+        logger.warning(f"Rejecting {kind} job: {str(e)}")
+        response = jsonify({'error': 'Analysis queue is full, try again shortly'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    status_url = url_for('news.get_job_route', job_id=job.id)
+    response = jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': status_url,
+        'events_url': url_for('news.job_events_route', job_id=job.id)
+    })
+    response.headers['Location'] = status_url
+    return response, 202
 
 @news_bp.route('/api/portfolio/process-input', methods=['POST'])
 def process_portfolio_input_route():
@@ -75,22 +121,34 @@ def analyze_portfolio_news_route():
         if not news_agent:
             return jsonify({'error': 'News analysis service not available - GROQ_API_KEY_NEWS not configured'}), 503
         
+        if wants_async(data):
+            return enqueue_job('news-analysis', lambda progress: run_news_analysis(news_agent, portfolio_data, progress))
+        
         # Analyze news for the portfolio
-        analysis_result = news_agent.analyze_portfolio_news(portfolio_data)
+        analysis_result = run_news_analysis(news_agent, portfolio_data)
         
         if 'error' in analysis_result:
             return jsonify(analysis_result), 400
         
-        # Add metadata
-        analysis_result['request_timestamp'] = datetime.now().isoformat()
-        analysis_result['analysis_type'] = 'portfolio_news'
-        
         return jsonify(analysis_result)
         
     except Exception as e:
         logger.error(f"Error analyzing portfolio news: {str(e)}")
         return jsonify({'error': f'Failed to analyze portfolio news: {str(e)}'}), 500
 
+def run_news_analysis(news_agent, portfolio_data: Dict[str, Any], progress=None) -> Dict[str, Any]:
+    """Analyze portfolio news and add the response metadata"""
+    return add_analysis_metadata(news_agent.analyze_portfolio_news(portfolio_data, progress), 'portfolio_news')
+
+def add_analysis_metadata(analysis_result: Dict[str, Any], analysis_type: str, **extra) -> Dict[str, Any]:
+    """Stamp a successful news analysis with the request metadata"""
+    if 'error' not in analysis_result:
+        analysis_result['request_timestamp'] = datetime.now().isoformat()
+        analysis_result['analysis_type'] = analysis_type
+        analysis_result.update(extra)
+    
+    return analysis_result
+
 @news_bp.route('/api/stocks/news/<symbol>', methods=['GET'])
 def get_stock_news_route(symbol):
     """Get news analysis for a specific stock symbol"""
@@ -114,12 +172,7 @@ def get_stock_news_route(symbol):
         if 'error' in analysis_result:
             return jsonify(analysis_result), 400
         
-        # Add metadata
-        analysis_result['request_timestamp'] = datetime.now().isoformat()
-        analysis_result['analysis_type'] = 'single_stock_news'
-        analysis_result['symbol'] = symbol.upper()
-        
-        return jsonify(analysis_result)
+        return jsonify(add_analysis_metadata(analysis_result, 'single_stock_news', symbol=symbol.upper()))
         
     except Exception as e:
         logger.error(f"Error getting stock news for {symbol}: {str(e)}")
@@ -147,31 +200,74 @@ def complete_portfolio_analysis_route():
             return jsonify(processed_data), 400
         
         # Step 2: Analyze news for the portfolio
-        news_agent = get_news_agent()
-        news_analysis = None
-        
-        if news_agent:
-            news_analysis = news_agent.analyze_portfolio_news(processed_data)
-        else:
-            news_analysis = {
-                'error': 'News analysis not available - GROQ_API_KEY_NEWS not configured',
-                'analysis_timestamp': datetime.now().isoformat()
-            }
-        
-        # Combine results
-        complete_analysis = {
-            'portfolio_data': processed_data,
-            'news_analysis': news_analysis,
-            'analysis_timestamp': datetime.now().isoformat(),
-            'analysis_type': 'complete_portfolio_analysis'
-        }
+        if wants_async(data):
+            return enqueue_job('complete-analysis', lambda progress: run_complete_analysis(processed_data, progress))
         
-        return jsonify(complete_analysis)
+        return jsonify(run_complete_analysis(processed_data))
         
     except Exception as e:
         logger.error(f"Error in complete portfolio analysis: {str(e)}")
         return jsonify({'error': f'Failed to complete portfolio analysis: {str(e)}'}), 500
 
+def run_complete_analysis(processed_data: Dict[str, Any], progress=None) -> Dict[str, Any]:
+    """Analyze news for processed portfolio data and combine it with the portfolio"""
+    news_agent = get_news_agent()
+    news_analysis = None
+    
+    if news_agent:
+        news_analysis = news_agent.analyze_portfolio_news(processed_data, progress)
+    
+    return combine_complete_analysis(processed_data, news_analysis)
+
+def combine_complete_analysis(processed_data: Dict[str, Any], news_analysis) -> Dict[str, Any]:
+    """Combine processed portfolio data with its news analysis (None when the service is unavailable)"""
+    if news_analysis is None:
+        news_analysis = {
+            'error': 'News analysis not available - GROQ_API_KEY_NEWS not configured',
+            'analysis_timestamp': datetime.now().isoformat()
+        }
+    
+    # Combine results
+    return {
+        'portfolio_data': processed_data,
+        'news_analysis': news_analysis,
+        'analysis_timestamp': datetime.now().isoformat(),
+        'analysis_type': 'complete_portfolio_analysis'
+    }
+
+@news_bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_route(job_id):
+    """Get the status, completed stages and (once finished) result of a background job"""
+    try:
+        job = job_queue.get(job_id)
+        if job is None:
+            return jsonify({'error': f'Job {job_id} not found or expired'}), 404
+        
+        return jsonify(job.to_dict())
+        
+    except Exception as e:
+        logger.error(f"Error getting job {job_id}: {str(e)}")
+        return jsonify({'error': f'Failed to get job: {str(e)}'}), 500
+
+@news_bp.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events_route(job_id):
+    """Stream a background job's stage and status events as server-sent events"""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found or expired'}), 404
+    
+    # EventSource resends the last id it saw when it reconnects
+    try:
+        last_id = int(request.headers.get('Last-Event-ID', request.args.get('last_event_id', 0)))
+    except ValueError:
+        last_id = 0
+    
+    return Response(
+        stream_with_context(follow_events(job, last_id, current_config.JOB_EVENT_HEARTBEAT)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @news_bp.route('/api/news/status', methods=['GET'])
 def get_news_status():
     """Get the status of news analysis services"""
@@ -183,7 +279,7 @@ def get_news_status():
                 'news_analysis': {
                     'available': bool(groq_api_key_news),
                     'provider': 'Groq API',
-                    'model': 'llama-3.3-70b-versatile',
+                    'model': current_config.NEWS_LLM_MODEL.split('/', 1)[-1],
                     'api_key': 'GROQ_API_KEY_NEWS'
                 },
                 'portfolio_processing': {
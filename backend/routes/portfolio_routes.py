@@ -1,14 +1,24 @@
 from flask import Blueprint, request, jsonify
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import json
 
+from utils.market_data import market_data
+from utils.market_client import market_client, is_upstream_failure
+from utils.bulkhead import yahoo_bulkhead
+from utils.bar_store import bar_store
+from utils.backtest import run_backtest, backtest_to_chart_data, timeframe_period, load_close_matrix, BENCHMARK_SYMBOL
+from utils.risk import holdings_risk, return_moments, EMPTY_RISK_METRICS, RISK_FREE_RATE
+from utils.simulation import simulator, summarize_paths, horizon_years
+from utils.optimizer import optimize_weights, trade_list, OBJECTIVES
+from config import get_current_config
+
 logger = logging.getLogger(__name__)
 portfolio_bp = Blueprint('portfolio', __name__)
+current_config = get_current_config()
 
 def calculate_portfolio_metrics(holdings: List[Dict]) -> Dict[str, Any]:
     """Calculate comprehensive portfolio metrics"""
@@ -18,15 +28,21 @@ def calculate_portfolio_metrics(holdings: List[Dict]) -> Dict[str, Any]:
         sector_allocation = {}
         stock_data = []
         
+        # One batch of closes (holdings plus benchmark) serves both prices and risk;
+        # name/sector metadata comes from its long-lived cache
+        symbols = [holding['symbol'] for holding in holdings]
+        closes = load_close_matrix(symbols + [BENCHMARK_SYMBOL], '1y')
+        prices = market_data.get_prices(symbols, closes=closes)
+        metadata = market_data.get_metadata(symbols)
+        
         for holding in holdings:
             symbol = holding['symbol']
             quantity = holding['quantity']
             purchase_price = holding['purchasePrice']
             
             # Get current stock data
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            current_price = info.get('currentPrice') or info.get('regularMarketPrice', 0)
+            info = metadata.get(symbol.upper().strip(), {})
+            current_price = prices.get(symbol.upper().strip(), 0)
             
             # Calculate holding metrics
             current_value = quantity * current_price
@@ -46,7 +62,7 @@ def calculate_portfolio_metrics(holdings: List[Dict]) -> Dict[str, Any]:
             
             stock_data.append({
                 'symbol': symbol,
-                'name': info.get('longName', symbol),
+                'name': info.get('name', symbol),
                 'quantity': quantity,
                 'currentPrice': round(current_price, 2),
                 'purchasePrice': purchase_price,
@@ -73,7 +89,7 @@ def calculate_portfolio_metrics(holdings: List[Dict]) -> Dict[str, Any]:
             })
         
         # Calculate risk metrics (simplified)
-        risk_metrics = calculate_risk_metrics(stock_data)
+        risk_metrics = calculate_risk_metrics(stock_data, closes)
         
         return {
             'totalValue': round(total_value, 2),
@@ -91,116 +107,14 @@ def calculate_portfolio_metrics(holdings: List[Dict]) -> Dict[str, Any]:
         logger.error(f"Error calculating portfolio metrics: {str(e)}")
         raise
 
-def calculate_risk_metrics(stock_data: List[Dict]) -> Dict[str, float]:
-    """Calculate portfolio risk metrics based on actual holdings"""
+def calculate_risk_metrics(stock_data: List[Dict], closes: Optional[pd.DataFrame] = None) -> Dict[str, float]:
+    """Calculate portfolio risk metrics from the holdings' daily return history"""
     try:
-        if not stock_data:
-            return {
-                'volatility': 0.0,
-                'sharpeRatio': 0.0,
-                'beta': 0.0,
-                'maxDrawdown': 0.0,
-                'var95': 0.0
-            }
-        
-        # Calculate total portfolio value
-        total_value = sum(stock['value'] for stock in stock_data)
-        if total_value == 0:
-            return {
-                'volatility': 0.0,
-                'sharpeRatio': 0.0,
-                'beta': 0.0,
-                'maxDrawdown': 0.0,
-                'var95': 0.0
-            }
-        
-        # Define sector risk characteristics
-        sector_risk_profiles = {
-            'Technology': {'volatility': 0.25, 'beta': 1.2, 'sector_weight': 0.0},
-            'Financial Services': {'volatility': 0.20, 'beta': 1.1, 'sector_weight': 0.0},
-            'Healthcare': {'volatility': 0.22, 'beta': 0.9, 'sector_weight': 0.0},
-            'Consumer Defensive': {'volatility': 0.18, 'beta': 0.8, 'sector_weight': 0.0},
-            'Consumer Cyclical': {'volatility': 0.23, 'beta': 1.0, 'sector_weight': 0.0},
-            'Energy': {'volatility': 0.30, 'beta': 1.3, 'sector_weight': 0.0},
-            'Industrials': {'volatility': 0.21, 'beta': 1.0, 'sector_weight': 0.0},
-            'Communication Services': {'volatility': 0.24, 'beta': 1.1, 'sector_weight': 0.0},
-            'Basic Materials': {'volatility': 0.26, 'beta': 1.2, 'sector_weight': 0.0},
-            'Real Estate': {'volatility': 0.19, 'beta': 0.9, 'sector_weight': 0.0},
-            'Utilities': {'volatility': 0.15, 'beta': 0.6, 'sector_weight': 0.0},
-            'Unknown': {'volatility': 0.20, 'beta': 1.0, 'sector_weight': 0.0}
-        }
-        
-        # Calculate sector weights and individual stock weights
-        sector_weights = {}
-        stock_weights = {}
-        
-        for stock in stock_data:
-            sector = stock.get('sector', 'Unknown')
-            weight = stock['value'] / total_value
-            
-            # Track individual stock weight
-            stock_weights[stock['symbol']] = weight
-            
-            # Track sector weight
-            if sector not in sector_weights:
-                sector_weights[sector] = 0
-            sector_weights[sector] += weight
-        
-        # Calculate weighted portfolio metrics
-        weighted_volatility = 0
-        weighted_beta = 0
-        sector_count = len(sector_weights)
-        
-        for stock in stock_data:
-            sector = stock.get('sector', 'Unknown')
-            weight = stock_weights[stock['symbol']]
-            sector_profile = sector_risk_profiles.get(sector, sector_risk_profiles['Unknown'])
-            
-            # Add weighted contribution
-            weighted_volatility += weight * sector_profile['volatility']
-            weighted_beta += weight * sector_profile['beta']
-        
-        # Apply diversification effects
-        diversification_factor = max(0.7, 1 - (sector_count - 1) * 0.05)  # More sectors = lower risk
-        weighted_volatility *= diversification_factor
-        
-        # Calculate additional risk metrics
-        # Sharpe ratio (assuming 8% market return and 2% risk-free rate)
-        market_return = 0.08
-        risk_free_rate = 0.02
-        expected_return = weighted_beta * (market_return - risk_free_rate) + risk_free_rate
-        sharpe_ratio = (expected_return - risk_free_rate) / weighted_volatility if weighted_volatility > 0 else 0
-        
-        # Maximum drawdown (based on volatility and sector mix)
-        max_drawdown = -weighted_volatility * 0.4  # Rough estimate
-        
-        # Value at Risk (95% confidence, daily)
-        var_95 = -weighted_volatility / np.sqrt(252) * 1.645  # Daily VaR
-        
-        # Apply defensive stock bonus
-        defensive_sectors = ['Consumer Defensive', 'Utilities', 'Healthcare']
-        defensive_weight = sum(sector_weights.get(sector, 0) for sector in defensive_sectors)
-        if defensive_weight > 0.3:  # If more than 30% in defensive sectors
-            volatility_reduction = defensive_weight * 0.1
-            weighted_volatility *= (1 - volatility_reduction)
-        
-        return {
-            'volatility': round(weighted_volatility, 3),
-            'sharpeRatio': round(sharpe_ratio, 3),
-            'beta': round(weighted_beta, 3),
-            'maxDrawdown': round(max_drawdown, 3),
-            'var95': round(var_95, 3)
-        }
+        return holdings_risk(stock_data, closes=closes)
         
     except Exception as e:
         logger.error(f"Error calculating risk metrics: {str(e)}")
-        return {
-            'volatility': 0.0,
-            'sharpeRatio': 0.0,
-            'beta': 0.0,
-            'maxDrawdown': 0.0,
-            'var95': 0.0
-        }
+        return dict(EMPTY_RISK_METRICS)
 
 def get_sector_color(sector: str) -> str:
     """Get color for sector allocation chart"""
@@ -302,6 +216,225 @@ def analyze_portfolio():
         logger.error(f"Error analyzing portfolio: {str(e)}")
         return jsonify({'error': 'Failed to analyze portfolio'}), 500
 
+@portfolio_bp.route('/api/portfolio/simulate', methods=['POST'])
+def simulate_portfolio():
+    """Project portfolio value with Monte Carlo paths from historical return covariance"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        holdings = data.get('holdings', [])
+        if not holdings:
+            return jsonify({'error': 'No holdings provided'}), 400
+        
+        try:
+            monthly_investment = max(float(data.get('monthlyInvestment', 0) or 0), 0.0)
+            available_capital = max(float(data.get('availableCapital', 0) or 0), 0.0)
+            paths = int(data.get('paths', current_config.SIMULATION_DEFAULT_PATHS))
+            seed = data.get('seed')
+            seed = int(seed) if seed is not None else int(np.random.SeedSequence().entropy % 2**32)
+            goals = [float(goal) for goal in data.get('goals', [])]
+            years = horizon_years(data.get('timeHorizon', 'long-term'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Invalid simulation parameters'}), 400
+        
+        if years > current_config.SIMULATION_MAX_YEARS:
+            return jsonify({
+                'error': f'timeHorizon must be at most {current_config.SIMULATION_MAX_YEARS} years'
+            }), 400
+        
+        # Every path's monthly values are kept for the percentile bands, so long horizons allow fewer paths
+        max_paths = min(current_config.SIMULATION_MAX_PATHS, simulator.max_paths(years))
+        if not 1 <= paths <= max_paths:
+            return jsonify({
+                'error': f'paths must be between 1 and {max_paths} for a {years}-year horizon'
+            }), 400
+        
+        simulation = run_portfolio_simulation(
+            holdings,
+            years=years,
+            monthly_investment=monthly_investment,
+            available_capital=available_capital,
+            paths=paths,
+            seed=seed,
+            goals=goals
+        )
+        if simulation is None:
+            return jsonify({'error': 'Not enough price history to simulate portfolio'}), 422
+        
+        return jsonify(simulation)
+        
+    except Exception as e:
+        logger.error(f"Error simulating portfolio: {str(e)}")
+        return jsonify({'error': 'Failed to simulate portfolio'}), 500
+
+def run_portfolio_simulation(holdings: List[Dict], years: int, monthly_investment: float,
+                             available_capital: float, paths: int, seed: int,
+                             goals: List[float]) -> Dict[str, Any]:
+    """Simulate the holdings plus new capital invested at the current weights"""
+    quantities = {}
+    for holding in holdings:
+        symbol = str(holding['symbol']).upper().strip()
+        quantities[symbol] = quantities.get(symbol, 0.0) + float(holding['quantity'])
+    
+    prices = market_data.get_prices(list(quantities))
+    symbols, mean, covariance = return_moments([symbol for symbol in quantities if prices.get(symbol)])
+    if not symbols:
+        return None
+    
+    values = np.array([quantities[symbol] * prices[symbol] for symbol in symbols])
+    if values.sum() <= 0:
+        return None
+    weights = values / values.sum()
+    initial_value = float(values.sum()) + available_capital
+    
+    paths_values = simulator.simulate(
+        mean, covariance, weights,
+        initial_value=initial_value,
+        monthly_contribution=monthly_investment,
+        years=years,
+        paths=paths,
+        seed=seed
+    )
+    result = summarize_paths(paths_values, initial_value, monthly_investment, goals)
+    result.update({
+        'seed': seed,
+        'years': years,
+        'initialValue': round(initial_value, 2),
+        'monthlyInvestment': monthly_investment,
+        'weights': {symbol: round(float(weight), 4) for symbol, weight in zip(symbols, weights)},
+        'excluded': [symbol for symbol in quantities if symbol not in symbols],
+        'timestamp': datetime.now().isoformat()
+    })
+    return result
+
+@portfolio_bp.route('/api/portfolio/optimize', methods=['POST'])
+def optimize_portfolio():
+    """Optimize holdings weights and return the trades to rebalance"""
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        holdings = data.get('holdings', [])
+        if not holdings:
+            return jsonify({'error': 'No holdings provided'}), 400
+        
+        objectives = data.get('objectives') or data.get('objective') or list(OBJECTIVES)
+        if isinstance(objectives, str):
+            objectives = [objectives]
+        unknown = [objective for objective in objectives if objective not in OBJECTIVES]
+        if unknown:
+            return jsonify({'error': f'Unknown objectives {unknown}, expected {list(OBJECTIVES)}'}), 400
+        
+        try:
+            max_weight = float(data.get('maxWeight', 1.0))
+            max_turnover = data.get('maxTurnover')
+            max_turnover = float(max_turnover) if max_turnover is not None else None
+            sector_caps = {sector: float(cap) for sector, cap in (data.get('sectorCaps') or {}).items()}
+            max_sector_weight = data.get('maxSectorWeight')
+            max_sector_weight = float(max_sector_weight) if max_sector_weight is not None else None
+            frontier_points = min(max(int(data.get('frontierPoints', 12)), 2), 50)
+        except (TypeError, ValueError, AttributeError):
+            return jsonify({'error': 'Invalid optimization constraints'}), 400
+        
+        try:
+            optimization = run_portfolio_optimization(
+                holdings, objectives, max_weight, sector_caps, max_sector_weight, max_turnover, frontier_points
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if optimization is None:
+            return jsonify({'error': 'Not enough price history to optimize portfolio'}), 422
+        
+        return jsonify(optimization)
+        
+    except Exception as e:
+        logger.error(f"Error optimizing portfolio: {str(e)}")
+        return jsonify({'error': 'Failed to optimize portfolio'}), 500
+
+def run_portfolio_optimization(holdings: List[Dict], objectives: List[str], max_weight: float,
+                               sector_caps: Dict[str, float], max_sector_weight: float,
+                               max_turnover: float, frontier_points: int) -> Dict[str, Any]:
+    """Optimize the held universe and price the rebalancing trades"""
+    quantities = {}
+    for holding in holdings:
+        symbol = str(holding['symbol']).upper().strip()
+        quantities[symbol] = quantities.get(symbol, 0.0) + float(holding['quantity'])
+    
+    prices = market_data.get_prices(list(quantities))
+    symbols, mean, covariance = return_moments([symbol for symbol in quantities if prices.get(symbol)])
+    if not symbols:
+        return None
+    
+    values = np.array([quantities[symbol] * prices[symbol] for symbol in symbols])
+    total_value = float(values.sum())
+    if total_value <= 0:
+        return None
+    current_weights = values / total_value
+    
+    metadata = market_data.get_metadata(symbols)
+    sectors = [metadata.get(symbol, {}).get('sector', 'Unknown') for symbol in symbols]
+    if max_sector_weight is not None:
+        sector_caps = dict({sector: max_sector_weight for sector in sectors}, **sector_caps)
+    
+    results = optimize_weights(
+        symbols, mean, covariance, current_weights,
+        objectives=objectives,
+        max_weight=max_weight,
+        sectors=sectors,
+        sector_caps=sector_caps,
+        max_turnover=max_turnover,
+        frontier_points=frontier_points,
+        risk_free_rate=RISK_FREE_RATE
+    )
+    
+    def portfolio(result: Dict) -> Dict[str, Any]:
+        return {
+            'weights': {symbol: round(float(weight), 4) for symbol, weight in zip(symbols, result['weights'])},
+            'riskContributions': {
+                symbol: round(float(share), 4) for symbol, share in zip(symbols, result['riskContributions'])
+            },
+            'expectedReturn': round(result['expectedReturn'], 4),
+            'volatility': round(result['volatility'], 4),
+            'sharpeRatio': round(result['sharpeRatio'], 3),
+            'turnover': round(result['turnover'], 4),
+            'violations': result['violations'],
+            'trades': trade_list(symbols, current_weights, result['weights'], prices, total_value)
+        }
+    
+    portfolios = {}
+    for objective, result in results.items():
+        portfolios[objective] = dict(
+            portfolio(result),
+            converged=result['converged'],
+            iterations=result['iterations'],
+            solveTimeMs=round(result['solveTimeMs'], 1)
+        )
+        if objective == 'efficient-frontier':
+            portfolios[objective]['frontier'] = [
+                {
+                    'riskAversion': round(point['riskAversion'], 4),
+                    'expectedReturn': round(point['expectedReturn'], 4),
+                    'volatility': round(point['volatility'], 4),
+                    'sharpeRatio': round(point['sharpeRatio'], 3),
+                    'weights': {symbol: round(float(weight), 4) for symbol, weight in zip(symbols, point['weights'])}
+                }
+                for point in result['frontier']
+            ]
+    
+    return {
+        'portfolios': portfolios,
+        'currentWeights': {symbol: round(float(weight), 4) for symbol, weight in zip(symbols, current_weights)},
+        'totalValue': round(total_value, 2),
+        'excluded': [symbol for symbol in quantities if symbol not in symbols],
+        'timestamp': datetime.now().isoformat()
+    }
+
 @portfolio_bp.route('/api/portfolio/save', methods=['POST'])
 def save_portfolio():
     """Save portfolio data for later retrieval"""
@@ -365,23 +498,38 @@ def get_portfolio_performance():
         logger.error(f"Error calculating portfolio performance: {str(e)}")
         return jsonify({'error': 'Failed to calculate portfolio performance'}), 500
 
-def calculate_portfolio_performance(holdings: List[Dict], timeframe: str) -> Dict[str, Any]:
-    """Calculate portfolio performance with S&P 500 comparison"""
+def calculate_portfolio_performance(holdings: List[Dict], timeframe: str, prices: Optional[Dict[str, float]] = None,
+                                    metadata: Optional[Dict[str, Dict]] = None,
+                                    closes: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """Calculate portfolio performance with S&P 500 comparison
+    
+    prices, metadata and closes (holdings plus ^GSPC) may be preloaded by
+    the caller; whatever is missing is fetched here, with prices taken from
+    the closes rather than a separate download.
+    """
     try:
         # Calculate portfolio metrics
         total_value = 0
         total_cost = 0
         portfolio_holdings = []
         
+        # One batch of closes covers the holdings and the benchmark; names come from cached metadata
+        symbols = [holding['symbol'] for holding in holdings]
+        if closes is None:
+            closes = load_close_matrix(symbols + [BENCHMARK_SYMBOL], timeframe_period(timeframe))
+        if prices is None:
+            prices = market_data.get_prices(symbols, closes=closes)
+        if metadata is None:
+            metadata = market_data.get_metadata(symbols)
+        
         for holding in holdings:
             symbol = holding['symbol']
             quantity = holding['quantity']
             purchase_price = holding['purchasePrice']
             
             # Get current stock data
-            ticker = yf.Ticker(symbol)
-            info = ticker.info
-            current_price = info.get('currentPrice') or info.get('regularMarketPrice', purchase_price)
+            info = metadata.get(symbol.upper().strip(), {})
+            current_price = prices.get(symbol.upper().strip(), purchase_price)
             
             # Calculate holding metrics
             current_value = quantity * current_price
@@ -395,7 +543,7 @@ def calculate_portfolio_performance(holdings: List[Dict], timeframe: str) -> Dic
             
             portfolio_holdings.append({
                 'symbol': symbol,
-                'name': info.get('longName', symbol),
+                'name': info.get('name', symbol),
                 'quantity': quantity,
                 'currentPrice': round(current_price, 2),
                 'purchasePrice': purchase_price,
@@ -410,13 +558,14 @@ def calculate_portfolio_performance(holdings: List[Dict], timeframe: str) -> Dic
         portfolio_return_percent = (portfolio_return / total_cost * 100) if total_cost > 0 else 0
         
         # Get S&P 500 data
-        sp500_data = get_sp500_performance(timeframe)
+        benchmark = closes[BENCHMARK_SYMBOL].dropna() if BENCHMARK_SYMBOL in closes else None
+        sp500_data = get_sp500_performance(timeframe, benchmark)
         
         # Calculate outperformance
         outperformance = portfolio_return_percent - sp500_data['return_percent']
         
         # Generate historical data
-        historical_data = generate_performance_historical_data(holdings, timeframe)
+        historical_data = generate_performance_historical_data(holdings, timeframe, closes)
         
         return {
             'portfolioValue': round(total_value, 2),
@@ -435,29 +584,29 @@ def calculate_portfolio_performance(holdings: List[Dict], timeframe: str) -> Dic
         logger.error(f"Error calculating portfolio performance: {str(e)}")
         raise
 
-def get_sp500_performance(timeframe: str) -> Dict[str, Any]:
-    """Get S&P 500 performance data"""
+def get_sp500_performance(timeframe: str, closes: Optional[pd.Series] = None) -> Dict[str, Any]:
+    """Get S&P 500 performance data, from preloaded closes when given"""
     try:
-        # Get S&P 500 data using ^GSPC ticker
-        sp500 = yf.Ticker("^GSPC")
-        
-        # Get historical data based on timeframe
-        periods = {
-            '1M': '1mo',
-            '3M': '3mo',
-            '6M': '6mo',
-            '1Y': '1y'
-        }
-        
-        period = periods.get(timeframe, '1mo')
-        hist = sp500.history(period=period)
+        if closes is None:
+            # Get historical data based on timeframe
+            period = timeframe_period(timeframe)
+            
+            # Get S&P 500 data using ^GSPC ticker, served locally when stored
+            if bar_store is not None:
+                hist = bar_store.get_history('^GSPC', period, '1d')
+            else:
+                hist = yahoo_bulkhead.call(
+                    lambda: market_client.history(BENCHMARK_SYMBOL, period=period, raise_errors=True),
+                    is_failure=is_upstream_failure
+                )
+            closes = hist['Close'] if not hist.empty else pd.Series(dtype=float)
         
-        if hist.empty:
+        if closes.empty:
             # Fallback to mock data
             return get_mock_sp500_data(timeframe)
         
-        current_value = hist['Close'].iloc[-1]
-        start_value = hist['Close'].iloc[0]
+        current_value = closes.iloc[-1]
+        start_value = closes.iloc[0]
         return_value = current_value - start_value
         return_percent = (return_value / start_value * 100) if start_value > 0 else 0
         
@@ -490,55 +639,23 @@ def get_mock_sp500_data(timeframe: str) -> Dict[str, Any]:
         'return_percent': return_percent
     }
 
-def generate_performance_historical_data(holdings: List[Dict], timeframe: str) -> List[Dict]:
-    """Generate historical performance data for charts"""
+def generate_performance_historical_data(holdings: List[Dict], timeframe: str,
+                                         closes: Optional[pd.DataFrame] = None) -> List[Dict]:
+    """Generate historical performance data for charts from a backtest of the holdings"""
     try:
-        # Calculate total portfolio value
-        total_value = sum([
-            holding['quantity'] * (holding.get('currentPrice', holding['purchasePrice']))
-            for holding in holdings
-        ])
-        
-        periods = {
-            '1M': 30,
-            '3M': 90,
-            '6M': 180,
-            '1Y': 365
-        }
+        result = run_backtest(holdings, timeframe, closes=closes)
+        if result.empty:
+            raise ValueError(f"No price history available for timeframe {timeframe}")
         
-        days = periods.get(timeframe, 30)
-        data = []
-        
-        # Get S&P 500 historical data
-        sp500 = yf.Ticker("^GSPC")
-        sp500_hist = sp500.history(period=f"{days}d")
-        
-        for i in range(days + 1):
-            date = datetime.now() - timedelta(days=days - i)
-            date_str = date.strftime('%Y-%m-%d')
-            
-            # Generate portfolio value with some volatility
-            volatility = 0.02  # 2% daily volatility
-            random_change = (np.random.random() - 0.5) * volatility
-            portfolio_value = total_value * (1 + random_change)
-            
-            # Get S&P 500 value for this date
-            if not sp500_hist.empty and i < len(sp500_hist):
-                sp500_value = sp500_hist['Close'].iloc[i] if i < len(sp500_hist) else 4500
-            else:
-                sp500_value = 4500 * (1 + random_change * 0.8)
-            
-            data.append({
-                'date': date_str,
-                'portfolio': round(portfolio_value),
-                'sp500': round(sp500_value)
-            })
-        
-        return data
+        return backtest_to_chart_data(result)
         
     except Exception as e:
         logger.error(f"Error generating historical data: {str(e)}")
         # Return mock data
+        total_value = sum([
+            holding['quantity'] * (holding.get('currentPrice', holding['purchasePrice']))
+            for holding in holdings
+        ])
         return generate_mock_historical_data(total_value, timeframe)
 
 def generate_mock_historical_data(base_value: float, timeframe: str) -> List[Dict]:
@@ -547,7 +664,10 @@ def generate_mock_historical_data(base_value: float, timeframe: str) -> List[Dic
         '1M': 30,
         '3M': 90,
         '6M': 180,
-        '1Y': 365
+        '1Y': 365,
+        '2Y': 730,
+        '5Y': 1825,
+        '10Y': 3650
     }
     
     days = periods.get(timeframe, 30)
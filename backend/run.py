@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 """
 Run script for the FinAnalytica AI Backend
+
+Usage:
+    python run.py          # development server (prompts only on a terminal)
+    python run.py serve    # multi-worker production server, never prompts
+    python run.py asgi     # multi-worker asyncio server (asgi.py), never prompts
 """
 
+import argparse
+import logging
 import os
 import sys
 from app import app
-from config import config
+from config import config, get_current_config
 
-def setup_groq_api_key():
+def setup_groq_api_key(interactive: bool = True):
     """Interactive setup for Groq API key"""
     print("\n🔑 Groq API Key Configuration")
     print("-" * 40)
@@ -26,6 +33,10 @@ def setup_groq_api_key():
     print("   - AI agent functionality")
     print("\n💡 Get your free API key from: https://console.groq.com/")
     
+    if not interactive:
+        print("⚠️  No terminal attached. AI features will use fallback methods.")
+        return False
+    
     # Try to get from user input
     try:
         api_key = input("\nEnter your Groq API key (or press Enter to skip): ").strip()
@@ -47,8 +58,134 @@ def setup_groq_api_key():
         print("\n⚠️  API key setup cancelled. AI features will use fallback methods.")
         return False
 
+def configure_app(env: str):
+    """Load the environment's configuration into the app and set up logging"""
+    app.config.from_object(config.get(env, config['default']))
+    logging.basicConfig(
+        level=getattr(logging, app.config['LOG_LEVEL']),
+        format=app.config['LOG_FORMAT']
+    )
+
+def shutdown_workers():
+    """Release process pools and background executors held by this process"""
+    from utils.simulation import simulator
+    from utils.jobs import job_queue
+    
+    simulator.shutdown()
+    job_queue.shutdown()
+
+def gunicorn_options(config_class) -> dict:
+    """Gunicorn settings for serve mode, all taken from the configuration"""
+    threads = max(1, config_class.SERVER_THREADS)
+    return {
+        'bind': f"{config_class.SERVER_HOST}:{config_class.SERVER_PORT}",
+        'workers': max(1, config_class.SERVER_WORKERS),
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'timeout': config_class.SERVER_TIMEOUT,
+        'graceful_timeout': config_class.SERVER_GRACEFUL_TIMEOUT,
+        'keepalive': config_class.SERVER_KEEPALIVE,
+        'max_requests': config_class.SERVER_MAX_REQUESTS,
+        'max_requests_jitter': config_class.SERVER_MAX_REQUESTS_JITTER,
+        # Import the app once in the master so workers fork with it already loaded
+        'preload_app': True,
+        'accesslog': '-',
+        'errorlog': '-',
+        'loglevel': config_class.LOG_LEVEL.lower(),
+        'worker_exit': lambda server, worker: shutdown_workers()
+    }
+
+def warn_unpinned_jobs(workers: int):
+    """Background jobs are per worker, so job polls must stick to the worker that accepted them"""
+    if workers > 1:
+        print(f"⚠️  {workers} workers: async analysis jobs live in the worker that accepted them, "
+              "so /api/jobs polls need sticky routing or they may get 404")
+
+def serve():
+    """Run the app under gunicorn with settings from Config, without prompting"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("❌ gunicorn is not installed (pip install -r requirements.txt)")
+        sys.exit(1)
+    
+    class ProductionServer(BaseApplication):
+        """Gunicorn application serving the already imported Flask app"""
+        
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+        
+        def load_config(self):
+            for key, value in self.options.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+        
+        def load(self):
+            return self.application
+    
+    env = os.environ.get('FLASK_ENV', 'development')
+    configure_app(env)
+    config_class = get_current_config()
+    options = gunicorn_options(config_class)
+    
+    print(f"🚀 FinAnalytica AI Backend serving on {options['bind']} "
+          f"({options['workers']} workers x {options['threads']} threads, env={env})")
+    warn_unpinned_jobs(options['workers'])
+    if not config_class.GROQ_API_KEY:
+        print("⚠️  GROQ_API_KEY not configured - AI features will use fallback methods")
+    
+    # Gunicorn stops gracefully on SIGTERM: workers finish in-flight requests
+    # for up to graceful_timeout seconds before they are killed
+    ProductionServer(app, options).run()
+
+def serve_asgi():
+    """Run the ASGI app (asgi.py) under uvicorn with settings from Config, without prompting"""
+    try:
+        import uvicorn
+    except ImportError:
+        print("❌ uvicorn is not installed (pip install -r requirements.txt)")
+        sys.exit(1)
+    
+    env = os.environ.get('FLASK_ENV', 'development')
+    configure_app(env)
+    config_class = get_current_config()
+    workers = max(1, config_class.SERVER_WORKERS)
+    
+    print(f"🚀 FinAnalytica AI Backend serving on {config_class.SERVER_HOST}:{config_class.SERVER_PORT} "
+          f"({workers} asyncio workers, env={env})")
+    warn_unpinned_jobs(workers)
+    if not config_class.GROQ_API_KEY:
+        print("⚠️  GROQ_API_KEY not configured - AI features will use fallback methods")
+    
+    # Each worker imports asgi.py itself, so the app is given as an import string
+    uvicorn.run(
+        'asgi:application',
+        host=config_class.SERVER_HOST,
+        port=config_class.SERVER_PORT,
+        workers=workers,
+        timeout_keep_alive=config_class.SERVER_KEEPALIVE,
+        timeout_graceful_shutdown=config_class.SERVER_GRACEFUL_TIMEOUT,
+        log_level=config_class.LOG_LEVEL.lower()
+    )
+    shutdown_workers()
+
 def main():
     """Main function to run the Flask application"""
+    parser = argparse.ArgumentParser(description='Run the FinAnalytica AI backend')
+    parser.add_argument('mode', nargs='?', choices=['dev', 'serve', 'asgi'], default='dev',
+                        help="'dev' for the Flask development server, 'serve' for the production server, "
+                             "'asgi' for the asyncio production server")
+    args = parser.parse_args()
+    
+    if args.mode == 'serve':
+        serve()
+        return
+    
+    if args.mode == 'asgi':
+        serve_asgi()
+        return
     
     print("=" * 60)
     print("🚀 FinAnalytica AI Backend Starting...")
@@ -57,15 +194,9 @@ def main():
     # Get environment
     env = os.environ.get('FLASK_ENV', 'development')
     
-    # Load configuration
-    app.config.from_object(config[env])
-    
-    # Set up logging
-    import logging
-    logging.basicConfig(
-        level=getattr(logging, app.config['LOG_LEVEL']),
-        format=app.config['LOG_FORMAT']
-    )
+    # Load configuration and set up logging
+    configure_app(env)
+    interactive = sys.stdin.isatty()
     
     # Print startup information
     print(f"\n📊 Configuration:")
@@ -76,7 +207,7 @@ def main():
     print(f"   Port: {os.environ.get('PORT', 5000)}")
     
     # Setup Groq API key
-    groq_configured = setup_groq_api_key()
+    groq_configured = setup_groq_api_key(interactive)
     
     print("\n" + "=" * 60)
     
@@ -85,7 +216,7 @@ def main():
     print(f"   Groq API: {'✅ Configured' if groq_configured else '⚠️  Using fallback'}")
     
     # Check if we should continue
-    if not groq_configured and env == 'development':
+    if not groq_configured and env == 'development' and interactive:
         print("\n⚠️  Warning: Groq API key not configured!")
         print("   AI features will use fallback methods (keyword-based analysis).")
         print("   For full AI functionality, configure your Groq API key.")
@@ -0,0 +1,132 @@
+"""
+Shared fixtures: the testing config and an offline Yahoo Finance stand-in
+"""
+
+import os
+import sys
+import zlib
+
+# Must be set before any backend module reads the configuration
+os.environ['FLASK_ENV'] = 'testing'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+from yfinance.exceptions import YFPricesMissingError
+
+# Trading days returned for each yfinance period
+PERIOD_DAYS = {'5d': 5, '1mo': 21, '3mo': 63, '6mo': 126, '1y': 252, '2y': 504, '5y': 1260, '10y': 2520, 'max': 2520}
+LAST_DATE = '2024-06-28'
+
+
+def fake_history(symbol: str, period: str = '1y') -> pd.DataFrame:
+    """Deterministic OHLCV random walk for a symbol"""
+    days = PERIOD_DAYS.get(period, 252)
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    index = pd.bdate_range(end=LAST_DATE, periods=PERIOD_DAYS['max'])
+    closes = 100 * np.cumprod(1 + rng.normal(0.0004, 0.015, len(index)))
+    frame = pd.DataFrame({
+        'Open': closes,
+        'High': closes * 1.01,
+        'Low': closes * 0.99,
+        'Close': closes,
+        'Volume': rng.integers(1_000_000, 5_000_000, len(index)).astype(float)
+    }, index=index)
+    return frame.tail(days)
+
+
+class FakeHTTPError(Exception):
+    """Stand-in for an HTTP error raised by the yfinance session"""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.response = type('Response', (), {'status_code': status_code})()
+
+
+class FakeMarketClient:
+    """Answers market_client calls from fake_history
+
+    Symbols in unknown do not exist upstream; while down is set, every
+    call fails the way an unreachable Yahoo would.
+    """
+
+    def __init__(self):
+        self.unknown = set()
+        self.down = False
+        self.calls = []
+
+    def _check(self, symbol):
+        if self.down:
+            raise ConnectionError('Yahoo unreachable')
+        if symbol.upper() in self.unknown:
+            raise YFPricesMissingError(symbol.upper(), '')
+
+    def history(self, symbol, period='1y', raise_errors=False, **kwargs):
+        self.calls.append(('history', symbol))
+        try:
+            self._check(symbol)
+        except Exception:
+            if raise_errors:
+                raise
+            return pd.DataFrame()
+        return fake_history(symbol.upper(), period)
+
+    def download(self, symbols, period='1y', **kwargs):
+        self.calls.append(('download', tuple(symbols)))
+        if self.down:
+            raise ConnectionError('Yahoo unreachable')
+        frames = {symbol: fake_history(symbol, period) for symbol in symbols if symbol not in self.unknown}
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, axis=1).swaplevel(axis=1).sort_index(axis=1)
+
+    def info(self, symbol):
+        self.calls.append(('info', symbol))
+        if self.down:
+            raise ConnectionError('Yahoo unreachable')
+        if symbol.upper() in self.unknown:
+            raise FakeHTTPError(404)
+        return {
+            'longName': f'{symbol.upper()} Inc.',
+            'sector': 'Technology' if zlib.crc32(symbol.encode()) % 2 else 'Healthcare',
+            'currentPrice': float(fake_history(symbol.upper())['Close'].iloc[-1]),
+            'previousClose': float(fake_history(symbol.upper())['Close'].iloc[-2])
+        }
+
+    def last_price(self, symbol):
+        return None if self.down or symbol.upper() in self.unknown else float(fake_history(symbol.upper())['Close'].iloc[-1])
+
+
+@pytest.fixture
+def fake_market(monkeypatch):
+    """Route every market_client call through FakeMarketClient and start from cold caches"""
+    from utils import market_client as market_client_module
+    from utils.bulkhead import CircuitBreaker, yahoo_bulkhead
+    from utils.covariance import covariance_cache
+    from utils.market_data import market_data
+
+    fake = FakeMarketClient()
+    for name in ('history', 'download', 'info', 'last_price'):
+        monkeypatch.setattr(market_client_module.market_client, name, getattr(fake, name))
+    market_data._prices.clear()
+    market_data._metadata.clear()
+    covariance_cache.clear()
+    breaker = yahoo_bulkhead.breaker
+    monkeypatch.setattr(yahoo_bulkhead, 'breaker', CircuitBreaker(
+        breaker.name, window=breaker.window, min_calls=breaker.min_calls, error_rate=breaker.error_rate,
+        slow_call_seconds=breaker.slow_call_seconds, slow_call_rate=breaker.slow_call_rate,
+        open_seconds=breaker.open_seconds
+    ))
+    yahoo_bulkhead._last_good.clear()
+    yield fake
+    covariance_cache.clear()
+
+
+@pytest.fixture
+def client(fake_market):
+    """Flask test client backed by the fake market"""
+    import app as app_module
+
+    app_module.stock_cache.clear()
+    return app_module.app.test_client()
@@ -0,0 +1,28 @@
+"""
+Tests for the ASGI entry point
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('starlette')
+
+import asgi
+from utils.market_data import market_data
+
+
+def test_run_blocking_does_not_share_the_market_data_pool(monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(market_data, 'executor', pool)
+
+    def fan_out():
+        # Like calculate_portfolio_performance: submit to the pool and wait on it
+        return market_data.executor.submit(lambda: 42).result(timeout=2)
+
+    async def call():
+        return await asyncio.gather(*(asgi.run_blocking(fan_out) for _ in range(4)))
+
+    assert asyncio.run(call()) == [42] * 4
+    pool.shutdown()
@@ -0,0 +1,69 @@
+"""
+Tests for the async chart client and its use of the Yahoo breaker
+"""
+
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip('httpx')
+
+from utils.async_market_data import AsyncMarketData
+from utils.bulkhead import CLOSED, OPEN, yahoo_bulkhead
+
+
+def chart_payload(symbol):
+    return {'chart': {'result': [{
+        'meta': {'symbol': symbol, 'regularMarketPrice': 101.0, 'exchangeTimezoneName': 'America/New_York'},
+        'timestamp': [1719495000, 1719581400],
+        'indicators': {'quote': [{
+            'open': [99.0, 100.0], 'high': [101.0, 102.0], 'low': [98.0, 99.0],
+            'close': [100.0, 101.0], 'volume': [1000, 2000]
+        }]}
+    }]}}
+
+
+def make_client(handler):
+    return AsyncMarketData(ttl=0, retries=0, transport=httpx.MockTransport(handler))
+
+
+def fetch(client, symbols):
+    async def run():
+        try:
+            return await client.charts(symbols)
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def test_chart_is_parsed(fake_market):
+    charts = fetch(make_client(lambda request: httpx.Response(200, json=chart_payload('AAPL'))), ['AAPL'])
+    history, meta = charts['AAPL']
+    assert list(history['Close']) == [100.0, 101.0]
+    assert meta['regularMarketPrice'] == 101.0
+
+
+def test_server_errors_open_the_shared_breaker(fake_market):
+    symbols = [f'S{i}' for i in range(yahoo_bulkhead.breaker.min_calls)]
+    charts = fetch(make_client(lambda request: httpx.Response(503)), symbols)
+    assert all(history.empty for history, _ in charts.values())
+    assert yahoo_bulkhead.breaker.state == OPEN
+
+
+def test_unknown_symbols_do_not_open_the_breaker(fake_market):
+    symbols = [f'S{i}' for i in range(yahoo_bulkhead.breaker.min_calls * 2)]
+    fetch(make_client(lambda request: httpx.Response(404, json={'chart': {'result': None}})), symbols)
+    assert yahoo_bulkhead.breaker.state == CLOSED
+
+
+def test_last_good_chart_is_served_during_an_outage(fake_market):
+    responses = [httpx.Response(200, json=chart_payload('AAPL'))]
+
+    def handler(request):
+        return responses.pop(0) if responses else httpx.Response(503)
+
+    client = make_client(handler)
+    fetch(client, ['AAPL'])
+    history, _ = fetch(client, ['AAPL'])['AAPL']
+    assert list(history['Close']) == [100.0, 101.0]
+    assert yahoo_bulkhead.stats()['stale_served'] == 1
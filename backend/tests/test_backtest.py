@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.backtest import aggregate_quantities, backtest_to_chart_data, run_backtest
+
+DATES = pd.DatetimeIndex(['2024-01-01', '2024-01-02', '2024-01-03', '2024-01-04'])
+
+CLOSES = pd.DataFrame({
+    'AAA': [np.nan, 10.0, 11.0, 12.0],
+    'BBB': [np.nan, 20.0, np.nan, 22.0],
+    '^GSPC': [4000.0, 4000.0, 4100.0, 4200.0]
+}, index=DATES)
+
+HOLDINGS = [
+    {'symbol': 'aaa', 'quantity': 1},
+    {'symbol': 'AAA', 'quantity': 1},
+    {'symbol': 'BBB', 'quantity': 1}
+]
+
+
+def test_holdings_of_the_same_symbol_are_combined():
+    symbols, quantities = aggregate_quantities(HOLDINGS)
+    assert symbols == ['AAA', 'BBB']
+    assert quantities.tolist() == [2.0, 1.0]
+
+
+def test_backtest_values_holdings_against_the_benchmark():
+    result = run_backtest(HOLDINGS, '1M', closes=CLOSES)
+
+    # Starts once every holding has a price; BBB's holiday carries its last close
+    assert result.index.tolist() == DATES[1:].tolist()
+    assert result['portfolio'].tolist() == [40.0, 42.0, 46.0]
+    assert result['benchmark'].tolist() == [4000.0, 4100.0, 4200.0]
+    # The starting portfolio value invested in the benchmark instead
+    assert result['benchmark_scaled'].tolist() == pytest.approx([40.0, 41.0, 42.0])
+
+
+def test_symbols_without_history_are_left_out():
+    holdings = HOLDINGS + [{'symbol': 'GONE', 'quantity': 100}]
+    result = run_backtest(holdings, '1M', closes=CLOSES)
+    assert result['portfolio'].tolist() == [40.0, 42.0, 46.0]
+
+
+def test_no_history_gives_an_empty_backtest():
+    assert run_backtest([{'symbol': 'GONE', 'quantity': 1}], '1M', closes=CLOSES).empty
+    assert run_backtest([], '1M').empty
+
+
+def test_chart_records_round_and_mark_missing_benchmark():
+    result = run_backtest(HOLDINGS, '1M', closes=CLOSES.assign(**{'^GSPC': np.nan}))
+    records = backtest_to_chart_data(result)
+    assert records[0] == {'date': '2024-01-02', 'portfolio': 40, 'sp500': None, 'sp500Scaled': None}
+    assert [record['portfolio'] for record in records] == [40, 42, 46]
@@ -0,0 +1,103 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from config import Config
+from utils.bar_store import BarStore, create_bar_store
+from utils.sqlite import sqlite_path
+
+
+def bars(start, periods, freq):
+    index = pd.date_range(start, periods=periods, freq=freq, name='Date').tz_convert('America/New_York')
+    values = [float(i + 1) for i in range(periods)]
+    return pd.DataFrame({'Open': values, 'High': values, 'Low': values, 'Close': values, 'Volume': values},
+                        index=index)
+
+
+def test_relative_sqlite_paths_resolve_against_the_data_dir(tmp_path):
+    assert sqlite_path('sqlite:///stocks.db', str(tmp_path)) == os.path.join(str(tmp_path), 'stocks.db')
+    assert sqlite_path('sqlite:////srv/data/stocks.db', str(tmp_path)) == '/srv/data/stocks.db'
+    with pytest.raises(ValueError):
+        sqlite_path('postgresql://localhost/stocks', str(tmp_path))
+
+
+@pytest.mark.parametrize('url', ['sqlite://', 'sqlite:///:memory:'])
+def test_in_memory_databases_are_rejected(url, tmp_path):
+    # Every thread's connection would see its own empty database
+    with pytest.raises(ValueError):
+        sqlite_path(url, str(tmp_path))
+
+
+def test_failed_refresh_leaves_the_series_stale(tmp_path, fake_market):
+    store = BarStore(str(tmp_path / 'bars.db'), refresh_interval=0)
+    first = store.get_history('AAPL', period='max')
+    assert not first.empty
+    refreshed_at = store._coverage('AAPL', '1d')['refreshed_at']
+
+    fake_market.down = True
+    time.sleep(0.01)
+    assert len(store.get_history('AAPL', period='max')) == len(first)
+    # The stored bars are served, but the series is not marked fresh
+    assert store._coverage('AAPL', '1d')['refreshed_at'] == refreshed_at
+
+    fake_market.down = False
+    calls = len(fake_market.calls)
+    store.get_history('AAPL', period='max')
+    assert len(fake_market.calls) == calls + 1
+    assert store._coverage('AAPL', '1d')['refreshed_at'] > refreshed_at
+
+
+def test_default_data_dir_is_the_backend_directory(tmp_path, monkeypatch):
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert os.path.samefile(Config.DATA_DIR, backend_dir)
+
+    class StoreConfig(Config):
+        BAR_STORE_ENABLED = True
+        DATA_DIR = str(tmp_path)
+
+    # The working directory no longer decides where the database lives
+    monkeypatch.chdir(os.path.dirname(backend_dir))
+    store = create_bar_store(StoreConfig)
+    assert store.path == os.path.join(str(tmp_path), 'stocks.db')
+    assert os.path.exists(store.path)
+
+
+def test_intraday_writes_schedule_a_prune(tmp_path):
+    store = BarStore(str(tmp_path / 'bars.db'), intraday_retention_days=1, compact_every=2)
+    stale = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=5)
+    store._upsert('AAPL', '5m', bars(stale, 10, '5min'), full=False)
+    store._upsert('AAPL', '1d', bars(stale, 3, 'D'), full=False)
+    assert store._compaction is None
+
+    store._upsert('MSFT', '5m', bars(pd.Timestamp.now(tz='UTC'), 10, '5min'), full=False)
+    store._compaction.join(timeout=10)
+
+    counts = dict(store._connect().execute(
+        'SELECT symbol || interval, COUNT(*) FROM bars GROUP BY symbol, interval').fetchall())
+    # Expired intraday bars are gone; daily bars and fresh intraday bars stay
+    assert counts == {'AAPL1d': 3, 'MSFT5m': 10}
+    assert store._coverage('AAPL', '5m') is None
+
+
+def test_compaction_is_off_by_default(tmp_path):
+    store = BarStore(str(tmp_path / 'bars.db'), intraday_retention_days=1)
+    for _ in range(3):
+        store._upsert('AAPL', '5m', bars(pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=5), 10, '5min'), full=False)
+    assert store._compaction is None
+    assert store.stats()['bars'] == 10
+
+
+def test_only_full_compaction_reclaims_space(tmp_path):
+    store = BarStore(str(tmp_path / 'bars.db'), intraday_retention_days=1)
+    stale = pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=5)
+    freelist = lambda: store._connect().execute('PRAGMA freelist_count').fetchone()[0]
+
+    store._upsert('AAPL', '1m', bars(stale, 5000, '1min'), full=False)
+    assert store.compact(vacuum=False)['deleted_bars'] == 5000
+    assert freelist() > 0
+
+    store._upsert('AAPL', '1m', bars(stale, 5000, '1min'), full=False)
+    assert store.compact()['deleted_bars'] == 5000
+    assert freelist() == 0
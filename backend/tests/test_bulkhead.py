@@ -0,0 +1,224 @@
+"""
+Tests for the upstream bulkheads and circuit breakers
+"""
+
+import threading
+import time
+
+import pytest
+
+from utils.bulkhead import Bulkhead, CircuitBreaker, UpstreamUnavailable, CLOSED, OPEN, HALF_OPEN
+
+
+def make_breaker(**kwargs):
+    options = dict(window=60, min_calls=4, error_rate=0.5, slow_call_seconds=0.2,
+                   slow_call_rate=0.5, open_seconds=0.1)
+    options.update(kwargs)
+    return CircuitBreaker('test', **options)
+
+
+def make_bulkhead(max_concurrent=2, queue_timeout=0.1, **kwargs):
+    return Bulkhead('test', max_concurrent, queue_timeout, make_breaker(**kwargs))
+
+
+def fail():
+    raise ConnectionError('upstream down')
+
+
+def test_breaker_stays_closed_below_min_calls():
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(False, 0.0)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_opens_on_error_rate():
+    breaker = make_breaker()
+    for ok in (True, False, True, False):
+        breaker.record(ok, 0.0)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() > 0
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(True, 0.5)
+    assert breaker.state == OPEN
+    assert 'took over' in breaker.stats()['last_trip_reason']
+
+
+def test_breaker_half_open_allows_one_probe():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.0)
+    time.sleep(0.15)
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_breaker_closes_after_good_probe_and_reopens_after_bad_one():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.0)
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.record(True, 0.0)
+    assert breaker.state == CLOSED
+
+    for _ in range(4):
+        breaker.record(False, 0.0)
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.record(False, 0.0)
+    assert breaker.state == OPEN
+
+
+def test_abandoned_probe_frees_the_half_open_slot():
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False, 0.0)
+    time.sleep(0.15)
+    assert breaker.allow()
+    breaker.abandon()
+    assert breaker.allow()
+
+
+def test_bulkhead_serves_last_good_result_while_failing():
+    bulkhead = make_bulkhead()
+    assert bulkhead.call(lambda: 'fresh', key='k') == 'fresh'
+    assert bulkhead.call(fail, key='k') == 'fresh'
+    with pytest.raises(ConnectionError):
+        bulkhead.call(fail, key='other')
+
+
+def test_open_bulkhead_short_circuits():
+    bulkhead = make_bulkhead()
+    bulkhead.call(lambda: 'fresh', key='k')
+    for _ in range(4):
+        bulkhead.call(fail, key='k')
+    assert bulkhead.breaker.state == OPEN
+
+    calls = []
+    assert bulkhead.call(lambda: calls.append(1), key='k') == 'fresh'
+    with pytest.raises(UpstreamUnavailable):
+        bulkhead.call(lambda: calls.append(1), key='other')
+    assert calls == []
+
+
+def test_queue_deadline_rejects_when_full():
+    bulkhead = make_bulkhead(max_concurrent=1, queue_timeout=0.05)
+    release = threading.Event()
+    holder = threading.Thread(target=lambda: bulkhead.call(release.wait))
+    holder.start()
+    time.sleep(0.02)
+    try:
+        with pytest.raises(UpstreamUnavailable):
+            bulkhead.call(lambda: 'never')
+    finally:
+        release.set()
+        holder.join()
+    assert bulkhead.stats()['rejected'] == 1
+    assert bulkhead.stats()['in_flight'] == 0
+
+
+def test_not_found_errors_count_as_successful_calls():
+    bulkhead = make_bulkhead()
+    for _ in range(8):
+        with pytest.raises(LookupError):
+            bulkhead.call(lambda: {}['missing'], is_failure=lambda error: not isinstance(error, LookupError))
+    assert bulkhead.breaker.state == CLOSED
+
+
+def test_probe_settles_when_failure_classifier_raises():
+    bulkhead = make_bulkhead()
+    for _ in range(4):
+        with pytest.raises(ConnectionError):
+            bulkhead.call(fail)
+    time.sleep(0.15)
+    assert bulkhead.breaker.state == HALF_OPEN
+
+    def broken_classifier(error):
+        raise KeyError('classifier bug')
+
+    with pytest.raises(KeyError):
+        bulkhead.call(fail, is_failure=broken_classifier)
+    # The probe was recorded as a failure rather than left in flight forever
+    assert bulkhead.breaker.state == OPEN
+    time.sleep(0.15)
+    assert bulkhead.call(lambda: 'ok') == 'ok'
+    assert bulkhead.breaker.state == CLOSED
+
+
+def test_unknown_tickers_do_not_open_the_yahoo_breaker(client, fake_market):
+    from utils.bulkhead import yahoo_bulkhead
+
+    fake_market.unknown.update({'NOPE', 'TYPO'})
+    for _ in range(10):
+        assert client.get('/api/stock/info/NOPE').status_code == 404
+        assert client.get('/api/stock/history/TYPO').get_json()['data'] == []
+    assert yahoo_bulkhead.breaker.state == CLOSED
+    assert client.get('/api/stock/info/AAPL').status_code == 200
+
+
+def test_yahoo_outage_opens_the_breaker_and_serves_last_good(client, fake_market):
+    from utils.bulkhead import yahoo_bulkhead
+
+    fresh = client.get('/api/stock/info/AAPL').get_json()
+    fake_market.down = True
+    for _ in range(yahoo_bulkhead.breaker.min_calls):
+        assert client.get('/api/stock/info/AAPL').get_json()['price'] == fresh['price']
+    assert yahoo_bulkhead.breaker.state == OPEN
+
+    health = client.get('/api/health').get_json()
+    assert health['status'] == 'degraded'
+    assert health['upstreams']['yahoo']['state'] == OPEN
+
+
+def test_call_async_shares_the_breaker_and_honours_the_queue_deadline():
+    import asyncio
+
+    bulkhead = make_bulkhead(max_concurrent=1, queue_timeout=0.05, slow_call_seconds=1)
+
+    async def slow():
+        await asyncio.sleep(0.2)
+        return 'slow'
+
+    async def broken():
+        raise ConnectionError('upstream down')
+
+    async def run():
+        first = asyncio.ensure_future(bulkhead.call_async(slow))
+        await asyncio.sleep(0.01)
+        with pytest.raises(UpstreamUnavailable):
+            await bulkhead.call_async(slow)
+        assert await first == 'slow'
+        # With the successful call that makes min_calls, so the breaker opens on the last one
+        for _ in range(3):
+            with pytest.raises(ConnectionError):
+                await bulkhead.call_async(broken)
+
+    asyncio.run(run())
+    assert bulkhead.breaker.state == OPEN
+    assert bulkhead.stats()['in_flight'] == 0
+
+
+def test_with_last_good_serves_stale_outside_the_wrapped_layer():
+    bulkhead = make_bulkhead()
+    stored = []
+
+    def through_cache(fn):
+        # Stands in for a response cache sitting between the caller and call()
+        result = fn()
+        stored.append(result)
+        return result
+
+    assert bulkhead.with_last_good(lambda: through_cache(lambda: bulkhead.call(lambda: 'fresh')), 'k') == 'fresh'
+    assert bulkhead.with_last_good(lambda: through_cache(lambda: bulkhead.call(fail)), 'k') == 'fresh'
+    assert stored == ['fresh']
+    assert bulkhead.stats()['stale_served'] == 1
+
+    with pytest.raises(ConnectionError):
+        bulkhead.with_last_good(lambda: bulkhead.call(fail), 'other')
@@ -0,0 +1,144 @@
+import threading
+import time
+
+import fakeredis
+import pytest
+
+from utils.cache import RedisCache, TieredCache, TTLCache
+
+
+class BrokenRedis:
+    """Client whose every command fails, as when Redis is unreachable"""
+
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis is down")
+        return fail
+
+
+def make_tiered(client=None, lock_wait=5):
+    l2 = RedisCache(ttl=60, prefix='test:', lock_timeout=10, client=client or fakeredis.FakeRedis())
+    return TieredCache(TTLCache(ttl=60), l2, lock_wait=lock_wait, poll_interval=0.01)
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(ttl=0.05)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.06)
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(max_entries=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert 'a' in cache and 'c' in cache
+    assert 'b' not in cache
+
+
+def test_ttl_cache_bounds_bytes():
+    cache = TTLCache(max_bytes=100)
+    assert not cache.set('big', b'x' * 200)
+    cache.set('a', b'x' * 60)
+    cache.set('b', b'x' * 60)
+    assert 'a' not in cache
+    assert cache.stats()['bytes'] <= 100
+
+
+def test_ttl_cache_does_not_store_none_results():
+    cache = TTLCache()
+    assert cache.get_or_load('a', lambda: None) is None
+    assert 'a' not in cache
+
+
+def test_l2_hit_fills_l1():
+    client = fakeredis.FakeRedis()
+    writer, reader = make_tiered(client), make_tiered(client)
+    writer.set('quote', {'price': 10.5})
+
+    assert reader.l1.get('quote') is None
+    assert reader.get('quote') == {'price': 10.5}
+    assert reader.l1.get('quote') == {'price': 10.5}
+    assert reader.stats()['l2']['hits'] == 1
+
+
+def test_l1_hit_skips_l2():
+    cache = make_tiered()
+    cache.set('quote', [1, 2, 3])
+    cache.get('quote')
+    assert cache.stats()['l2']['hits'] == 0
+    assert cache.stats()['l1']['hits'] == 1
+
+
+def test_large_values_round_trip_through_l2():
+    client = fakeredis.FakeRedis()
+    make_tiered(client).set('chart', b'y' * 10000)
+    assert make_tiered(client).get('chart') == b'y' * 10000
+
+
+def test_stampede_runs_loader_once():
+    client = fakeredis.FakeRedis()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'value'
+
+    results = []
+    workers = [
+        threading.Thread(target=lambda: results.append(make_tiered(client).get_or_load('hot', loader)))
+        for _ in range(8)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+
+
+def test_uncacheable_result_does_not_stall_waiters():
+    client = fakeredis.FakeRedis()
+    leader_started = threading.Event()
+
+    def leader_loader():
+        leader_started.set()
+        time.sleep(0.1)
+        return None
+
+    leader = threading.Thread(target=lambda: make_tiered(client).get_or_load('missing', leader_loader))
+    leader.start()
+    leader_started.wait()
+
+    started = time.monotonic()
+    value = make_tiered(client, lock_wait=5).get_or_load('missing', lambda: 'loaded')
+    leader.join()
+
+    assert value == 'loaded'
+    assert time.monotonic() - started < 1
+
+
+def test_redis_errors_fail_open():
+    cache = make_tiered(BrokenRedis())
+    cache.l1.ttl = 0  # force every lookup past L1
+
+    assert cache.get('quote') is None
+    assert cache.get_or_load('quote', lambda: 'fresh') == 'fresh'
+    assert cache.stats()['l2']['errors'] > 0
+
+
+def test_lock_is_released_when_loader_raises():
+    cache = make_tiered()
+
+    def boom():
+        raise RuntimeError("upstream failed")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load('quote', boom)
+    assert cache.l2.acquire_lock('quote') is not None
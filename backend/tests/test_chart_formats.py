@@ -0,0 +1,70 @@
+import struct
+
+import numpy as np
+import pandas as pd
+
+from utils.market_data import (
+    BINARY_COLUMNS, BINARY_CONTENT_TYPE, BINARY_MAGIC, history_to_binary, history_to_chart_data,
+    history_to_columns
+)
+
+HISTORY = pd.DataFrame({
+    'Open': [10.004, 11.0],
+    'High': [12.0, 13.0],
+    'Low': [9.0, 10.5],
+    'Close': [11.506, 12.25],
+    'Volume': [1000.0, np.nan]
+}, index=pd.DatetimeIndex(['2024-01-02 09:30', '2024-01-03 09:30'], name='Date').tz_localize('America/New_York'))
+
+
+def unpack(payload):
+    magic, rows, columns, _ = struct.unpack_from('<4sIII', payload)
+    body = np.frombuffer(payload, dtype='<f8', offset=16).reshape(columns, rows)
+    return magic, dict(zip(BINARY_COLUMNS, body))
+
+
+def test_columnar_format_matches_records():
+    columns = history_to_columns(HISTORY)
+    records = history_to_chart_data(HISTORY)
+    assert columns['price'] == [record['price'] for record in records] == [11.51, 12.25]
+    assert columns['open'] == [10.0, 11.0]
+    assert columns['volume'] == [1000, 0]
+    # Timestamps are UTC epoch seconds
+    assert columns['timestamp'] == [1704205800, 1704292200]
+
+
+def test_empty_history_has_empty_columns():
+    assert history_to_columns(pd.DataFrame()) == {key: [] for key in BINARY_COLUMNS}
+
+
+def test_binary_format_is_an_aligned_float64_matrix():
+    payload = history_to_binary(HISTORY)
+    assert len(payload) == 16 + len(BINARY_COLUMNS) * len(HISTORY) * 8
+
+    magic, columns = unpack(payload)
+    assert magic == BINARY_MAGIC
+    assert columns['timestamp'].tolist() == [1704205800.0, 1704292200.0]
+    # Prices keep full precision; only the JSON formats round
+    assert columns['price'].tolist() == [11.506, 12.25]
+    assert columns['volume'].tolist() == [1000.0, 0.0]
+
+
+def test_empty_history_is_just_the_header():
+    payload = history_to_binary(None)
+    assert struct.unpack('<4sIII', payload) == (BINARY_MAGIC, 0, len(BINARY_COLUMNS), 0)
+
+
+def test_history_endpoint_serves_every_format(client):
+    records = client.get('/api/stock/history/AAPL?period=1mo').get_json()
+    columnar = client.get('/api/stock/history/AAPL?period=1mo&format=columnar').get_json()
+    assert columnar['format'] == 'columnar'
+    assert columnar['data']['price'] == [record['price'] for record in records['data']]
+
+    binary = client.get('/api/stock/history/AAPL?period=1mo&format=binary')
+    assert binary.content_type == BINARY_CONTENT_TYPE
+    _, columns = unpack(binary.data)
+    assert columns['timestamp'].tolist() == columnar['data']['timestamp']
+
+
+def test_history_endpoint_rejects_unknown_formats(client):
+    assert client.get('/api/stock/history/AAPL?format=csv').status_code == 400
@@ -0,0 +1,57 @@
+import threading
+import time
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def slow_history(fake_market, monkeypatch):
+    """Hold up MSFT's history until released; other symbols answer at once"""
+    release = threading.Event()
+    finished = threading.Event()
+    get_historical_data = app_module.get_historical_data
+
+    def slow(symbol, *args, **kwargs):
+        if symbol != 'MSFT':
+            return get_historical_data(symbol, *args, **kwargs)
+        release.wait(5)
+        try:
+            return get_historical_data(symbol, *args, **kwargs)
+        finally:
+            finished.set()
+
+    monkeypatch.setattr(app_module, 'get_historical_data', slow)
+    yield release
+    # Let the abandoned fetch finish while the fake market is still in place
+    release.set()
+    finished.wait(5)
+
+
+def test_compare_keeps_request_order_and_skips_unknown_symbols(client, fake_market):
+    fake_market.unknown.add('NOPE')
+    response = client.post('/api/stocks/compare', json={'symbols': ['msft', 'NOPE', 'AAPL']})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [stock['symbol'] for stock in body] == ['MSFT', 'AAPL']
+    assert all(len(stock['chartData']) > 0 for stock in body)
+
+
+def test_compare_rejects_more_than_max_stocks(client, monkeypatch):
+    monkeypatch.setattr(app_module.current_config, 'MAX_STOCKS_COMPARE', 2)
+    response = client.post('/api/stocks/compare', json={'symbols': ['AAPL', 'MSFT', 'JNJ']})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Maximum 2 stocks allowed'
+
+
+def test_compare_answers_at_the_deadline_without_slow_charts(client, slow_history, monkeypatch):
+    monkeypatch.setattr(app_module.current_config, 'YFINANCE_TIMEOUT', 0.3)
+    started = time.monotonic()
+    response = client.post('/api/stocks/compare', json={'symbols': ['AAPL', 'MSFT'], 'format': 'columnar'})
+    assert time.monotonic() - started < 3
+
+    body = {stock['symbol']: stock for stock in response.get_json()}
+    assert len(body['AAPL']['chartData']['price']) > 0
+    # The late chart is replaced by an empty one in the requested format
+    assert body['MSFT']['chartData']['price'] == []
@@ -0,0 +1,119 @@
+"""
+Tests for the rolling covariance estimate and its cache
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.covariance import CovarianceCache, RollingCovariance
+
+
+def random_returns(symbols, days, seed=0, end='2024-06-28'):
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range(end=end, periods=days)
+    return pd.DataFrame(rng.normal(0.0005, 0.02, (days, len(symbols))), index=index, columns=symbols)
+
+
+def test_rolling_covariance_matches_numpy():
+    returns = random_returns(['A', 'B', 'C'], 300)
+    estimate = RollingCovariance.from_returns(returns.iloc[:100], window=60)
+    # Fold in the rest a few rows at a time, past several window resums
+    for start in range(100, 300, 7):
+        estimate.append(returns.iloc[:start + 7])
+
+    window = returns.tail(60).to_numpy()
+    assert estimate.count == 60
+    assert estimate.last_date == returns.index[-1]
+    np.testing.assert_allclose(estimate.covariance(), np.cov(window, rowvar=False), rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(estimate.mean(), window.mean(axis=0), rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(estimate.window_returns(), window)
+
+
+def test_covariance_subset_and_correlation():
+    returns = random_returns(['A', 'B', 'C'], 80, seed=1)
+    estimate = RollingCovariance.from_returns(returns, window=80)
+    expected = np.cov(returns[['C', 'A']].to_numpy(), rowvar=False)
+    np.testing.assert_allclose(estimate.covariance(['C', 'A']), expected, rtol=1e-9)
+    np.testing.assert_allclose(estimate.correlation(['C', 'A']),
+                               np.corrcoef(returns[['C', 'A']].to_numpy(), rowvar=False), rtol=1e-9)
+
+
+def test_append_ignores_rows_already_folded_in():
+    returns = random_returns(['A', 'B'], 50, seed=2)
+    estimate = RollingCovariance.from_returns(returns, window=30)
+    assert estimate.append(returns) == 0
+    np.testing.assert_allclose(estimate.covariance(), np.cov(returns.tail(30).to_numpy(), rowvar=False))
+
+
+class RecordingLoader:
+    """Serves slices of a fixed return history and records what was asked for"""
+
+    def __init__(self, returns):
+        self.returns = returns
+        self.calls = []
+
+    def __call__(self, universe, since):
+        self.calls.append((tuple(universe), since))
+        frame = self.returns[[symbol for symbol in universe if symbol in self.returns.columns]]
+        frame = frame.dropna()
+        return frame[frame.index >= since] if since is not None else frame
+
+
+def test_cache_update_loads_only_bars_since_the_estimate():
+    history = random_returns(['A', 'B', 'C'], 300, seed=3)
+    loader = RecordingLoader(history.iloc[:280])
+    cache = CovarianceCache(refresh_interval=0)
+    estimate = cache.get(['A', 'B'], loader, window=252)
+    assert loader.calls == [(('A', 'B'), None)]
+
+    loader.returns = history
+    updated = cache.get(['A', 'B'], loader, window=252)
+    assert updated is estimate
+    assert loader.calls[-1] == (('A', 'B'), history.index[279])
+    assert updated.last_date == history.index[-1]
+    np.testing.assert_allclose(updated.covariance(), np.cov(history[['A', 'B']].tail(252).to_numpy(), rowvar=False),
+                               rtol=1e-9)
+    assert cache.stats()['incremental_updates'] == 1
+
+
+def test_cache_skips_the_update_check_within_the_refresh_interval():
+    loader = RecordingLoader(random_returns(['A', 'B'], 300, seed=4))
+    cache = CovarianceCache(refresh_interval=60)
+    cache.get(['A', 'B'], loader, window=252)
+    cache.get(['B', 'A'], loader, window=252)
+    assert len(loader.calls) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_overlapping_portfolios_do_not_merge_universes():
+    returns = random_returns(['A', 'B', 'C', 'D'], 300, seed=5)
+    cache = CovarianceCache(refresh_interval=0)
+    loader = RecordingLoader(returns)
+    cache.get(['A', 'B'], loader, window=252)
+    cache.get(['B', 'C'], loader, window=252)
+    assert sorted(cache.stats()['universe_sizes']) == [2, 2]
+    assert all(len(universe) == 2 for universe, _ in loader.calls)
+
+
+def test_short_history_does_not_shorten_other_portfolios():
+    returns = random_returns(['A', 'B', 'NEW'], 300, seed=6)
+    returns.loc[returns.index[:-40], 'NEW'] = np.nan
+    cache = CovarianceCache(refresh_interval=0)
+    loader = RecordingLoader(returns)
+
+    recent = cache.get(['A', 'B', 'NEW'], loader, window=252)
+    assert recent.count == 40
+    # A and B fall inside the cached universe, but its window is not full
+    established = cache.get(['A', 'B'], loader, window=252)
+    assert established is not recent
+    assert established.count == 252
+
+
+def test_symbol_without_history_is_left_out_without_reloading():
+    returns = random_returns(['A', 'B'], 300, seed=7)
+    cache = CovarianceCache(refresh_interval=0)
+    loader = RecordingLoader(returns)
+    estimate = cache.get(['A', 'B', 'GONE'], loader, window=252)
+    assert estimate.symbols == ['A', 'B']
+    assert cache.get(['A', 'B', 'GONE'], loader, window=252) is estimate
+    assert loader.calls[-1][1] is not None
@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+
+import pytest
+
+from routes import news_routes
+from utils.jobs import (
+    FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, QueueFullError, follow_events
+)
+
+PORTFOLIO = {'stocks': [{'symbol': 'AAPL', 'quantity': 10}]}
+
+
+def wait_for(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.finished
+
+
+def parse_stream(lines):
+    """(event, data) pairs of a server-sent event stream, skipping keep-alives"""
+    events = []
+    for chunk in lines:
+        if chunk.startswith(':'):
+            continue
+        fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(workers=2, max_pending=2, retention=60)
+    yield queue
+    queue.shutdown()
+
+
+def test_job_moves_from_queued_to_running_to_succeeded(queue):
+    release = threading.Event()
+    started = threading.Event()
+
+    def work(job):
+        started.set()
+        job.emit('stage', {'stage': 'news', 'status': 'ok'})
+        release.wait(5)
+        return {'answer': 42}
+
+    job = queue.submit('test', work)
+    assert job.status in (QUEUED, RUNNING)
+    started.wait(5)
+    assert job.status == RUNNING
+    assert 'result' not in job.to_dict()
+
+    release.set()
+    wait_for(job)
+    body = job.to_dict()
+    assert body['status'] == SUCCEEDED
+    assert body['result'] == {'answer': 42}
+    assert body['stages'] == [{'stage': 'news', 'status': 'ok'}]
+    statuses = [event['data']['status'] for event in job.events if event['event'] == 'status']
+    assert statuses == [RUNNING, SUCCEEDED]
+
+
+def test_failing_job_records_its_error(queue):
+    def work(job):
+        raise RuntimeError('news service unavailable')
+
+    job = queue.submit('test', work)
+    wait_for(job)
+    body = job.to_dict()
+    assert body['status'] == FAILED
+    assert body['error'] == 'news service unavailable'
+    assert 'result' not in body
+
+
+def test_queue_rejects_work_past_max_pending(queue):
+    release = threading.Event()
+    jobs = [queue.submit('test', lambda job: release.wait(5)) for _ in range(2)]
+    with pytest.raises(QueueFullError):
+        queue.submit('test', lambda job: None)
+    assert queue.stats()['rejected'] == 1
+
+    # Finished jobs no longer count against the limit
+    release.set()
+    for job in jobs:
+        wait_for(job)
+    assert queue.submit('test', lambda job: 'ok') is not None
+
+
+def test_finished_jobs_expire_after_retention():
+    queue = JobQueue(workers=1, retention=0)
+    job = queue.submit('test', lambda job: 'ok')
+    wait_for(job)
+    time.sleep(0.01)
+    queue.submit('test', lambda job: 'ok')
+    assert queue.get(job.id) is None
+    queue.shutdown()
+
+
+def test_event_stream_ends_on_a_terminal_state(queue):
+    release = threading.Event()
+
+    def work(job):
+        job.emit('stage', {'stage': 'news'})
+        release.wait(5)
+        job.emit('stage', {'stage': 'sentiment'})
+        return {'done': True}
+
+    job = queue.submit('test', work)
+    stream = follow_events(job, heartbeat=0.05)
+    seen = [next(stream) for _ in range(3)]
+    release.set()
+    seen.extend(stream)
+
+    # Idle periods produce keep-alives, and the stream closes after the final summary
+    assert ': keep-alive\n\n' in seen
+    events = parse_stream(seen)
+    assert [event for event, _ in events] == ['status', 'stage', 'stage', 'status', 'done']
+    assert events[-1][1]['status'] == SUCCEEDED
+
+
+def test_event_stream_resumes_after_last_event_id(queue):
+    job = queue.submit('test', lambda job: job.emit('stage', {'stage': 'news'}) or {'done': True})
+    wait_for(job)
+    events = parse_stream(follow_events(job, last_id=2, heartbeat=0.05))
+    assert [event for event, _ in events] == ['status', 'done']
+
+
+@pytest.fixture
+def jobs_client(queue, monkeypatch):
+    import app as app_module
+
+    monkeypatch.delenv('GROQ_API_KEY_NEWS', raising=False)
+    monkeypatch.setattr(news_routes, 'job_queue', queue)
+    return app_module.app.test_client()
+
+
+def test_async_analysis_is_accepted_and_pollable(jobs_client, queue):
+    response = jobs_client.post('/api/portfolio/complete-analysis?async=true',
+                                json={'portfolio_input': PORTFOLIO})
+    assert response.status_code == 202
+    body = response.get_json()
+    assert response.headers['Location'].endswith(body['status_url'])
+
+    wait_for(queue.get(body['job_id']))
+    job = jobs_client.get(body['status_url']).get_json()
+    assert job['status'] == SUCCEEDED
+    assert job['result']['portfolio_data'] == PORTFOLIO
+
+    stream = jobs_client.get(body['events_url'])
+    assert stream.mimetype == 'text/event-stream'
+    events = parse_stream(stream.get_data(as_text=True).split('\n\n')[:-1])
+    assert events[-1][0] == 'done'
+
+
+def test_full_queue_answers_503_with_retry_after(jobs_client, queue):
+    release = threading.Event()
+    for _ in range(2):
+        queue.submit('test', lambda job: release.wait(5))
+
+    response = jobs_client.post('/api/portfolio/complete-analysis',
+                                json={'portfolio_input': PORTFOLIO, 'async': True})
+    release.set()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '30'
+
+
+def test_unknown_jobs_are_404(jobs_client):
+    assert jobs_client.get('/api/jobs/does-not-exist').status_code == 404
+    assert jobs_client.get('/api/jobs/does-not-exist/events').status_code == 404
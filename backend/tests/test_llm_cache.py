@@ -0,0 +1,75 @@
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from utils import llm_cache as llm_cache_module
+from utils import news_ai
+from utils.bulkhead import Bulkhead, CircuitBreaker
+from utils.llm_cache import LLMResponseCache
+
+
+class FakeCrew:
+    """Crew whose kickoff returns the next queued response, or raises it"""
+
+    responses = []
+
+    def __init__(self, agents, tasks, **kwargs):
+        self.tasks = tasks
+
+    def kickoff(self):
+        response = FakeCrew.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def make_task(description):
+    agent = SimpleNamespace(role='News Analyst', goal='Summarize', backstory='')
+    return SimpleNamespace(agent=agent, description=description, expected_output='JSON')
+
+
+@pytest.fixture
+def news_agent(tmp_path, monkeypatch):
+    cache = LLMResponseCache(str(tmp_path / 'llm_cache.db'))
+    breaker = CircuitBreaker('llm', window=60, min_calls=10, error_rate=0.5, slow_call_seconds=30,
+                             slow_call_rate=0.5, open_seconds=30)
+    monkeypatch.setattr(llm_cache_module, 'llm_cache', cache)
+    monkeypatch.setattr(news_ai, 'llm_bulkhead', Bulkhead('llm', 2, 1, breaker))
+    monkeypatch.setattr(news_ai, 'Crew', FakeCrew)
+    FakeCrew.responses = []
+    agent = object.__new__(news_ai.NewsAnalysisAgent)
+    agent.llm = SimpleNamespace(model='groq/test', temperature=0.7)
+    return agent, cache
+
+
+def test_identical_prompts_are_answered_from_the_cache(news_agent):
+    agent, cache = news_agent
+    FakeCrew.responses = ['{"summary": "up"}']
+    assert agent._run_crew(make_task('AAPL news'), ('news', 'AAPL')) == {'summary': 'up'}
+    assert agent._run_crew(make_task('AAPL news'), ('news', 'AAPL')) == {'summary': 'up'}
+    assert cache.stats()['hits'] == 1
+
+
+def test_stale_fallback_is_not_cached_under_a_new_prompt(news_agent):
+    agent, cache = news_agent
+    FakeCrew.responses = ['{"summary": "old"}', ConnectionError('llm down'), '{"summary": "new"}']
+    agent._run_crew(make_task('AAPL news, monday'), ('news', 'AAPL'))
+
+    # The LLM is down: the last good analysis is served but not stored for this prompt
+    assert agent._run_crew(make_task('AAPL news, tuesday'), ('news', 'AAPL')) == {'summary': 'old'}
+    assert cache.stats()['entries'] == 1
+
+    # Once it recovers the prompt is sent to the LLM again
+    assert agent._run_crew(make_task('AAPL news, tuesday'), ('news', 'AAPL')) == {'summary': 'new'}
+    assert cache.stats()['entries'] == 2
+
+
+def test_importing_the_cache_leaves_the_bar_store_alone():
+    # The bar store opens its database and starts compaction on import
+    code = "import sys, utils.llm_cache; sys.exit('utils.bar_store' in sys.modules)"
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=backend_dir, env=dict(os.environ, FLASK_ENV='testing'))
+    assert result.returncode == 0
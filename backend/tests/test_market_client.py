@@ -0,0 +1,113 @@
+import pandas as pd
+import pytest
+from yfinance.exceptions import YFTickerMissingError
+
+from conftest import FakeHTTPError, fake_history
+from utils import market_client as market_client_module
+from utils.market_client import MarketDataClient, is_transient, is_upstream_failure
+
+
+class FakeTicker:
+    """Ticker whose history() raises the queued errors before answering"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.timeouts = []
+
+    def history(self, timeout=None, raise_errors=False, **kwargs):
+        self.timeouts.append(timeout)
+        if self.errors:
+            raise self.errors.pop(0)
+        return fake_history('AAPL', kwargs.get('period', '1y'))
+
+
+def make_client(monkeypatch, ticker, **kwargs):
+    client = MarketDataClient(**{'timeout': 5, 'retries': 2, 'backoff': 0.001, 'backoff_max': 0.001, **kwargs})
+    monkeypatch.setattr(client, 'ticker', lambda symbol: ticker)
+    return client
+
+
+@pytest.mark.parametrize('error, transient', [
+    (ConnectionError('reset'), True),
+    (TimeoutError('slow'), True),
+    (FakeHTTPError(429), True),
+    (FakeHTTPError(503), True),
+    (FakeHTTPError(404), False),
+    (ValueError('bad'), False)
+])
+def test_transient_errors(error, transient):
+    assert is_transient(error) is transient
+
+
+@pytest.mark.parametrize('error, failure', [
+    (ConnectionError('reset'), True),
+    (FakeHTTPError(429), True),
+    (FakeHTTPError(502), True),
+    (FakeHTTPError(404), False),
+    (YFTickerMissingError('NOPE', 'no data'), False)
+])
+def test_upstream_failures(error, failure):
+    assert is_upstream_failure(error) is failure
+
+
+def test_transient_errors_are_retried(monkeypatch):
+    ticker = FakeTicker([ConnectionError('reset'), FakeHTTPError(503)])
+    client = make_client(monkeypatch, ticker)
+    assert not client.history('AAPL', raise_errors=True).empty
+    assert len(ticker.timeouts) == 3
+    assert client.stats()['retried'] == 2
+    assert client.stats()['failures'] == 0
+
+
+def test_gives_up_after_the_configured_retries(monkeypatch):
+    ticker = FakeTicker([ConnectionError('reset')] * 5)
+    client = make_client(monkeypatch, ticker, retries=1)
+    with pytest.raises(ConnectionError):
+        client.history('AAPL', raise_errors=True)
+    assert len(ticker.timeouts) == 2
+    assert client.stats()['failures'] == 1
+
+
+def test_permanent_errors_are_not_retried(monkeypatch):
+    ticker = FakeTicker([FakeHTTPError(404)])
+    client = make_client(monkeypatch, ticker)
+    with pytest.raises(FakeHTTPError):
+        client.history('AAPL', raise_errors=True)
+    assert len(ticker.timeouts) == 1
+
+
+def test_retries_stop_at_the_deadline(monkeypatch):
+    ticker = FakeTicker([ConnectionError('reset')] * 5)
+    client = make_client(monkeypatch, ticker, timeout=0.5, retries=5)
+    # The next backoff would end past the deadline, so there is no second attempt
+    monkeypatch.setattr(market_client_module, 'backoff_delay', lambda attempt, base, cap: 1.0)
+    with pytest.raises(ConnectionError):
+        client.history('AAPL', raise_errors=True)
+    assert len(ticker.timeouts) == 1
+    assert 0 < ticker.timeouts[0] <= 0.5
+
+
+def test_history_returns_an_empty_frame_unless_raise_errors(monkeypatch):
+    client = make_client(monkeypatch, FakeTicker([FakeHTTPError(404)] * 2))
+    assert client.history('AAPL').empty
+    with pytest.raises(FakeHTTPError):
+        client.history('AAPL', raise_errors=True)
+
+
+def test_download_uses_the_shared_session_and_deadline(monkeypatch):
+    calls = []
+
+    def fake_download(symbols, session=None, timeout=None, **kwargs):
+        calls.append((symbols, session, timeout, kwargs))
+        return pd.DataFrame()
+
+    client = MarketDataClient(timeout=3)
+    monkeypatch.setattr(client, '_session', object())
+    monkeypatch.setattr(market_client_module.yf, 'download', fake_download)
+    client.download(('AAPL', 'MSFT'), period='1mo')
+
+    symbols, session, timeout, kwargs = calls[0]
+    assert symbols == ['AAPL', 'MSFT']
+    assert session is client.session
+    assert 0 < timeout <= 3
+    assert kwargs == {'period': '1mo'}
@@ -0,0 +1,179 @@
+import threading
+import time
+
+import pytest
+
+from utils import news_ai
+from utils.cache import TTLCache
+from utils.news_ai import NewsAnalysisAgent
+
+
+def canned(stage, symbol):
+    """What each stage's crew answers for a symbol"""
+    return {
+        'news': {'stocks': [{'symbol': symbol, 'news_summary': f'{symbol} news'}]},
+        'sentiment': {'sentiments': [{'symbol': symbol, 'sentiment': 'BULLISH'}]},
+        'headlines': {'headlines': [{'symbol': symbol, 'headlines': {'breaking': f'{symbol} moves'}}]}
+    }[stage]
+
+
+class StubNewsAgent(NewsAnalysisAgent):
+    """NewsAnalysisAgent whose crews answer from canned stage results, without an LLM
+
+    overrides maps a stage to fn(symbol) replacing the canned answer; every
+    crew run is recorded as (stage, symbol).
+    """
+
+    def __init__(self, **overrides):
+        self.overrides = overrides
+        self.runs = []
+        self._runs_lock = threading.Lock()
+
+    def create_news_analysis_task(self, symbols, agent=None):
+        return ('news', symbols[0])
+
+    def create_sentiment_analysis_task(self, news_data, agent=None):
+        return ('sentiment', news_data['stocks'][0]['symbol'])
+
+    def create_headline_generation_task(self, news_data, agent=None):
+        return ('headlines', news_data['stocks'][0]['symbol'])
+
+    def _run_crew(self, task, stale_key=None):
+        stage, symbol = task
+        with self._runs_lock:
+            self.runs.append(task)
+        if stage in self.overrides:
+            return self.overrides[stage](symbol)
+        return canned(stage, symbol)
+
+
+@pytest.fixture(autouse=True)
+def fresh_news_cache(monkeypatch):
+    monkeypatch.setattr(news_ai, 'news_cache', TTLCache(max_entries=100, max_bytes=1024 * 1024, ttl=60))
+
+
+@pytest.fixture
+def release():
+    release = threading.Event()
+    yield release
+    release.set()
+
+
+def test_stages_run_side_by_side():
+    # Each stage only finishes once the other has started
+    barrier = threading.Barrier(2, timeout=5)
+
+    def meet(name):
+        barrier.wait()
+        return {'stage': name}
+
+    status = {}
+    results = StubNewsAgent()._run_stages(
+        {'sentiment': lambda: meet('sentiment'), 'headlines': lambda: meet('headlines')}, 5, status
+    )
+    assert results == {'sentiment': {'stage': 'sentiment'}, 'headlines': {'stage': 'headlines'}}
+    assert {name: entry['status'] for name, entry in status.items()} == {'sentiment': 'ok', 'headlines': 'ok'}
+
+
+def test_slow_stage_times_out_without_failing_the_others(release):
+    def fail():
+        raise RuntimeError('bad JSON')
+
+    settled = []
+    status = {}
+    started = time.monotonic()
+    results = StubNewsAgent()._run_stages({
+        'fast': lambda: {'done': True},
+        'slow': lambda: release.wait(5) and {'done': True},
+        'broken': fail
+    }, 0.2, status, lambda name, result, entry: settled.append(name))
+
+    assert time.monotonic() - started < 2
+    assert results['fast'] == {'done': True}
+    assert results['slow'] == {'error': 'slow stage timed out after 0.2s'}
+    assert results['broken'] == {'error': 'broken stage failed: bad JSON'}
+    assert {name: entry['status'] for name, entry in status.items()} == {
+        'fast': 'ok', 'slow': 'timeout', 'broken': 'error'
+    }
+    # Every stage is reported as it settles, the timed-out one last
+    assert sorted(settled[:2]) == ['broken', 'fast'] and settled[2] == 'slow'
+
+
+def test_symbol_analysis_keeps_finished_stages_when_one_times_out(release, monkeypatch):
+    monkeypatch.setattr(news_ai._config, 'NEWS_STAGE_TIMEOUT', 0.2)
+    agent = StubNewsAgent(headlines=lambda symbol: release.wait(5) and canned('headlines', symbol))
+    events = []
+
+    analysis = agent.analyze_symbol('AAPL', events.append)
+    assert analysis['news'] == {'symbol': 'AAPL', 'news_summary': 'AAPL news'}
+    assert analysis['sentiment']['sentiment'] == 'BULLISH'
+    assert analysis['headlines'] is None
+    assert analysis['stage_status']['headlines']['status'] == 'timeout'
+    assert analysis['stage_status']['complete'] is False
+    assert [(event['stage'], event['status']) for event in events] == [
+        ('news', 'ok'), ('sentiment', 'ok'), ('headlines', 'timeout')
+    ]
+
+
+def test_failed_news_stage_skips_the_dependent_stages():
+    def fail(symbol):
+        raise RuntimeError('LLM unavailable')
+
+    agent = StubNewsAgent(news=fail)
+    analysis = agent.analyze_symbol('AAPL')
+    assert analysis['error'] == 'news stage failed: LLM unavailable'
+    assert analysis['stage_status']['complete'] is False
+    assert agent.runs == [('news', 'AAPL')]
+
+
+def test_portfolio_news_runs_one_analysis_per_symbol():
+    agent = StubNewsAgent()
+    result = agent.analyze_portfolio_news({'stocks': ['aapl', 'MSFT', 'AAPL']})
+
+    assert [stock['symbol'] for stock in result['news_analysis']['stocks']] == ['AAPL', 'MSFT']
+    assert [entry['symbol'] for entry in result['sentiment_analysis']['sentiments']] == ['AAPL', 'MSFT']
+    assert result['partial'] is False
+    assert sorted(agent.runs) == sorted(
+        (stage, symbol) for stage in ('news', 'sentiment', 'headlines') for symbol in ('AAPL', 'MSFT')
+    )
+
+
+def test_portfolios_sharing_a_symbol_reuse_its_analysis():
+    agent = StubNewsAgent()
+    agent.analyze_portfolio_news({'stocks': ['AAPL']})
+    agent.runs.clear()
+
+    result = agent.analyze_portfolio_news({'holdings': [{'symbol': 'AAPL'}, {'symbol': 'JNJ'}]})
+    assert {run[1] for run in agent.runs} == {'JNJ'}
+    assert result['stage_status']['AAPL']['cache'] == 'hit'
+    assert result['stage_status']['JNJ']['cache'] == 'miss'
+
+
+def test_a_failing_symbol_leaves_the_others():
+    def news(symbol):
+        if symbol == 'BAD':
+            raise RuntimeError('LLM unavailable')
+        return canned('news', symbol)
+
+    result = StubNewsAgent(news=news).analyze_portfolio_news({'stocks': ['AAPL', 'BAD']})
+    assert [stock['symbol'] for stock in result['news_analysis']['stocks']] == ['AAPL']
+    assert result['partial'] is True
+    assert result['errors'] == ['BAD: news stage failed: LLM unavailable']
+
+
+def test_partial_analyses_are_not_cached():
+    calls = {'headlines': 0}
+
+    def headlines(symbol):
+        calls['headlines'] += 1
+        if calls['headlines'] == 1:
+            raise RuntimeError('bad JSON')
+        return canned('headlines', symbol)
+
+    agent = StubNewsAgent(headlines=headlines)
+    first = agent.analyze_portfolio_news({'stocks': ['AAPL']})
+    assert first['partial'] is True
+    second = agent.analyze_portfolio_news({'stocks': ['AAPL']})
+    assert second['partial'] is False
+    assert second['stage_status']['AAPL']['cache'] == 'miss'
+    assert agent.runs.count(('news', 'AAPL')) == 2
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from utils.optimizer import PortfolioConstraints, project_capped_simplex, turnover
+
+
+def reference_projection(values, lower, upper, total):
+    """Projection by bisection on the shift, for comparison"""
+    low, high = float(np.min(values - upper)) - 1, float(np.max(values - lower)) + 1
+    for _ in range(200):
+        shift = (low + high) / 2
+        if np.clip(values - shift, lower, upper).sum() > total:
+            low = shift
+        else:
+            high = shift
+    return np.clip(values - (low + high) / 2, lower, upper)
+
+
+def random_problem(rng):
+    size = int(rng.integers(1, 30))
+    lower = rng.uniform(0, 0.5 / size, size) * rng.integers(0, 2)
+    upper = lower + rng.uniform(0.01, 1.0, size)
+    total = float(rng.uniform(lower.sum(), upper.sum()))
+    values = rng.normal(0, rng.choice([0.01, 1, 100]), size)
+    return values, lower, upper, total
+
+
+def test_projection_is_feasible_and_matches_bisection():
+    rng = np.random.default_rng(7)
+    for _ in range(500):
+        values, lower, upper, total = random_problem(rng)
+        projected = project_capped_simplex(values, lower, upper, total)
+
+        assert projected.sum() == pytest.approx(total, abs=1e-9)
+        assert np.all(projected >= lower - 1e-12)
+        assert np.all(projected <= upper + 1e-12)
+        np.testing.assert_allclose(projected, reference_projection(values, lower, upper, total), atol=1e-8)
+
+
+def test_projection_leaves_feasible_points_unchanged():
+    rng = np.random.default_rng(11)
+    for _ in range(100):
+        _, lower, upper, total = random_problem(rng)
+        feasible = project_capped_simplex(rng.normal(size=len(lower)), lower, upper, total)
+        np.testing.assert_allclose(project_capped_simplex(feasible, lower, upper, total), feasible, atol=1e-10)
+
+
+def test_projection_at_the_bounds():
+    lower, upper = np.zeros(4), np.full(4, 0.25)
+    np.testing.assert_allclose(project_capped_simplex(np.array([5.0, -3, 0, 1]), lower, upper), 0.25)
+    np.testing.assert_allclose(project_capped_simplex(np.array([1.0]), np.zeros(1), np.ones(1)), [1.0])
+
+
+def test_sector_caps_are_respected():
+    rng = np.random.default_rng(3)
+    sectors = ['tech', 'tech', 'tech', 'energy', 'energy', 'health', 'health', 'utilities']
+    constraints = PortfolioConstraints(len(sectors), max_weight=0.3, sectors=sectors,
+                                       sector_caps={'tech': 0.4, 'energy': 0.2})
+    for _ in range(300):
+        weights = constraints.project(rng.normal(0, rng.choice([0.1, 1, 10]), len(sectors)))
+        assert weights.sum() == pytest.approx(1.0, abs=1e-9)
+        assert np.all(weights >= -1e-12)
+        assert constraints.violations(weights, tol=1e-9) == {}
+        np.testing.assert_allclose(constraints.project(weights), weights, atol=1e-9)
+
+
+def test_turnover_budget_is_respected():
+    rng = np.random.default_rng(5)
+    current = np.array([0.4, 0.3, 0.2, 0.1, 0.0])
+    constraints = PortfolioConstraints(5, max_weight=0.4, current_weights=current, max_turnover=0.1)
+    for _ in range(50):
+        target = constraints.project(rng.normal(size=5))
+        limited = constraints.limit_turnover(target)
+        assert limited.sum() == pytest.approx(1.0, abs=1e-9)
+        assert turnover(limited, current) <= 0.1 + 1e-9
+        assert constraints.violations(limited) == {}
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'size': 4, 'max_weight': 0.2},
+    {'size': 3, 'max_weight': 0.5, 'sectors': ['a', 'a', 'b'], 'sector_caps': {'a': 0.2}},
+    {'size': 0}
+])
+def test_infeasible_constraints_are_rejected(kwargs):
+    with pytest.raises(ValueError):
+        PortfolioConstraints(**kwargs)
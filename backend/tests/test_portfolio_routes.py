@@ -0,0 +1,114 @@
+"""
+Smoke tests for the portfolio blueprint against the offline market
+"""
+
+HOLDINGS = [
+    {'symbol': 'AAPL', 'quantity': 10, 'purchasePrice': 90.0},
+    {'symbol': 'MSFT', 'quantity': 5, 'purchasePrice': 120.0},
+    {'symbol': 'JNJ', 'quantity': 8, 'purchasePrice': 100.0}
+]
+
+
+def test_analyze(client):
+    response = client.post('/api/portfolio/analyze', json={'holdings': HOLDINGS})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['portfolio']['totalValue'] > 0
+    assert [holding['symbol'] for holding in body['portfolio']['holdings']] == ['AAPL', 'MSFT', 'JNJ']
+    assert body['portfolio']['riskMetrics']['volatility'] > 0
+    assert isinstance(body['recommendations'], list)
+
+
+def test_analyze_requires_holdings(client):
+    assert client.post('/api/portfolio/analyze', json={'holdings': []}).status_code == 400
+
+
+def test_simulate(client):
+    payload = {'holdings': HOLDINGS, 'paths': 200, 'seed': 7, 'goals': [5000], 'timeHorizon': 'short-term'}
+    response = client.post('/api/portfolio/simulate', json=payload)
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['seed'] == 7
+    assert set(body['weights']) == {'AAPL', 'MSFT', 'JNJ'}
+    assert abs(sum(body['weights'].values()) - 1) < 1e-3
+
+
+def test_simulate_rejects_bad_paths(client):
+    response = client.post('/api/portfolio/simulate', json={'holdings': HOLDINGS, 'paths': 0})
+    assert response.status_code == 400
+
+
+def test_simulate_rejects_horizons_past_the_maximum(client):
+    payload = {'holdings': HOLDINGS, 'paths': 100000, 'timeHorizon': 1000}
+    response = client.post('/api/portfolio/simulate', json=payload)
+    assert response.status_code == 400
+    assert 'timeHorizon' in response.get_json()['error']
+
+
+def test_simulate_bounds_paths_by_the_memory_budget(client):
+    # 100000 paths x 240 months of float32 values is over the 64 MB budget
+    payload = {'holdings': HOLDINGS, 'paths': 100000, 'timeHorizon': 'long-term'}
+    response = client.post('/api/portfolio/simulate', json=payload)
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'paths must be between 1 and 69905 for a 20-year horizon'
+
+
+def test_optimize(client):
+    payload = {'holdings': HOLDINGS, 'objectives': ['min-variance', 'risk-parity'], 'maxWeight': 0.5}
+    response = client.post('/api/portfolio/optimize', json=payload)
+    assert response.status_code == 200, response.get_json()
+    portfolios = response.get_json()['portfolios']
+    assert set(portfolios) == {'min-variance', 'risk-parity'}
+    for portfolio in portfolios.values():
+        assert abs(sum(portfolio['weights'].values()) - 1) < 1e-3
+        assert max(portfolio['weights'].values()) <= 0.5 + 1e-3
+
+
+def test_optimize_rejects_unknown_objective(client):
+    response = client.post('/api/portfolio/optimize', json={'holdings': HOLDINGS, 'objectives': ['yolo']})
+    assert response.status_code == 400
+
+
+def test_performance(client):
+    response = client.post('/api/portfolio/performance', json={'holdings': HOLDINGS, 'timeframe': '3M'})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['portfolioValue'] > 0
+    assert len(body['historicalData']) > 0
+    assert len(body['holdings']) == 3
+
+
+def test_save_and_load(client):
+    saved = client.post('/api/portfolio/save', json={'holdings': HOLDINGS})
+    assert saved.status_code == 200
+    portfolio_id = saved.get_json()['portfolioId']
+    loaded = client.get(f'/api/portfolio/load/{portfolio_id}')
+    assert loaded.status_code == 200
+    assert loaded.get_json()['portfolioId'] == portfolio_id
+
+
+def downloads(fake_market):
+    return [call for call in fake_market.calls if call[0] != 'info']
+
+
+def test_analyze_fetches_holdings_and_benchmark_in_one_batch(client, fake_market):
+    assert client.post('/api/portfolio/analyze', json={'holdings': HOLDINGS}).status_code == 200
+    assert downloads(fake_market) == [('download', ('AAPL', 'MSFT', 'JNJ', '^GSPC'))]
+
+
+def test_performance_fetches_holdings_and_benchmark_in_one_batch(client, fake_market):
+    response = client.post('/api/portfolio/performance', json={'holdings': HOLDINGS, 'timeframe': '3M'})
+    assert response.status_code == 200
+    assert downloads(fake_market) == [('download', ('AAPL', 'MSFT', 'JNJ', '^GSPC'))]
+    # The benchmark comes from the batch, not the mock fallback
+    assert response.get_json()['sp500Value'] != 4500
+
+
+def test_performance_downloads_go_through_the_yahoo_breaker(client, fake_market):
+    from utils.bulkhead import yahoo_bulkhead
+
+    for _ in range(yahoo_bulkhead.breaker.min_calls):
+        yahoo_bulkhead.breaker.record(False, 0)
+    response = client.post('/api/portfolio/performance', json={'holdings': HOLDINGS, 'timeframe': '3M'})
+    assert response.status_code == 200
+    assert fake_market.calls == []
@@ -0,0 +1,121 @@
+import time
+
+import fakeredis
+import pytest
+
+import app as app_module
+from config import Config
+from utils.rate_limit import (
+    MemoryTokenBuckets, RateLimiter, RedisTokenBuckets, build_rate_limiter, route_group
+)
+
+
+class BrokenBuckets:
+    def take(self, key, cost):
+        raise ConnectionError("redis is down")
+
+
+def make_limiter(limit=10, window=3600, buckets=None):
+    buckets = buckets or MemoryTokenBuckets(limit, limit / window)
+    return RateLimiter(buckets, limit, {'default': 1, 'compute': 3, 'llm': 5})
+
+
+def test_memory_buckets_drain_and_refill():
+    buckets = MemoryTokenBuckets(capacity=3, refill_rate=20)
+    assert [buckets.take('a', 1)[0] for _ in range(4)] == [True, True, True, False]
+
+    allowed, tokens, wait = buckets.take('a', 1)
+    assert not allowed
+    assert 0 < wait <= 1 / 20
+
+    time.sleep(0.06)
+    assert buckets.take('a', 1)[0]
+
+
+def test_memory_buckets_are_independent_per_key():
+    buckets = MemoryTokenBuckets(capacity=1, refill_rate=0.001)
+    assert buckets.take('a', 1)[0]
+    assert not buckets.take('a', 1)[0]
+    assert buckets.take('b', 1)[0]
+
+
+def test_memory_buckets_drop_least_recently_used_keys():
+    buckets = MemoryTokenBuckets(capacity=1, refill_rate=0.001, max_keys=2)
+    buckets.take('a', 1)
+    buckets.take('b', 1)
+    buckets.take('c', 1)
+    assert len(buckets) == 2
+    # 'a' was forgotten, so it starts again with a full bucket
+    assert buckets.take('a', 1)[0]
+
+
+def test_redis_buckets_are_shared():
+    client = fakeredis.FakeRedis()
+    first = RedisTokenBuckets(2, 0.001, client=client)
+    second = RedisTokenBuckets(2, 0.001, client=client)
+    assert first.take('a', 1)[0]
+    assert second.take('a', 1)[0]
+    assert not first.take('a', 1)[0]
+
+
+@pytest.mark.parametrize('path, group', [
+    ('/api/stock/quote/AAPL', 'default'),
+    ('/api/portfolio/simulate', 'compute'),
+    ('/api/portfolio/news-analysis', 'llm'),
+    ('/api/ai/analyze-stocks', 'llm'),
+    ('/api/health', None),
+    ('/api/jobs/abc', None),
+    ('/api/stocks/search', None),
+    ('/api/stocks/trending/', None),
+    ('/api/cache/stats', None)
+])
+def test_route_groups(path, group):
+    assert route_group(path) == group
+
+
+def test_limiter_charges_route_costs_per_group():
+    limiter = make_limiter(limit=10)
+    assert limiter.check('1.2.3.4', '/api/portfolio/news-analysis').allowed
+    assert limiter.check('1.2.3.4', '/api/portfolio/news-analysis').allowed
+    decision = limiter.check('1.2.3.4', '/api/portfolio/news-analysis')
+    assert not decision.allowed
+    assert decision.retry_after > 0
+
+    # Other groups and other clients keep their own budgets
+    assert limiter.check('1.2.3.4', '/api/stock/quote/AAPL').remaining == 9
+    assert limiter.check('5.6.7.8', '/api/portfolio/news-analysis').allowed
+
+
+def test_limiter_fails_open_when_store_errors():
+    limiter = make_limiter(buckets=BrokenBuckets())
+    assert limiter.check('1.2.3.4', '/api/stock/quote/AAPL') is None
+    assert limiter.stats()['errors'] == 1
+
+
+def test_forwarded_for_needs_trust_proxy():
+    limiter = make_limiter()
+    assert limiter.client_id('10.0.0.1', '1.2.3.4, 10.0.0.1') == '10.0.0.1'
+    limiter.trust_proxy = True
+    assert limiter.client_id('10.0.0.1', '1.2.3.4, 10.0.0.1') == '1.2.3.4'
+
+
+def test_default_budget_allows_a_browsing_session():
+    limiter = build_rate_limiter(Config)
+    for _ in range(300):
+        assert limiter.check('1.2.3.4', '/api/stock/quote/AAPL').allowed
+    for _ in range(1000):
+        assert limiter.check('1.2.3.4', '/api/stocks/search') is None
+
+
+def test_flask_returns_429_when_bucket_is_empty(monkeypatch):
+    monkeypatch.setattr(app_module, 'rate_limiter', make_limiter(limit=2))
+    app_module.stock_cache.clear()
+    client = app_module.app.test_client()
+
+    assert client.get('/api/stocks/trending').status_code == 200
+    first = client.post('/api/portfolio/simulate', json={})
+    assert first.headers['X-RateLimit-Limit'] == '2'
+    limited = client.post('/api/portfolio/simulate', json={})
+    assert limited.status_code == 429
+    assert int(limited.headers['Retry-After']) >= 1
+    assert limited.get_json()['retry_after'] >= 1
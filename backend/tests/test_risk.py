@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.covariance import covariance_cache
+from utils.risk import EMPTY_RISK_METRICS, holdings_risk, max_drawdown, portfolio_risk, value_at_risk
+
+# Daily returns of one asset; a second asset moves exactly twice as much
+RETURNS = np.array([0.01, -0.02, 0.03, -0.01, 0.02, 0.0])
+
+
+@pytest.fixture(autouse=True)
+def cold_covariance_cache():
+    covariance_cache.clear()
+    yield
+    covariance_cache.clear()
+
+
+def test_max_drawdown_is_the_worst_peak_to_trough():
+    assert max_drawdown(np.array([100.0, 120.0, 90.0, 130.0, 65.0])) == pytest.approx(-0.5)
+    assert max_drawdown(np.array([1.0, 2.0, 3.0])) == 0.0
+    assert max_drawdown(np.array([])) == 0.0
+
+
+def test_value_at_risk_on_evenly_spaced_returns():
+    tail = value_at_risk(np.arange(-10, 10) / 100)
+    assert tail['var'] == pytest.approx(-0.0905)
+    assert tail['cvar'] == pytest.approx(-0.10)
+    # mean -0.005, sample standard deviation sqrt(35) / 100
+    assert tail['var_parametric'] == pytest.approx(-0.1023109, abs=1e-6)
+    assert tail['cvar_parametric'] == pytest.approx(-0.1270317, abs=1e-6)
+
+
+def test_portfolio_risk_on_a_fixed_return_series():
+    returns = np.column_stack([RETURNS, 2 * RETURNS])
+    metrics = portfolio_risk(returns, np.array([0.5, 0.5]), benchmark_returns=RETURNS)
+
+    # The half/half portfolio returns 1.5x the benchmark every day
+    assert metrics['beta'] == pytest.approx(1.5)
+    assert metrics['volatility'] == pytest.approx(np.std(1.5 * RETURNS, ddof=1) * np.sqrt(252))
+    assert metrics['sharpeRatio'] == pytest.approx((1.5 * RETURNS.mean() * 252 - 0.02) / metrics['volatility'])
+    assert metrics['maxDrawdown'] == pytest.approx(-0.03)
+    assert metrics['cvar95'] == pytest.approx(-0.03)
+
+
+def test_supplied_covariance_is_used_as_is():
+    returns = np.column_stack([RETURNS, 2 * RETURNS])
+    metrics = portfolio_risk(returns, np.array([1.0, 0.0]), covariance=np.diag([0.0001, 0.0004]))
+    assert metrics['volatility'] == pytest.approx(0.01 * np.sqrt(252))
+
+
+def test_holdings_risk_from_preloaded_closes():
+    prices = 100 * np.cumprod(np.concatenate([[1.0], 1 + RETURNS]))
+    closes = pd.DataFrame({'AAA': prices, 'BBB': 100 * np.cumprod(np.concatenate([[1.0], 1 + 2 * RETURNS])),
+                           '^GSPC': prices}, index=pd.bdate_range('2024-01-01', periods=len(prices)))
+    stock_data = [
+        {'symbol': 'AAA', 'quantity': 1, 'value': 50.0},
+        {'symbol': 'bbb', 'quantity': 1, 'value': 50.0}
+    ]
+    metrics = holdings_risk(stock_data, closes=closes)
+    assert metrics['beta'] == pytest.approx(1.5, abs=1e-3)
+    assert metrics['volatility'] == pytest.approx(np.std(1.5 * RETURNS, ddof=1) * np.sqrt(252), abs=1e-3)
+
+
+def test_holdings_risk_without_history_is_empty():
+    closes = pd.DataFrame({'^GSPC': [1.0, 2.0, 3.0]})
+    assert holdings_risk([{'symbol': 'GONE', 'quantity': 1, 'value': 10.0}], closes=closes) == EMPTY_RISK_METRICS
@@ -0,0 +1,19 @@
+"""
+Tests for the production server settings in run.py
+"""
+
+import run
+from config import Config
+
+
+def test_serve_defaults_to_one_worker():
+    # Background jobs are held per worker, so a second worker would 404 half the job polls
+    assert Config.SERVER_WORKERS == 1
+    assert run.gunicorn_options(Config)['workers'] == 1
+
+
+def test_multiple_workers_warn_about_job_routing(capsys):
+    run.warn_unpinned_jobs(1)
+    assert capsys.readouterr().out == ''
+    run.warn_unpinned_jobs(4)
+    assert 'sticky routing' in capsys.readouterr().out
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from utils.simulation import (
+    MonteCarloSimulator, PARALLEL_MIN_DRAWS, horizon_years, monthly_parameters, summarize_paths
+)
+
+MEAN = np.array([0.0004, 0.0003, 0.0002])
+COVARIANCE = np.array([
+    [0.00020, 0.00008, 0.00002],
+    [0.00008, 0.00015, 0.00003],
+    [0.00002, 0.00003, 0.00010]
+])
+WEIGHTS = np.array([0.5, 0.3, 0.2])
+
+
+def simulate(simulator, paths=2500, years=25, seed=42):
+    return simulator.simulate(MEAN, COVARIANCE, WEIGHTS, initial_value=10000, monthly_contribution=100,
+                              years=years, paths=paths, seed=seed)
+
+
+def test_seeded_runs_match_across_worker_counts():
+    # Large enough for the process pool to be used, with a partial last block
+    assert 2500 * 25 * 12 * len(WEIGHTS) >= PARALLEL_MIN_DRAWS
+    serial = simulate(MonteCarloSimulator(workers=1))
+    parallel_simulator = MonteCarloSimulator(workers=3)
+    try:
+        parallel = simulate(parallel_simulator)
+        assert parallel_simulator._pool is not None
+    finally:
+        parallel_simulator.shutdown()
+
+    assert serial.shape == (2500, 300)
+    np.testing.assert_array_equal(serial, parallel)
+
+
+def test_seeded_runs_match_across_memory_budgets():
+    small = MonteCarloSimulator(memory_budget_mb=1)
+    large = MonteCarloSimulator(memory_budget_mb=256)
+    np.testing.assert_array_equal(simulate(small, paths=1500, years=5), simulate(large, paths=1500, years=5))
+
+
+def test_output_must_fit_the_memory_budget():
+    simulator = MonteCarloSimulator(memory_budget_mb=1)
+    assert simulator.max_paths(1) == 1024 * 1024 // (12 * 4)
+    assert simulator.max_paths(20) == 1024 * 1024 // (240 * 4)
+    assert simulate(simulator, paths=simulator.max_paths(20), years=20).nbytes <= 1024 * 1024
+    with pytest.raises(ValueError):
+        simulate(simulator, paths=simulator.max_paths(20) + 1, years=20)
+
+
+def test_different_seeds_give_different_paths():
+    simulator = MonteCarloSimulator()
+    assert not np.array_equal(simulate(simulator, paths=200, years=2, seed=1),
+                              simulate(simulator, paths=200, years=2, seed=2))
+
+
+def test_monthly_parameters_follow_the_daily_moments():
+    drift, factor = monthly_parameters(MEAN, COVARIANCE)
+    assert drift.shape == (3,)
+    np.testing.assert_allclose(factor @ factor.T, COVARIANCE * 21, rtol=1e-6)
+
+
+def test_summary_bands_are_ordered():
+    values = simulate(MonteCarloSimulator(), paths=500, years=3)
+    summary = summarize_paths(values, initial_value=10000, monthly_contribution=100)
+    assert summary['paths'] == 500 and summary['months'] == 36
+    assert summary['totalInvested'] == pytest.approx(10000 + 100 * 36)
+    last = summary['bands'][-1]
+    assert last['p5'] <= last['p25'] <= last['p50'] <= last['p75'] <= last['p95']
+    assert 0 <= summary['goals'][0]['probability'] <= 1
+
+
+@pytest.mark.parametrize('value, years', [('short-term', 3), ('long-term', 20), (7, 7), ('bogus', 20)])
+def test_horizon_years(value, years):
+    assert horizon_years(value) == years
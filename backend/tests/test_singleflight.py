@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from utils.singleflight import AsyncSingleFlight, SingleFlight
+
+
+def run_concurrently(count, target):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(target())) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight('test')
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return {'symbol': 'AAPL'}
+
+    results = run_concurrently(8, lambda: flight.do('AAPL', fetch))
+    assert len(calls) == 1
+    assert results == [{'symbol': 'AAPL'}] * 8
+    stats = flight.stats()
+    assert stats['executions'] == 1 and stats['coalesced'] == 7
+    assert stats['in_flight'] == 0
+
+
+def test_waiters_receive_the_leaders_error():
+    flight = SingleFlight('test')
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        raise ConnectionError('upstream down')
+
+    def attempt():
+        try:
+            flight.do('AAPL', fetch)
+        except ConnectionError as e:
+            return str(e)
+
+    assert run_concurrently(4, attempt) == ['upstream down'] * 4
+    assert len(calls) == 1
+
+
+def test_different_keys_and_later_calls_run_separately():
+    flight = SingleFlight('test')
+    calls = []
+
+    def fetch(key):
+        calls.append(key)
+        return key
+
+    assert flight.do('AAPL', lambda: fetch('AAPL')) == 'AAPL'
+    assert flight.do('MSFT', lambda: fetch('MSFT')) == 'MSFT'
+    assert flight.do('AAPL', lambda: fetch('AAPL')) == 'AAPL'
+    assert calls == ['AAPL', 'MSFT', 'AAPL']
+
+
+def test_async_awaiters_share_one_task():
+    flight = AsyncSingleFlight('test')
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        return await asyncio.gather(*(flight.do('AAPL', fetch) for _ in range(5)))
+
+    assert asyncio.run(main()) == [42] * 5
+    assert len(calls) == 1
+    assert flight.stats()['coalesced'] == 4
+
+
+def test_cancelled_awaiter_does_not_cancel_the_shared_call():
+    flight = AsyncSingleFlight('test')
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return 'done'
+
+    async def main():
+        first = asyncio.ensure_future(flight.do('AAPL', fetch))
+        second = asyncio.ensure_future(flight.do('AAPL', fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == 'done'
@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+
+import pytest
+
+from utils.trace_sink import TraceSink
+
+
+class BlockingResult:
+    """Result whose rendering waits until released, holding up the writer thread"""
+
+    def __init__(self):
+        self.rendering = threading.Event()
+        self.release = threading.Event()
+
+    def __str__(self):
+        self.rendering.set()
+        self.release.wait(5)
+        return 'slow'
+
+
+@pytest.fixture
+def blocked():
+    result = BlockingResult()
+    yield result
+    result.release.set()
+
+
+def test_buffer_evicts_oldest_traces_past_capacity():
+    sink = TraceSink(capacity=3)
+    ids = [sink.record('news', f'response {i}') for i in range(5)]
+    assert sink.flush()
+
+    assert sink.get(ids[0]) is None
+    assert sink.get(ids[1]) is None
+    assert sink.get(ids[4])['content'] == 'response 4'
+    stats = sink.stats()
+    assert stats['buffered'] == 3
+    assert stats['recorded'] == 5
+
+
+def test_list_is_newest_first_and_get_returns_the_full_trace():
+    sink = TraceSink(capacity=10)
+    ids = [sink.record('news', f'response {i}', context={'symbol': 'AAPL'}) for i in range(3)]
+    assert sink.flush()
+
+    summaries = sink.list()
+    assert [summary['id'] for summary in summaries] == ids[::-1]
+    assert 'content' not in summaries[0]
+    trace = sink.get(ids[0])
+    assert trace['content'] == 'response 0'
+    assert trace['context'] == {'symbol': 'AAPL'}
+    assert trace['size'] == len('response 0')
+
+
+def test_flush_times_out_while_the_writer_is_busy(blocked):
+    sink = TraceSink()
+    trace_id = sink.record('news', blocked)
+    assert blocked.rendering.wait(5)
+    assert sink.flush(timeout=0.05) is False
+    assert sink.get(trace_id) is None
+
+    blocked.release.set()
+    assert sink.flush()
+    assert sink.get(trace_id)['content'] == 'slow'
+
+
+def test_recording_never_waits_for_the_writer(blocked):
+    sink = TraceSink(queue_size=2)
+    sink.record('news', blocked)
+    assert blocked.rendering.wait(5)
+
+    started = time.monotonic()
+    ids = [sink.record('news', f'response {i}') for i in range(4)]
+    # A full queue drops traces instead of holding up the request thread
+    assert time.monotonic() - started < 0.5
+    assert ids[2:] == [None, None]
+    assert sink.stats()['dropped'] == 2
+
+    blocked.release.set()
+    assert sink.flush()
+    assert sink.stats()['recorded'] == 3
+
+
+def test_sampled_out_traces_are_not_queued():
+    sink = TraceSink(sample_rate=0)
+    assert sink.record('news', 'response') is None
+    assert sink.flush()
+    assert sink.stats()['sampled_out'] == 1
+    assert sink.list() == []
+
+
+def test_traces_are_appended_to_the_log(tmp_path):
+    path = tmp_path / 'traces' / 'ai.log'
+    sink = TraceSink(log_path=str(path))
+    trace_id = sink.record('news', 'response')
+    assert sink.flush()
+
+    lines = path.read_text().splitlines()
+    assert json.loads(lines[-1])['id'] == trace_id
@@ -10,6 +10,10 @@ import logging
 from datetime import datetime
 import json
 
+from utils.llm_cache import cached_run
+from utils.bulkhead import llm_bulkhead
+from utils.trace_sink import trace_sink
+
 logger = logging.getLogger(__name__)
 
 class StockAnalysisAgent:
@@ -182,8 +186,14 @@ class StockAnalysisAgent:
                 agent=self.investment_advisor
             )
 
-            # Execute the single-agent task
-            result = self.investment_advisor.execute_task(combined_task)
+            # Execute the single-agent task, reusing a cached response for an identical prompt;
+            # while the LLM is unavailable the last analysis of the same symbols is served,
+            # outside the response cache so it is never stored as the answer to this prompt
+            result = llm_bulkhead.with_last_good(
+                lambda: cached_run(self.llm, self.investment_advisor, combined_task,
+                                   lambda: llm_bulkhead.call(lambda: self.investment_advisor.execute_task(combined_task))),
+                key=('stock-analysis', tuple(symbols))
+            )
 
             # Parse and structure the results
             analysis_result = self._parse_analysis_result(result, stock_data)
@@ -393,31 +403,6 @@ class StockAnalysisAgent:
     def _parse_analysis_result(self, result, stock_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Parse and structure the analysis result"""
         try:
-            # Save the raw CrewAI response to a file for debugging
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"crewai_response_{timestamp}.txt"
-            
-            # Save the raw result object
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write("=== CREWAI RAW RESPONSE ===\n")
-                f.write(f"Type: {type(result)}\n")
-                f.write(f"Dir: {dir(result)}\n")
-                f.write(f"String representation: {str(result)}\n")
-                f.write("\n=== ATTRIBUTES ===\n")
-                
-                # Try to get all attributes
-                for attr in dir(result):
-                    if not attr.startswith('_'):
-                        try:
-                            value = getattr(result, attr)
-                            f.write(f"{attr}: {value}\n")
-                        except Exception as e:
-                            f.write(f"{attr}: Error accessing - {e}\n")
-                
-                f.write("\n=== END ===\n")
-            
-            logger.info(f"Saved CrewAI response to {filename}")
-            
             # Handle CrewOutput object - extract the raw result
             if hasattr(result, 'raw'):
                 result_text = result.raw
@@ -429,19 +414,16 @@ class StockAnalysisAgent:
                 # If it's already a string, use it directly
                 result_text = str(result)
             
-            # Save the extracted text to a separate file
-            text_filename = f"crewai_text_{timestamp}.txt"
-            with open(text_filename, 'w', encoding='utf-8') as f:
-                f.write("=== EXTRACTED TEXT ===\n")
-                f.write(result_text)
-                f.write("\n=== END ===\n")
-            
-            logger.info(f"Saved extracted text to {text_filename}")
+            # Keep the raw response for /api/ai/debug-files; rendering happens off the request thread
+            trace_id = trace_sink.record(
+                'crewai_response', result, text=str(result_text),
+                context={'symbols': [stock.get('symbol') for stock in stock_data]}
+            )
             
             # Parse the CrewAI response into structured sections
             analysis = self._extract_analysis_sections(result_text, stock_data)
             analysis.update({
-                'debug_files': [filename, text_filename]  # Add debug file names
+                'debug_files': [trace_id] if trace_id else []  # Trace ids for /api/ai/debug-files
             })
             
             return analysis
@@ -0,0 +1,225 @@
+"""
+Asyncio market data client for the ASGI serving path
+
+Bars come straight from Yahoo's chart API over one pooled, keep-alive
+httpx.AsyncClient, so a single event loop can keep many upstream
+requests in flight without a thread per request. Frames are shaped like
+yfinance's Ticker.history (auto-adjusted OHLC, exchange-local index) so
+the existing chart and backtest helpers apply unchanged.
+
+Requests go through the Yahoo bulkhead, so they count toward (and are
+shed by) the same circuit breaker as the yfinance calls. The ASGI app
+only takes this path when the bar store is disabled; otherwise history
+is read through the bar store on a worker thread.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+
+from config import get_current_config
+from utils.bulkhead import UpstreamUnavailable, yahoo_bulkhead
+from utils.cache import TTLCache
+from utils.market_client import RETRY_STATUSES, backoff_delay, is_upstream_failure
+from utils.market_data import INTRADAY_INTERVALS, normalize_symbols
+from utils.singleflight import AsyncSingleFlight
+
+logger = logging.getLogger(__name__)
+
+YAHOO_CHART_URL = 'https://query1.finance.yahoo.com/v8/finance/chart/{symbol}'
+
+# Yahoo rejects requests without a browser-like user agent
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/124.0 Safari/537.36')
+
+OHLCV_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+
+def chart_to_history(payload: Dict, interval: str = '1d') -> Tuple[pd.DataFrame, Dict]:
+    """Convert a chart API payload into a yfinance-style history frame and its meta"""
+    results = (payload.get('chart') or {}).get('result') or []
+    if not results:
+        return pd.DataFrame(columns=list(OHLCV_COLUMNS)), {}
+
+    result = results[0]
+    meta = result.get('meta') or {}
+    timestamps = result.get('timestamp') or []
+    indicators = result.get('indicators') or {}
+    quote = (indicators.get('quote') or [{}])[0]
+    if not timestamps:
+        return pd.DataFrame(columns=list(OHLCV_COLUMNS)), meta
+
+    index = pd.to_datetime(timestamps, unit='s', utc=True).tz_convert(meta.get('exchangeTimezoneName') or 'UTC')
+    if interval not in INTRADAY_INTERVALS:
+        # yfinance labels daily and longer bars with the exchange-local midnight
+        index = index.normalize()
+    index.name = 'Datetime' if interval in INTRADAY_INTERVALS else 'Date'
+
+    frame = pd.DataFrame(
+        {column: np.asarray(quote.get(column.lower()) or [np.nan] * len(timestamps), dtype=float)
+         for column in OHLCV_COLUMNS},
+        index=index
+    )
+
+    # Match yfinance's auto_adjust: scale OHLC by the adjusted/raw close ratio
+    adjclose = (indicators.get('adjclose') or [{}])[0].get('adjclose')
+    if adjclose:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = np.asarray(adjclose, dtype=float) / frame['Close'].to_numpy()
+        for column in ('Open', 'High', 'Low', 'Close'):
+            frame[column] = frame[column].to_numpy() * ratio
+
+    frame = frame[frame['Close'].notna()]
+    return frame[~frame.index.duplicated(keep='last')], meta
+
+
+class AsyncMarketData:
+    """Pooled async chart client with a short-lived cache and coalescing"""
+
+    def __init__(self, timeout: float = 10, max_connections: int = 100, max_keepalive: int = 20,
+                 ttl: float = 300, retries: int = 2, backoff: float = 0.25, backoff_max: float = 2.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._charts = TTLCache(max_entries=2048, max_bytes=64 * 1024 * 1024, ttl=ttl)
+        self._flight = AsyncSingleFlight('chart')
+        self._errors = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use so it binds to the serving event loop
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                headers={'User-Agent': USER_AGENT},
+                transport=self._transport
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def chart(self, symbol: str, period: str = '1y', interval: str = '1d') -> Tuple[pd.DataFrame, Dict]:
+        """History frame and quote meta for one symbol; empty on upstream errors"""
+        key = (symbol.upper().strip(), period, interval)
+        cached = self._charts.get(key)
+        if cached is not None:
+            return cached
+        return await self._flight.do(key, lambda: self._fetch_chart(*key))
+
+    async def _fetch_chart(self, symbol: str, period: str, interval: str) -> Tuple[pd.DataFrame, Dict]:
+        # Shares the Yahoo breaker with the yfinance calls; the last good chart is served while it is open
+        try:
+            chart = await yahoo_bulkhead.call_async(
+                lambda: self._request_chart(symbol, period, interval),
+                key=('chart', symbol, period, interval),
+                is_failure=is_upstream_failure
+            )
+        except (httpx.HTTPError, ValueError, UpstreamUnavailable) as e:
+            self._errors += 1
+            logger.error(f"Error fetching chart for {symbol}: {str(e)}")
+            return pd.DataFrame(columns=list(OHLCV_COLUMNS)), {}
+
+        if not chart[0].empty:
+            self._charts.set((symbol, period, interval), chart)
+        return chart
+
+    async def _request_chart(self, symbol: str, period: str, interval: str) -> Tuple[pd.DataFrame, Dict]:
+        response = await self._get_with_retries(
+            YAHOO_CHART_URL.format(symbol=symbol),
+            {'range': period, 'interval': interval, 'includePrePost': 'false', 'events': 'div,splits'}
+        )
+        response.raise_for_status()
+        return chart_to_history(response.json(), interval)
+
+    async def _get_with_retries(self, url: str, params: Dict) -> httpx.Response:
+        # Same policy as the yfinance client: jittered backoff, all within one timeout
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            delay = backoff_delay(attempt, self.backoff, self.backoff_max)
+            retry = attempt < self.retries and time.monotonic() + delay < deadline
+            try:
+                response = await self.client.get(url, params=params,
+                                                 timeout=max(deadline - time.monotonic(), 0.1))
+            except httpx.TransportError:
+                if not retry:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or not retry:
+                    return response
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def history(self, symbol: str, period: str = '1y', interval: str = '1d') -> pd.DataFrame:
+        history, _ = await self.chart(symbol, period, interval)
+        return history
+
+    async def charts(self, symbols: Iterable[str], period: str = '1y',
+                     interval: str = '1d') -> Dict[str, Tuple[pd.DataFrame, Dict]]:
+        """Fetch every symbol's chart concurrently"""
+        symbols = normalize_symbols(symbols)
+        charts = await asyncio.gather(*(self.chart(symbol, period, interval) for symbol in symbols))
+        return dict(zip(symbols, charts))
+
+    async def close_matrix(self, symbols: Iterable[str], period: str = '1y') -> pd.DataFrame:
+        """Daily closes for all symbols on one calendar-date index (date x symbol)"""
+        symbols = normalize_symbols(symbols)
+        columns = {}
+        for symbol, (history, _) in (await self.charts(symbols, period, '1d')).items():
+            if history.empty:
+                continue
+            closes = history['Close'].copy()
+            closes.index = closes.index.tz_localize(None).normalize()
+            columns[symbol] = closes[~closes.index.duplicated(keep='last')]
+        return pd.DataFrame(columns).reindex(columns=symbols).sort_index()
+
+    async def quotes(self, symbols: Iterable[str]) -> Dict[str, Dict]:
+        """Latest regular-market price and display name for each symbol found upstream"""
+        quotes = {}
+        for symbol, (history, meta) in (await self.charts(symbols, '5d', '1d')).items():
+            price = meta.get('regularMarketPrice')
+            if price is None and not history.empty:
+                price = history['Close'].iloc[-1]
+            if price is not None and pd.notna(price):
+                quotes[symbol] = {
+                    'price': float(price),
+                    'name': meta.get('longName') or meta.get('shortName') or symbol
+                }
+        return quotes
+
+    def stats(self) -> Dict:
+        return {
+            'charts': self._charts.stats(),
+            'single_flight': self._flight.stats(),
+            'errors': self._errors,
+            'max_connections': self.limits.max_connections,
+            'max_keepalive': self.limits.max_keepalive_connections
+        }
+
+
+_config = get_current_config()
+
+# Shared by the ASGI app; its client lives on the serving event loop
+async_market_data = AsyncMarketData(
+    timeout=_config.YFINANCE_TIMEOUT,
+    max_connections=_config.ASYNC_HTTP_MAX_CONNECTIONS,
+    max_keepalive=_config.ASYNC_HTTP_MAX_KEEPALIVE,
+    ttl=_config.CACHE_DURATION,
+    retries=_config.YFINANCE_RETRIES,
+    backoff=_config.YFINANCE_BACKOFF,
+    backoff_max=_config.YFINANCE_BACKOFF_MAX
+)
@@ -0,0 +1,145 @@
+"""
+Portfolio backtest over aligned daily closes
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.bar_store import bar_store
+from utils.market_data import market_data, normalize_symbols
+
+logger = logging.getLogger(__name__)
+
+BENCHMARK_SYMBOL = '^GSPC'
+
+# Dashboard timeframes mapped to yfinance periods
+TIMEFRAME_PERIODS = {
+    '1M': '1mo',
+    '3M': '3mo',
+    '6M': '6mo',
+    '1Y': '1y',
+    '2Y': '2y',
+    '5Y': '5y',
+    '10Y': '10y'
+}
+
+
+def timeframe_period(timeframe: str) -> str:
+    """Get the yfinance period for a dashboard timeframe (defaults to 1 month)"""
+    return TIMEFRAME_PERIODS.get(timeframe, '1mo')
+
+
+def _daily_index(data):
+    # Different exchanges report daily bars in different timezones; align on the calendar date
+    index = data.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+    data = data.copy()
+    data.index = pd.DatetimeIndex(index).normalize()
+    return data[~data.index.duplicated(keep='last')]
+
+
+def load_close_matrix(symbols: Iterable[str], period: str) -> pd.DataFrame:
+    """Daily closes for all symbols on one shared date index (date x symbol)"""
+    symbols = normalize_symbols(symbols)
+    if not symbols:
+        return pd.DataFrame()
+
+    if bar_store is not None:
+        futures = {
+            symbol: market_data.executor.submit(bar_store.get_history, symbol, period, '1d')
+            for symbol in symbols
+        }
+        columns = {}
+        for symbol, future in futures.items():
+            try:
+                history = future.result(timeout=market_data.timeout * 3)
+            except Exception as e:
+                logger.warning(f"Could not load history for {symbol}: {str(e)}")
+                continue
+            if not history.empty:
+                columns[symbol] = _daily_index(history['Close'])
+        closes = pd.DataFrame(columns)
+    else:
+        closes = market_data.get_closes(symbols, period=period, interval='1d')
+        closes = _daily_index(closes) if not closes.empty else closes
+
+    return closes.reindex(columns=symbols).sort_index()
+
+
+def aggregate_quantities(holdings: List[Dict]) -> Tuple[List[str], np.ndarray]:
+    """Collapse holdings into unique symbols and their total quantities"""
+    quantities = {}
+    for holding in holdings:
+        symbol = str(holding['symbol']).upper().strip()
+        quantities[symbol] = quantities.get(symbol, 0.0) + float(holding['quantity'])
+    symbols = list(quantities)
+    return symbols, np.array([quantities[symbol] for symbol in symbols], dtype=float)
+
+
+def run_backtest(holdings: List[Dict], timeframe: str = '1M',
+                 benchmark: str = BENCHMARK_SYMBOL, closes: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Value the current holdings over the timeframe against the benchmark
+
+    Returns a frame indexed by date with 'portfolio' (quantities x closes),
+    'benchmark' (raw benchmark close) and 'benchmark_scaled' (the starting
+    portfolio value invested in the benchmark). closes, if given, is a
+    preloaded close matrix covering the holdings and the benchmark.
+    """
+    symbols, quantities = aggregate_quantities(holdings)
+    if not symbols:
+        return pd.DataFrame(columns=['portfolio', 'benchmark', 'benchmark_scaled'])
+
+    if closes is None:
+        closes = load_close_matrix(symbols + [benchmark], timeframe_period(timeframe))
+    else:
+        closes = closes.reindex(columns=symbols + [benchmark])
+    if closes.empty:
+        return pd.DataFrame(columns=['portfolio', 'benchmark', 'benchmark_scaled'])
+
+    # Carry prices across holidays on one exchange, then start where every series has data
+    closes = closes.ffill()
+    held = closes[symbols]
+    available = held.notna().any()
+    if not available.all():
+        logger.warning(f"No price history for {list(available[~available].index)}, excluding from backtest")
+        symbols = list(available[available].index)
+        quantities = quantities[available.to_numpy()]
+        held = held[symbols]
+    closes = closes[held.notna().all(axis=1)]
+    if closes.empty or not symbols:
+        return pd.DataFrame(columns=['portfolio', 'benchmark', 'benchmark_scaled'])
+
+    portfolio = closes[symbols].to_numpy() @ quantities
+    result = pd.DataFrame({'portfolio': portfolio}, index=closes.index)
+
+    bench = closes[benchmark]
+    result['benchmark'] = bench
+    first_bench = bench.dropna()
+    if not first_bench.empty and first_bench.iloc[0] > 0:
+        result['benchmark_scaled'] = bench / first_bench.iloc[0] * portfolio[0]
+    else:
+        result['benchmark_scaled'] = np.nan
+    return result
+
+
+def backtest_to_chart_data(result: pd.DataFrame) -> List[Dict]:
+    """Convert a backtest frame to the dashboard's historicalData records"""
+    if result.empty:
+        return []
+    dates = result.index.strftime('%Y-%m-%d').tolist()
+    portfolio = result['portfolio'].round().tolist()
+    benchmark = result['benchmark'].round().tolist()
+    scaled = result['benchmark_scaled'].round().tolist()
+    return [
+        {
+            'date': date,
+            'portfolio': int(value),
+            'sp500': int(bench) if bench == bench else None,
+            'sp500Scaled': int(scale) if scale == scale else None
+        }
+        for date, value, bench, scale in zip(dates, portfolio, benchmark, scaled)
+    ]
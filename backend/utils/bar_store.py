@@ -0,0 +1,351 @@
+"""
+Local OHLCV bar store with incremental refresh
+
+Bars are kept in SQLite (Config.DATABASE_URL) per symbol and interval.
+A request for a period that is already covered is served locally; only
+the tail since the last stored bar is fetched from Yahoo Finance.
+
+Expired intraday bars are pruned in the background every
+BAR_STORE_COMPACT_EVERY intraday writes. A full compaction, which also
+reclaims the freed space, is run from the backend directory with:
+    python -m utils.bar_store compact
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from config import get_current_config
+from utils.bulkhead import yahoo_bulkhead
+from utils.market_client import market_client, is_upstream_failure
+from utils.market_data import INTRADAY_INTERVALS, epoch_seconds
+from utils.sqlite import sqlite_path
+
+logger = logging.getLogger(__name__)
+
+# Calendar slack when checking that stored bars reach back far enough
+# (period starts often land on weekends or holidays)
+_COVERAGE_SLACK = {'1d': 7 * 86400, '5d': 14 * 86400, '1wk': 14 * 86400, '1mo': 45 * 86400, '3mo': 120 * 86400}
+_INTRADAY_SLACK = 3 * 86400
+
+# Relative difference above which a re-fetched, completed bar counts as revised
+# (e.g. prices re-adjusted after a dividend or split)
+_REVISION_TOLERANCE = 1e-6
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL, volume REAL,
+    PRIMARY KEY (symbol, interval, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS coverage (
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    first_ts INTEGER,
+    last_ts INTEGER,
+    is_full INTEGER NOT NULL DEFAULT 0,
+    tz TEXT,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (symbol, interval)
+);
+"""
+
+
+def period_start(period: str, now: Optional[pd.Timestamp] = None) -> Optional[int]:
+    """Epoch seconds at which a yfinance period string begins (None for max)"""
+    now = now or pd.Timestamp.now(tz='UTC')
+    if period == 'max':
+        return None
+    if period == 'ytd':
+        start = pd.Timestamp(year=now.year, month=1, day=1, tz='UTC')
+    elif period.endswith('mo'):
+        start = now - pd.DateOffset(months=int(period[:-2]))
+    elif period.endswith('y'):
+        start = now - pd.DateOffset(years=int(period[:-1]))
+    elif period.endswith('wk'):
+        start = now - pd.DateOffset(weeks=int(period[:-2]))
+    elif period.endswith('d'):
+        start = now - pd.DateOffset(days=int(period[:-1]))
+    else:
+        raise ValueError(f"Unsupported period: {period}")
+    return int(start.timestamp())
+
+
+class BarStore:
+    """SQLite-backed cache of OHLCV bars keyed by symbol and interval"""
+
+    def __init__(self, path: str, refresh_interval: float = 300,
+                 intraday_retention_days: int = 60, compact_every: int = 0):
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.intraday_retention_days = intraday_retention_days
+        self.compact_every = compact_every
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # Intraday writes since the last prune, and the prune running in the background
+        self._intraday_writes = 0
+        self._compaction: Optional[threading.Thread] = None
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # A connection inherited from a forked parent (gunicorn preload) must not be reused
+        if conn is None or self._local.pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_history(self, symbol: str, period: str = '1y', interval: str = '1d') -> pd.DataFrame:
+        """Return bars for the period, fetching only what is missing locally"""
+        symbol = symbol.upper().strip()
+        start_ts = period_start(period)
+        coverage = self._coverage(symbol, interval)
+
+        if not self._covers(coverage, start_ts, interval):
+            self._fetch_and_store(symbol, interval, period=period, full=start_ts is None)
+        elif time.time() - coverage['refreshed_at'] >= self.refresh_interval:
+            self._refresh_tail(symbol, interval, period, coverage)
+
+        return self._read(symbol, interval, start_ts)
+
+    def _covers(self, coverage, start_ts: Optional[int], interval: str) -> bool:
+        if coverage is None or coverage['first_ts'] is None:
+            return False
+        if start_ts is None:
+            return bool(coverage['is_full'])
+        slack = _INTRADAY_SLACK if interval in INTRADAY_INTERVALS else _COVERAGE_SLACK.get(interval, 7 * 86400)
+        return coverage['is_full'] or coverage['first_ts'] <= start_ts + slack
+
+    def _coverage(self, symbol: str, interval: str):
+        row = self._connect().execute(
+            'SELECT first_ts, last_ts, is_full, tz, refreshed_at FROM coverage WHERE symbol = ? AND interval = ?',
+            (symbol, interval)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('first_ts', 'last_ts', 'is_full', 'tz', 'refreshed_at'), row))
+
+    def _download(self, symbol: str, interval: str, **kwargs) -> Optional[pd.DataFrame]:
+        """Fetch bars upstream; None when the fetch failed, an empty frame when there are no new bars"""
+        # Stored bars are the fallback here, so the bulkhead keeps no stale copy
+        try:
+            return yahoo_bulkhead.call(
+                lambda: market_client.history(symbol, interval=interval, raise_errors=True, **kwargs),
+                is_failure=is_upstream_failure
+            )
+        except Exception as e:
+            logger.error(f"Error fetching history for {symbol}: {str(e)}")
+            return None
+
+    def _fetch_and_store(self, symbol: str, interval: str, period: str, full: bool) -> None:
+        history = self._download(symbol, interval, period=period)
+        if history is None or history.empty:
+            return
+        self._upsert(symbol, interval, history, full=full)
+
+    def _refresh_tail(self, symbol: str, interval: str, period: str, coverage) -> None:
+        # Re-fetch from the second-to-last stored bar: the last one may have
+        # been partial, and the one before it lets us detect revised history
+        overlap = self._connect().execute(
+            'SELECT ts, close FROM bars WHERE symbol = ? AND interval = ? ORDER BY ts DESC LIMIT 2',
+            (symbol, interval)
+        ).fetchall()
+        if not overlap:
+            self._fetch_and_store(symbol, interval, period=period, full=period == 'max')
+            return
+
+        check_ts, check_close = overlap[-1]
+        start = pd.Timestamp(check_ts, unit='s', tz='UTC')
+        if coverage['tz']:
+            start = start.tz_convert(coverage['tz'])
+        history = self._download(symbol, interval, start=start.normalize() if interval not in INTRADAY_INTERVALS else start)
+        if history is None:
+            # Keep the series stale so the next request retries
+            return
+        if history.empty:
+            self._touch(symbol, interval)
+            return
+
+        fetched = dict(zip(epoch_seconds(history.index).tolist(), history['Close'].tolist()))
+        refetched_close = fetched.get(check_ts)
+        if (len(overlap) == 2 and refetched_close is not None and check_close
+                and abs(refetched_close - check_close) > _REVISION_TOLERANCE * abs(check_close)):
+            # Stored history was adjusted upstream; start over for this series
+            logger.info(f"Bars for {symbol} {interval} were revised upstream, reloading")
+            self.invalidate(symbol, interval)
+            self._fetch_and_store(symbol, interval, period=period, full=period == 'max')
+            return
+
+        self._upsert(symbol, interval, history, full=bool(coverage['is_full']))
+
+    def _upsert(self, symbol: str, interval: str, history: pd.DataFrame, full: bool) -> None:
+        timestamps = epoch_seconds(history.index)
+        frame = history[['Open', 'High', 'Low', 'Close', 'Volume']].astype('float64')
+        rows = list(zip(
+            [symbol] * len(frame),
+            [interval] * len(frame),
+            timestamps.tolist(),
+            *(frame[column].tolist() for column in frame.columns)
+        ))
+        tz = str(history.index.tz) if getattr(history.index, 'tz', None) is not None else None
+
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO bars (symbol, interval, ts, open, high, low, close, volume) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+                conn.execute(
+                    'INSERT INTO coverage (symbol, interval, first_ts, last_ts, is_full, tz, refreshed_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                    'ON CONFLICT (symbol, interval) DO UPDATE SET '
+                    'first_ts = MIN(first_ts, excluded.first_ts), '
+                    'last_ts = MAX(last_ts, excluded.last_ts), '
+                    'is_full = MAX(is_full, excluded.is_full), '
+                    'tz = COALESCE(excluded.tz, tz), '
+                    'refreshed_at = excluded.refreshed_at',
+                    (symbol, interval, int(timestamps.min()), int(timestamps.max()), int(full), tz, time.time())
+                )
+        if interval in INTRADAY_INTERVALS:
+            self._schedule_compaction()
+
+    def _schedule_compaction(self) -> None:
+        """Prune expired intraday bars in the background every compact_every intraday writes"""
+        if self.compact_every <= 0:
+            return
+        with self._write_lock:
+            self._intraday_writes += 1
+            if self._intraday_writes < self.compact_every:
+                return
+            if self._compaction is not None and self._compaction.is_alive():
+                return
+            self._intraday_writes = 0
+            self._compaction = threading.Thread(
+                target=self._background_compact, name='bar-store-compact', daemon=True
+            )
+            self._compaction.start()
+
+    def _background_compact(self) -> None:
+        try:
+            # Freed pages are reused by later writes, so skip the VACUUM here
+            self.compact(vacuum=False)
+        except sqlite3.Error as e:
+            logger.warning(f"Bar store compaction failed: {str(e)}")
+
+    def _touch(self, symbol: str, interval: str) -> None:
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(
+                    'UPDATE coverage SET refreshed_at = ? WHERE symbol = ? AND interval = ?',
+                    (time.time(), symbol, interval)
+                )
+
+    def _read(self, symbol: str, interval: str, start_ts: Optional[int]) -> pd.DataFrame:
+        rows = self._connect().execute(
+            'SELECT ts, open, high, low, close, volume FROM bars '
+            'WHERE symbol = ? AND interval = ? AND ts >= ? ORDER BY ts',
+            (symbol, interval, start_ts if start_ts is not None else -2 ** 62)
+        ).fetchall()
+        if not rows:
+            return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'])
+
+        data = np.asarray(rows, dtype='float64')
+        index = pd.to_datetime(data[:, 0].astype('int64'), unit='s', utc=True)
+        coverage = self._coverage(symbol, interval)
+        if coverage and coverage['tz']:
+            index = index.tz_convert(coverage['tz'])
+        return pd.DataFrame(
+            data[:, 1:],
+            index=pd.DatetimeIndex(index, name='Date'),
+            columns=['Open', 'High', 'Low', 'Close', 'Volume']
+        )
+
+    def invalidate(self, symbol: str, interval: Optional[str] = None) -> None:
+        """Forget stored bars for a symbol (optionally a single interval)"""
+        symbol = symbol.upper().strip()
+        clause, params = ('symbol = ? AND interval = ?', (symbol, interval)) if interval else ('symbol = ?', (symbol,))
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                conn.execute(f'DELETE FROM bars WHERE {clause}', params)
+                conn.execute(f'DELETE FROM coverage WHERE {clause}', params)
+
+    def compact(self, vacuum: bool = True) -> dict:
+        """Drop expired intraday bars and, with vacuum, reclaim the space on disk"""
+        cutoff = int(time.time() - self.intraday_retention_days * 86400)
+        intraday = sorted(INTRADAY_INTERVALS)
+        placeholders = ','.join('?' * len(intraday))
+        with self._write_lock:
+            conn = self._connect()
+            with conn:
+                deleted = conn.execute(
+                    f'DELETE FROM bars WHERE interval IN ({placeholders}) AND ts < ?',
+                    (*intraday, cutoff)
+                ).rowcount
+                conn.execute(
+                    f'UPDATE coverage SET is_full = 0, first_ts = ('
+                    f'SELECT MIN(ts) FROM bars WHERE bars.symbol = coverage.symbol AND bars.interval = coverage.interval'
+                    f') WHERE interval IN ({placeholders})',
+                    intraday
+                )
+                conn.execute('DELETE FROM coverage WHERE first_ts IS NULL')
+            if vacuum:
+                conn.execute('VACUUM')
+                conn.execute('ANALYZE')
+        logger.info(f"Bar store compaction removed {deleted} expired intraday bars")
+        return {'deleted_bars': deleted, 'cutoff': cutoff}
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        bars = conn.execute('SELECT COUNT(*) FROM bars').fetchone()[0]
+        series = conn.execute('SELECT COUNT(*) FROM coverage').fetchone()[0]
+        return {'path': self.path, 'bars': bars, 'series': series}
+
+
+def create_bar_store(config_class) -> Optional[BarStore]:
+    """Create the configured bar store, or None when it is disabled or unusable"""
+    if not config_class.BAR_STORE_ENABLED:
+        return None
+    try:
+        return BarStore(
+            sqlite_path(config_class.DATABASE_URL, config_class.DATA_DIR),
+            refresh_interval=config_class.CACHE_DURATION,
+            intraday_retention_days=config_class.BAR_STORE_INTRADAY_RETENTION_DAYS,
+            compact_every=config_class.BAR_STORE_COMPACT_EVERY
+        )
+    except Exception as e:
+        logger.warning(f"Bar store disabled: {str(e)}")
+        return None
+
+
+bar_store = create_bar_store(get_current_config())
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if bar_store is None:
+        print("Bar store is disabled")
+        sys.exit(1)
+    if len(sys.argv) > 1 and sys.argv[1] == 'compact':
+        print(bar_store.compact())
+    else:
+        print(bar_store.stats())
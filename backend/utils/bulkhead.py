@@ -0,0 +1,371 @@
+"""
+Per-upstream bulkheads with circuit breakers
+
+A bulkhead caps how many calls to one upstream (Yahoo Finance, the LLM
+provider) are in flight; callers wait for a slot only up to a queue
+deadline. Its circuit breaker opens when the recent error rate or
+slow-call rate crosses a threshold, then lets a single probe through
+after a cool-down. While an upstream is unavailable, callers get the
+last good value for their key when there is one.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from config import get_current_config
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Breaker states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_MISSING = object()
+
+
+class UpstreamUnavailable(RuntimeError):
+    """Raised when a call is refused (breaker open or no free slot) and nothing stale can be served"""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float = 0):
+        super().__init__(f"{upstream} unavailable: {reason}")
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Trips on error rate or slow-call rate over a sliding time window"""
+
+    def __init__(self, name: str, window: float = 60, min_calls: int = 10, error_rate: float = 0.5,
+                 slow_call_seconds: float = 10, slow_call_rate: float = 0.5, open_seconds: float = 30):
+        self.name = name
+        self.window = window
+        self.min_calls = max(1, min_calls)
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        # (finished_at, ok, slow) for calls inside the window
+        self._outcomes: deque = deque()
+        self._lock = threading.Lock()
+        self._trips = 0
+        self._last_trip_reason: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def _current_state(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; in half-open state only one probe at a time"""
+        with self._lock:
+            state = self._current_state(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def abandon(self) -> None:
+        """An allowed call never ran (no free slot); let another probe through"""
+        with self._lock:
+            self._probing = False
+
+    def record(self, ok: bool, seconds: float) -> None:
+        """Record a finished call and open or close the breaker accordingly"""
+        now = time.monotonic()
+        slow = seconds >= self.slow_call_seconds
+        with self._lock:
+            state = self._current_state(now)
+            if state == HALF_OPEN:
+                self._probing = False
+                if ok and not slow:
+                    logger.info(f"Circuit for {self.name} closed after a successful probe")
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._trip(now, 'probe failed' if not ok else 'probe was slow')
+                return
+            if state == OPEN:
+                return
+
+            self._outcomes.append((now, ok, slow))
+            while self._outcomes and now - self._outcomes[0][0] > self.window:
+                self._outcomes.popleft()
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for _, succeeded, _ in self._outcomes if not succeeded)
+            slow_calls = sum(1 for _, _, was_slow in self._outcomes if was_slow)
+            if failures / calls >= self.error_rate:
+                self._trip(now, f"{failures}/{calls} calls failed")
+            elif slow_calls / calls >= self.slow_call_rate:
+                self._trip(now, f"{slow_calls}/{calls} calls took over {self.slow_call_seconds}s")
+
+    def _trip(self, now: float, reason: str) -> None:
+        logger.warning(f"Circuit for {self.name} opened for {self.open_seconds}s: {reason}")
+        self._state = OPEN
+        self._opened_at = now
+        self._probing = False
+        self._outcomes.clear()
+        self._trips += 1
+        self._last_trip_reason = reason
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker lets a probe through (0 unless open)"""
+        with self._lock:
+            if self._current_state(time.monotonic()) != OPEN:
+                return 0.0
+            return max(self.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            calls = len(self._outcomes)
+            return {
+                'state': state,
+                'retry_after': round(max(self.open_seconds - (now - self._opened_at), 0.0), 1) if state == OPEN else 0,
+                'window_calls': calls,
+                'window_error_rate': round(sum(1 for o in self._outcomes if not o[1]) / calls, 4) if calls else 0.0,
+                'window_slow_rate': round(sum(1 for o in self._outcomes if o[2]) / calls, 4) if calls else 0.0,
+                'trips': self._trips,
+                'last_trip_reason': self._last_trip_reason
+            }
+
+
+class Bulkhead:
+    """Bounded concurrency, a queue deadline and a circuit breaker for one upstream"""
+
+    def __init__(self, name: str, max_concurrent: int, queue_timeout: float, breaker: CircuitBreaker,
+                 stale_entries: int = 2000, stale_ttl: float = 86400):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        # (event loop, asyncio.Semaphore) for call_async, created on the serving loop
+        self._loop_slots = None
+        # Last good result per key, served while the upstream is unavailable
+        self._last_good = TTLCache(max_entries=stale_entries, max_bytes=64 * 1024 * 1024, ttl=stale_ttl)
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._calls = 0
+        self._rejected = 0
+        self._short_circuited = 0
+        self._stale_served = 0
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def call(self, fn: Callable[[], Any], key: Optional[Hashable] = None,
+             is_failure: Optional[Callable[[Exception], bool]] = None) -> Any:
+        """Run fn() through the bulkhead
+
+        An exception counts as an upstream failure unless is_failure(error)
+        says otherwise (say, an unknown symbol): that call was answered, so
+        it is recorded as a success and its error re-raised as-is. When the
+        call fails or is refused, the last good result for key is returned
+        instead if there is one; otherwise the failure is passed on (or
+        UpstreamUnavailable raised).
+        """
+        if not self.breaker.allow():
+            return self._short_circuit(key)
+
+        self._count('_waiting')
+        acquired = self._slots.acquire(timeout=self.queue_timeout)
+        self._count('_waiting', -1)
+        if not acquired:
+            return self._reject(key)
+
+        self._count('_in_flight')
+        self._count('_calls')
+        started = time.monotonic()
+        ok = False
+        error = None
+        try:
+            result = fn()
+            ok = True
+        except Exception as e:
+            error = e
+            ok = is_failure is not None and not is_failure(e)
+        finally:
+            # Always settle the outcome, or a half-open probe would never finish
+            self._settle(ok, started)
+            self._slots.release()
+        return self._outcome(key, result if error is None else None, error, ok)
+
+    async def call_async(self, fn: Callable[[], Awaitable[Any]], key: Optional[Hashable] = None,
+                         is_failure: Optional[Callable[[Exception], bool]] = None) -> Any:
+        """Await fn() through the bulkhead, with the same semantics as call()
+
+        Waiting on the thread slots would block the event loop, so async
+        callers get their own max_concurrent slots on the running loop;
+        the breaker and the last good results are shared.
+        """
+        if not self.breaker.allow():
+            return self._short_circuit(key)
+
+        slots = self._async_slots()
+        self._count('_waiting')
+        try:
+            await asyncio.wait_for(slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return self._reject(key)
+        finally:
+            self._count('_waiting', -1)
+
+        self._count('_in_flight')
+        self._count('_calls')
+        started = time.monotonic()
+        ok = False
+        error = None
+        try:
+            result = await fn()
+            ok = True
+        except Exception as e:
+            error = e
+            ok = is_failure is not None and not is_failure(e)
+        finally:
+            # A cancelled call (the caller's deadline passed) is recorded as a failure
+            self._settle(ok, started)
+            slots.release()
+        return self._outcome(key, result if error is None else None, error, ok)
+
+    def with_last_good(self, fn: Callable[[], Any], key: Hashable) -> Any:
+        """Run fn(), remembering its result under key, or serve the last good one if it fails
+
+        For callers that put another layer, such as a response cache,
+        between themselves and call(): fn calls through the bulkhead without
+        a key, so a stale result is never handed to that layer as fresh.
+        """
+        try:
+            result = fn()
+        except Exception as e:
+            return self._fallback(key, e)
+        self._last_good.set(key, result)
+        return result
+
+    def _async_slots(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._loop_slots is None or self._loop_slots[0] is not loop:
+            self._loop_slots = (loop, asyncio.Semaphore(self.max_concurrent))
+        return self._loop_slots[1]
+
+    def _short_circuit(self, key: Optional[Hashable]) -> Any:
+        self._count('_short_circuited')
+        return self._fallback(key, UpstreamUnavailable(self.name, 'circuit open', self.breaker.retry_after()))
+
+    def _reject(self, key: Optional[Hashable]) -> Any:
+        self.breaker.abandon()
+        self._count('_rejected')
+        return self._fallback(key, UpstreamUnavailable(
+            self.name, f"no free slot within {self.queue_timeout}s", self.queue_timeout))
+
+    def _settle(self, ok: bool, started: float) -> None:
+        self.breaker.record(ok, time.monotonic() - started)
+        self._count('_in_flight', -1)
+
+    def _outcome(self, key: Optional[Hashable], result: Any, error: Optional[Exception], ok: bool) -> Any:
+        if error is not None:
+            if ok:
+                raise error
+            return self._fallback(key, error)
+        if key is not None:
+            self._last_good.set(key, result)
+        return result
+
+    def _stale(self, key: Optional[Hashable]) -> Any:
+        if key is None:
+            return _MISSING
+        stale = self._last_good.get(key, _MISSING)
+        if stale is not _MISSING:
+            logger.warning(f"Serving last good {self.name} result for {key}")
+            self._count('_stale_served')
+        return stale
+
+    def _fallback(self, key: Optional[Hashable], error: Exception) -> Any:
+        stale = self._stale(key)
+        if stale is _MISSING:
+            raise error
+        return stale
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = {
+                'max_concurrent': self.max_concurrent,
+                'queue_timeout': self.queue_timeout,
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                'calls': self._calls,
+                'rejected': self._rejected,
+                'short_circuited': self._short_circuited,
+                'stale_served': self._stale_served,
+                'stale_entries': len(self._last_good)
+            }
+        stats['breaker'] = self.breaker.stats()
+        return stats
+
+
+def create_bulkhead(name: str, config_class, max_concurrent: int, queue_timeout: float,
+                    slow_call_seconds: float) -> Bulkhead:
+    """Bulkhead for one upstream with the shared breaker settings from the configuration"""
+    breaker = CircuitBreaker(
+        name,
+        window=config_class.BREAKER_WINDOW,
+        min_calls=config_class.BREAKER_MIN_CALLS,
+        error_rate=config_class.BREAKER_ERROR_RATE,
+        slow_call_seconds=slow_call_seconds,
+        slow_call_rate=config_class.BREAKER_SLOW_CALL_RATE,
+        open_seconds=config_class.BREAKER_OPEN_SECONDS
+    )
+    return Bulkhead(name, max_concurrent, queue_timeout, breaker, stale_ttl=config_class.BULKHEAD_STALE_DURATION)
+
+
+_config = get_current_config()
+
+# One bulkhead per upstream, shared by every call site in the process
+yahoo_bulkhead = create_bulkhead(
+    'yahoo', _config,
+    max_concurrent=_config.BULKHEAD_YAHOO_MAX_CONCURRENT,
+    queue_timeout=_config.BULKHEAD_YAHOO_QUEUE_TIMEOUT,
+    slow_call_seconds=_config.BREAKER_YAHOO_SLOW_SECONDS
+)
+llm_bulkhead = create_bulkhead(
+    'llm', _config,
+    max_concurrent=_config.BULKHEAD_LLM_MAX_CONCURRENT,
+    queue_timeout=_config.BULKHEAD_LLM_QUEUE_TIMEOUT,
+    slow_call_seconds=_config.BREAKER_LLM_SLOW_SECONDS
+)
+bulkheads = {bulkhead.name: bulkhead for bulkhead in (yahoo_bulkhead, llm_bulkhead)}
+
+
+def upstream_health() -> Dict[str, Dict[str, Any]]:
+    """Breaker state and load of every upstream, for health checks"""
+    return {
+        name: {
+            'state': bulkhead.breaker.state,
+            'retry_after': round(bulkhead.breaker.retry_after(), 1),
+            'in_flight': bulkhead.stats()['in_flight'],
+            'max_concurrent': bulkhead.max_concurrent
+        }
+        for name, bulkhead in bulkheads.items()
+    }
@@ -0,0 +1,437 @@
+"""
+Caching backends used by the API layer
+
+TTLCache is the in-process (L1) tier. RedisCache is an optional shared (L2)
+tier speaking the Redis protocol, and TieredCache stacks the two so that
+every worker shares warm entries while keeping hot keys local.
+"""
+
+import logging
+import sys
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size(value: Any) -> int:
+    """Roughly estimate how many bytes a cached value keeps alive"""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8', errors='ignore'))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            estimate_size(k) + estimate_size(v) for k, v in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    """Thread-safe LRU cache with per-entry expiry and entry/byte bounds"""
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 300, sizeof=estimate_size):
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl = ttl
+        self._sizeof = sizeof
+        # key -> (value, expires_at, size); order is least to most recently used
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store value under key; returns False when it cannot be cached"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            return False
+
+        size = self._sizeof(value)
+        if size > self.max_bytes:
+            return False
+
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+            self._evict()
+        return True
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return the cached value or call loader; a None result is not cached"""
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl)
+        return value
+
+    def delete(self, key: Hashable) -> bool:
+        """Remove a single key from the cache"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                return True
+            return False
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def purge_expired(self) -> int:
+        """Eagerly drop expired entries and return how many were removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                key for key, (_, expires_at, _) in self._entries.items()
+                if expires_at is not None and expires_at <= now
+            ]
+            for key in expired:
+                self._remove(key)
+            self._expirations += len(expired)
+            return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and current occupancy"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations
+            }
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def _evict(self) -> None:
+        # Expired entries go first so live ones are not evicted needlessly
+        if len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            now = time.monotonic()
+            for key in [k for k, (_, exp, _) in self._entries.items() if exp is not None and exp <= now]:
+                self._remove(key)
+                self._expirations += 1
+
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._remove(key)
+            self._evictions += 1
+
+
+# Values larger than this are zlib-compressed before going to Redis
+_COMPRESS_THRESHOLD = 1024
+_RAW_PREFIX = b'm'
+_ZLIB_PREFIX = b'z'
+
+
+def encode_value(value: Any) -> bytes:
+    """Serialize a value with msgpack, compressing large payloads"""
+    packed = msgpack.packb(value, use_bin_type=True)
+    if len(packed) > _COMPRESS_THRESHOLD:
+        return _ZLIB_PREFIX + zlib.compress(packed, 6)
+    return _RAW_PREFIX + packed
+
+
+def decode_value(data: bytes) -> Any:
+    """Inverse of encode_value"""
+    prefix, payload = data[:1], data[1:]
+    if prefix == _ZLIB_PREFIX:
+        payload = zlib.decompress(payload)
+    return msgpack.unpackb(payload, raw=False)
+
+
+class RedisCache:
+    """Shared cache tier stored in Redis with per-key TTLs
+
+    Any client exposing the redis-py interface can be injected, which is how
+    the tier is exercised against a local fake Redis server.
+    """
+
+    def __init__(self, url: str = None, ttl: float = 300, prefix: str = 'finanalytica:',
+                 lock_timeout: float = 10, client=None):
+        if msgpack is None:
+            raise RuntimeError("msgpack is required for the Redis cache tier")
+        if client is None:
+            if redis is None:
+                raise RuntimeError("redis package is required for the Redis cache tier")
+            client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._errors = 0
+
+    def _key(self, key: Hashable) -> str:
+        return f"{self.prefix}{key}"
+
+    def _count(self, counter: str) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the decoded value for key, or default on miss or error"""
+        try:
+            data = self.client.get(self._key(key))
+        except Exception as e:
+            logger.warning(f"Redis cache get failed for {key}: {str(e)}")
+            self._count('_errors')
+            return default
+        if data is None:
+            self._count('_misses')
+            return default
+        self._count('_hits')
+        return decode_value(data)
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        """Store value under key with a millisecond TTL"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and ttl <= 0:
+            return False
+        try:
+            self.client.set(self._key(key), encode_value(value), px=int(ttl * 1000) if ttl else None)
+            return True
+        except Exception as e:
+            logger.warning(f"Redis cache set failed for {key}: {str(e)}")
+            self._count('_errors')
+            return False
+
+    def delete(self, key: Hashable) -> bool:
+        """Remove a single key"""
+        try:
+            return bool(self.client.delete(self._key(key)))
+        except Exception as e:
+            logger.warning(f"Redis cache delete failed for {key}: {str(e)}")
+            self._count('_errors')
+            return False
+
+    def clear(self) -> None:
+        """Remove every key under this cache's prefix"""
+        try:
+            keys = list(self.client.scan_iter(match=f"{self.prefix}*", count=500))
+            if keys:
+                self.client.delete(*keys)
+        except Exception as e:
+            logger.warning(f"Redis cache clear failed: {str(e)}")
+            self._count('_errors')
+
+    def acquire_lock(self, key: Hashable) -> Optional[str]:
+        """Try to take the refresh lock for key; returns a token when acquired"""
+        token = uuid.uuid4().hex
+        try:
+            if self.client.set(self._key(f"lock:{key}"), token, nx=True, px=int(self.lock_timeout * 1000)):
+                return token
+        except Exception as e:
+            logger.warning(f"Redis lock acquire failed for {key}: {str(e)}")
+            self._count('_errors')
+            # Without Redis, let the caller refresh on its own
+            return token
+        return None
+
+    def release_lock(self, key: Hashable, token: str) -> None:
+        """Release the refresh lock if it is still held by token"""
+        lock_key = self._key(f"lock:{key}")
+        try:
+            # WATCH/MULTI instead of a Lua script so plain fake servers work too
+            with self.client.pipeline() as pipe:
+                pipe.watch(lock_key)
+                current = pipe.get(lock_key)
+                if current is not None and current.decode() == token:
+                    pipe.multi()
+                    pipe.delete(lock_key)
+                    pipe.execute()
+                else:
+                    pipe.unwatch()
+        except Exception as e:
+            logger.warning(f"Redis lock release failed for {key}: {str(e)}")
+            self._count('_errors')
+
+    def ping(self) -> bool:
+        try:
+            return bool(self.client.ping())
+        except Exception:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            lookups = self._hits + self._misses
+            return {
+                'backend': 'redis',
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'errors': self._errors,
+                'ttl': self.ttl
+            }
+
+
+class TieredCache:
+    """In-process L1 in front of a shared L2, with a stampede lock on refresh"""
+
+    def __init__(self, l1: TTLCache, l2: RedisCache, lock_wait: float = 5, poll_interval: float = 0.05):
+        self.l1 = l1
+        self.l2 = l2
+        self.lock_wait = lock_wait
+        self.poll_interval = poll_interval
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+        value = self.l2.get(key)
+        if value is None:
+            return default
+        self.l1.set(key, value)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> bool:
+        stored = self.l1.set(key, value, ttl)
+        return self.l2.set(key, value, ttl) or stored
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return a cached value, letting only one worker run loader on a miss"""
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        token = self.l2.acquire_lock(key)
+        if token is None:
+            # Another worker is refreshing; wait for it to publish the value.
+            # A refresh that yields nothing releases the lock without storing
+            # anything, so keep retrying it and take over as soon as it is free.
+            deadline = time.monotonic() + self.lock_wait
+            while token is None and time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                value = self.get(key)
+                if value is not None:
+                    return value
+                token = self.l2.acquire_lock(key)
+            if token is None:
+                logger.info(f"Timed out waiting for refresh of {key}, loading locally")
+                return self._load(key, loader, ttl)
+            # The previous holder may have published just before releasing
+            value = self.get(key)
+            if value is not None:
+                self.l2.release_lock(key, token)
+                return value
+
+        try:
+            return self._load(key, loader, ttl)
+        finally:
+            self.l2.release_lock(key, token)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float]) -> Any:
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key: Hashable) -> bool:
+        removed = self.l1.delete(key)
+        return self.l2.delete(key) or removed
+
+    def clear(self) -> None:
+        self.l1.clear()
+        self.l2.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'l1': self.l1.stats(),
+            'l2': self.l2.stats()
+        }
+
+
+def build_cache(config_class, **overrides):
+    """Create the endpoint cache described by the configuration
+
+    Falls back to the in-process tier alone when Redis is not selected,
+    not installed, or not reachable.
+    """
+    ttl = overrides.get('ttl', config_class.CACHE_DURATION)
+    l1 = TTLCache(
+        max_entries=overrides.get('max_entries', config_class.CACHE_MAX_ENTRIES),
+        max_bytes=overrides.get('max_bytes', config_class.CACHE_MAX_BYTES),
+        ttl=ttl
+    )
+    if config_class.CACHE_BACKEND != 'redis':
+        return l1
+
+    try:
+        l2 = RedisCache(
+            config_class.REDIS_URL,
+            ttl=ttl,
+            prefix=overrides.get('prefix', config_class.CACHE_KEY_PREFIX),
+            lock_timeout=config_class.CACHE_LOCK_TIMEOUT
+        )
+        if not l2.ping():
+            raise RuntimeError(f"cannot reach {config_class.REDIS_URL}")
+    except Exception as e:
+        logger.warning(f"Redis cache tier disabled, using in-process cache only: {str(e)}")
+        return l1
+
+    # Keep L1 entries short-lived so workers pick up L2 refreshes quickly
+    l1.ttl = min(ttl, config_class.CACHE_L1_DURATION)
+    return TieredCache(l1, l2, lock_wait=config_class.CACHE_LOCK_TIMEOUT)
@@ -0,0 +1,260 @@
+"""
+Shared, incrementally updated covariance/correlation estimates
+
+Estimates are cached per (symbol universe, window, frequency). A newer
+bar only costs loading the bars since the last one and an O(N^2)
+rolling/EWMA update, and a portfolio whose symbols fall inside a cached
+universe with a full window is served by index slicing.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import get_current_config
+
+logger = logging.getLogger(__name__)
+
+# RiskMetrics decay for daily data
+DEFAULT_EWMA_LAMBDA = 0.94
+
+
+class RollingCovariance:
+    """Rolling-window sample covariance plus an EWMA covariance over one universe"""
+
+    def __init__(self, symbols: List[str], window: int, ewma_lambda: float = DEFAULT_EWMA_LAMBDA):
+        self.symbols = list(symbols)
+        self.index = {symbol: position for position, symbol in enumerate(self.symbols)}
+        self.window = window
+        self.ewma_lambda = ewma_lambda
+        size = len(self.symbols)
+        self._rows = np.zeros((window, size))
+        self._dates: List[pd.Timestamp] = [None] * window
+        self._head = 0
+        self.count = 0
+        self._sum = np.zeros(size)
+        self._outer = np.zeros((size, size))
+        self._ewma = np.zeros((size, size))
+        self._updates_since_rebuild = 0
+        self.last_date: Optional[pd.Timestamp] = None
+        # Readers share the estimate while another request may be appending to it
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_returns(cls, returns: pd.DataFrame, window: int,
+                     ewma_lambda: float = DEFAULT_EWMA_LAMBDA) -> 'RollingCovariance':
+        """Build an estimate from a (date x symbol) return frame without gaps"""
+        estimate = cls(list(returns.columns), window, ewma_lambda)
+        estimate.append(returns)
+        return estimate
+
+    def append(self, returns: pd.DataFrame) -> int:
+        """Fold in rows dated after last_date; returns how many were added"""
+        with self._lock:
+            if self.last_date is not None:
+                returns = returns[returns.index > self.last_date]
+            if returns.empty:
+                return 0
+            values = returns[self.symbols].to_numpy(dtype=float)
+            for date, row in zip(returns.index, values):
+                self._push(date, row)
+            # Periodically resum the window so floating-point drift cannot accumulate
+            if self._updates_since_rebuild >= self.window:
+                self._resum()
+            return len(values)
+
+    def _push(self, date, row: np.ndarray) -> None:
+        if self.count == self.window:
+            old = self._rows[self._head]
+            self._sum -= old
+            self._outer -= np.outer(old, old)
+        else:
+            self.count += 1
+
+        self._rows[self._head] = row
+        self._dates[self._head] = date
+        self._head = (self._head + 1) % self.window
+        self._sum += row
+        self._outer += np.outer(row, row)
+
+        if self.last_date is None:
+            self._ewma = np.outer(row, row)
+        else:
+            self._ewma = self.ewma_lambda * self._ewma + (1.0 - self.ewma_lambda) * np.outer(row, row)
+        self.last_date = date
+        self._updates_since_rebuild += 1
+
+    def _resum(self) -> None:
+        rows = self.window_returns()
+        self._sum = rows.sum(axis=0)
+        self._outer = rows.T @ rows
+        self._updates_since_rebuild = 0
+
+    def _positions(self, symbols: Optional[Iterable[str]]) -> np.ndarray:
+        if symbols is None:
+            return np.arange(len(self.symbols))
+        return np.array([self.index[symbol] for symbol in symbols], dtype=int)
+
+    def window_returns(self, symbols: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Return the rows currently in the window, oldest first"""
+        with self._lock:
+            if self.count < self.window:
+                rows = self._rows[:self.count]
+            else:
+                rows = np.roll(self._rows, -self._head, axis=0)
+            return rows[:, self._positions(symbols)] if symbols is not None else rows.copy()
+
+    def mean(self, symbols: Optional[Iterable[str]] = None) -> np.ndarray:
+        """Mean daily return over the window"""
+        with self._lock:
+            if self.count == 0:
+                return np.zeros(len(self._positions(symbols)))
+            return (self._sum / self.count)[self._positions(symbols)]
+
+    def covariance(self, symbols: Optional[Iterable[str]] = None, method: str = 'sample') -> np.ndarray:
+        """Covariance sub-matrix for symbols ('sample' rolling window or 'ewma')"""
+        with self._lock:
+            positions = self._positions(symbols)
+            if method == 'ewma':
+                return self._ewma[np.ix_(positions, positions)].copy()
+            if self.count < 2:
+                return np.zeros((len(positions), len(positions)))
+            sums = self._sum[positions]
+            outer = self._outer[np.ix_(positions, positions)]
+            return (outer - np.outer(sums, sums) / self.count) / (self.count - 1)
+
+    def correlation(self, symbols: Optional[Iterable[str]] = None, method: str = 'sample') -> np.ndarray:
+        """Correlation sub-matrix for symbols"""
+        covariance = self.covariance(symbols, method)
+        std = np.sqrt(np.clip(np.diag(covariance), 0.0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            correlation = covariance / np.outer(std, std)
+        correlation[~np.isfinite(correlation)] = 0.0
+        np.fill_diagonal(correlation, 1.0)
+        return correlation
+
+    def nbytes(self) -> int:
+        return self._rows.nbytes + self._outer.nbytes + self._ewma.nbytes + self._sum.nbytes
+
+
+class CovarianceCache:
+    """LRU of RollingCovariance estimates keyed by (universe, window, frequency)"""
+
+    def __init__(self, max_entries: int = 32, refresh_interval: float = 300,
+                 ewma_lambda: float = DEFAULT_EWMA_LAMBDA):
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self.ewma_lambda = ewma_lambda
+        self._entries: "OrderedDict[Tuple, RollingCovariance]" = OrderedDict()
+        # When each estimate was last checked for newer bars
+        self._checked_at: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[Tuple, threading.Lock] = {}
+        self._hits = 0
+        self._builds = 0
+        self._incremental_updates = 0
+
+    def get(self, symbols: Iterable[str], loader: Callable[[List[str], Optional[pd.Timestamp]], pd.DataFrame],
+            window: int = 252, frequency: str = '1d') -> RollingCovariance:
+        """Get an estimate covering symbols, building or updating it as needed
+
+        loader(universe, since) must return a gap-free (date x symbol) return
+        frame for the universe, ending at the latest available bar. When since
+        is given only rows dated since onwards are needed, which is all an
+        update of a cached estimate reads.
+        """
+        symbols = sorted(set(symbols))
+        key = self._find_superset(symbols, window, frequency) or (tuple(symbols), window, frequency)
+
+        with self._build_lock(key):
+            with self._lock:
+                estimate = self._entries.get(key)
+                checked_at = self._checked_at.get(key)
+            if estimate is not None:
+                if checked_at is not None and time.monotonic() - checked_at < self.refresh_interval:
+                    with self._lock:
+                        self._entries.move_to_end(key)
+                        self._hits += 1
+                    return estimate
+
+                update = loader(list(estimate.symbols), estimate.last_date)
+                missing = [symbol for symbol in estimate.symbols if symbol not in update.columns]
+                if not missing and self._can_extend(estimate, update):
+                    added = estimate.append(update)
+                    with self._lock:
+                        self._entries.move_to_end(key)
+                        self._checked_at[key] = time.monotonic()
+                        if added:
+                            self._incremental_updates += 1
+                        else:
+                            self._hits += 1
+                    return estimate
+
+            returns = loader(list(key[0]), None)
+            # Universe members without history cannot be estimated; the estimate leaves them out
+            missing = [symbol for symbol in key[0] if symbol not in returns.columns]
+            if missing:
+                logger.warning(f"No return history for {missing}, excluding from covariance universe")
+                returns = returns[[symbol for symbol in key[0] if symbol in returns.columns]]
+
+            estimate = RollingCovariance.from_returns(returns.tail(window), window, self.ewma_lambda)
+            with self._lock:
+                self._entries[key] = estimate
+                self._entries.move_to_end(key)
+                self._checked_at[key] = time.monotonic()
+                self._builds += 1
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._checked_at.pop(evicted, None)
+                    self._build_locks.pop(evicted, None)
+            return estimate
+
+    @staticmethod
+    def _can_extend(estimate: RollingCovariance, returns: pd.DataFrame) -> bool:
+        # The cached window must still line up with the loader's history
+        if estimate.last_date is None or estimate.last_date not in returns.index:
+            return False
+        return True
+
+    def _find_superset(self, symbols: List[str], window: int, frequency: str) -> Optional[Tuple]:
+        wanted = set(symbols)
+        with self._lock:
+            # A larger universe only serves a request when its window is full: its rows are
+            # trimmed to the shortest member history, which must not shorten this request's window
+            candidates = [
+                key for key, estimate in self._entries.items()
+                if key[1] == window and key[2] == frequency and wanted.issubset(key[0])
+                and (len(key[0]) == len(wanted) or estimate.count >= window)
+            ]
+        # Prefer the smallest universe that still covers the request
+        return min(candidates, key=lambda key: len(key[0])) if candidates else None
+
+    def _build_lock(self, key: Tuple) -> threading.Lock:
+        with self._lock:
+            return self._build_locks.setdefault(key, threading.Lock())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._checked_at.clear()
+            self._build_locks.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'universe_sizes': [len(key[0]) for key in self._entries],
+                'bytes': sum(estimate.nbytes() for estimate in self._entries.values()),
+                'hits': self._hits,
+                'builds': self._builds,
+                'incremental_updates': self._incremental_updates
+            }
+
+
+# Process-wide cache shared by the portfolio analytics
+covariance_cache = CovarianceCache(refresh_interval=get_current_config().CACHE_DURATION)
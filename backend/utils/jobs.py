@@ -0,0 +1,200 @@
+"""
+In-process background job queue for long-running analyses
+
+A job runs on a local worker pool and records progress events as it
+goes, so the request that enqueued it can return immediately. Clients
+poll the job or follow its events (server-sent events). Jobs live in
+the memory of the process that accepted them.
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from config import get_current_config
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle states
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+FINISHED_STATES = (SUCCEEDED, FAILED)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when too many jobs are already waiting or running"""
+
+
+class Job:
+    """One queued analysis with its progress events and outcome"""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self._changed = threading.Condition()
+
+    def emit(self, event: str, data: Dict[str, Any]) -> None:
+        """Record a progress event and wake anyone following the job"""
+        with self._changed:
+            self.events.append({
+                'id': len(self.events) + 1,
+                'event': event,
+                'data': data,
+                'timestamp': datetime.now().isoformat()
+            })
+            self._changed.notify_all()
+
+    def _transition(self, status: str, **fields) -> None:
+        with self._changed:
+            self.status = status
+            for name, value in fields.items():
+                setattr(self, name, value)
+            # Emitted under the same lock so followers never see the new status without its event
+            self.emit('status', {'status': status, 'error': self.error} if self.error else {'status': status})
+
+    def events_after(self, last_id: int, timeout: float) -> List[Dict[str, Any]]:
+        """Events newer than last_id, waiting up to timeout for one to arrive"""
+        with self._changed:
+            if len(self.events) <= last_id and self.status not in FINISHED_STATES:
+                self._changed.wait(timeout)
+            return self.events[last_id:]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        with self._changed:
+            job = {
+                'job_id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'created_at': datetime.fromtimestamp(self.created_at).isoformat(),
+                'started_at': datetime.fromtimestamp(self.started_at).isoformat() if self.started_at else None,
+                'finished_at': datetime.fromtimestamp(self.finished_at).isoformat() if self.finished_at else None,
+                'stages': [event['data'] for event in self.events if event['event'] == 'stage']
+            }
+            if self.error:
+                job['error'] = self.error
+            if include_result and self.status == SUCCEEDED:
+                job['result'] = self.result
+            return job
+
+
+class JobQueue:
+    """Bounded local worker pool that keeps finished jobs around for a while"""
+
+    def __init__(self, workers: int = 4, max_pending: int = 100, retention: float = 3600,
+                 max_retained: int = 1000):
+        self.max_pending = max_pending
+        self.retention = retention
+        self.max_retained = max_retained
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='job')
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._rejected = 0
+
+    def submit(self, kind: str, fn: Callable[[Job], Any]) -> Job:
+        """Queue fn(job) and return the job; fn reports progress through job.emit"""
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            if pending >= self.max_pending:
+                self._rejected += 1
+                raise QueueFullError(f"{pending} jobs already queued or running")
+            job = Job(kind)
+            self._jobs[job.id] = job
+            self._submitted += 1
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _run(self, job: Job, fn: Callable[[Job], Any]) -> None:
+        job._transition(RUNNING, started_at=time.time())
+        try:
+            result = fn(job)
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.kind}) failed: {str(e)}")
+            job._transition(FAILED, error=str(e), finished_at=time.time())
+            return
+        job._transition(SUCCEEDED, result=result, finished_at=time.time())
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and now - job.finished_at > self.retention:
+                del self._jobs[job_id]
+        # Past the retention bound, drop the oldest finished jobs first
+        excess = len(self._jobs) - self.max_retained
+        for job_id, job in list(self._jobs.items()):
+            if excess <= 0:
+                break
+            if job.finished:
+                del self._jobs[job_id]
+                excess -= 1
+
+    def shutdown(self) -> None:
+        """Stop accepting work; queued jobs are cancelled, running ones finish in the background"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            states = [job.status for job in self._jobs.values()]
+            return {
+                'jobs': len(states),
+                **{state: states.count(state) for state in (QUEUED, RUNNING, SUCCEEDED, FAILED)},
+                'submitted': self._submitted,
+                'rejected': self._rejected,
+                'max_pending': self.max_pending
+            }
+
+
+def follow_events(job: Job, last_id: int = 0, heartbeat: float = 15) -> Iterator[str]:
+    """Server-sent event stream of a job's events, ending once it has finished"""
+    while True:
+        events = job.events_after(last_id, heartbeat)
+        if not events:
+            if job.finished:
+                break
+            # A comment line keeps proxies from closing an idle stream
+            yield ': keep-alive\n\n'
+            continue
+        for event in events:
+            last_id = event['id']
+            yield f"id: {event['id']}\nevent: {event['event']}\ndata: {_json(event)}\n\n"
+        if job.finished and last_id >= len(job.events):
+            break
+    yield f"event: done\ndata: {_json(job.to_dict())}\n\n"
+
+
+def _json(value: Any) -> str:
+    return json.dumps(value, default=str)
+
+
+_config = get_current_config()
+
+# Process-wide queue for analyses too slow to hold a request open
+job_queue = JobQueue(
+    workers=_config.JOB_WORKERS,
+    max_pending=_config.JOB_MAX_PENDING,
+    retention=_config.JOB_RETENTION
+)
@@ -0,0 +1,244 @@
+"""
+Persistent, content-addressed cache of LLM responses
+
+Responses are stored in SQLite keyed by sha256(model, temperature, prompt),
+so byte-identical prompts issued within the TTL (e.g. the same compare set
+reloaded on the dashboard) are answered from disk across restarts and
+workers. The store is bounded by entry count and total response bytes,
+evicting least recently used rows first.
+
+Inspect or clear it from the backend directory with:
+    python -m utils.llm_cache [clear]
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from config import get_current_config
+from utils.singleflight import SingleFlight
+from utils.sqlite import sqlite_path
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    temperature REAL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used_at);
+"""
+
+
+def prompt_key(model: str, temperature: Optional[float], prompt: str) -> str:
+    """Content address of a completion request"""
+    payload = json.dumps([model, temperature, prompt], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def render_prompt(agent, task) -> str:
+    """Everything CrewAI renders into the messages for a single agent/task run"""
+    return '\n'.join([
+        str(getattr(agent, 'role', '')),
+        str(getattr(agent, 'goal', '')),
+        str(getattr(agent, 'backstory', '')),
+        str(getattr(task, 'description', '')),
+        str(getattr(task, 'expected_output', ''))
+    ])
+
+
+def response_text(result: Any) -> str:
+    """Plain text of a CrewOutput, TaskOutput or string result"""
+    raw = getattr(result, 'raw', None)
+    return raw if isinstance(raw, str) else str(result)
+
+
+class LLMResponseCache:
+    """SQLite-backed response cache with TTL and size-based LRU eviction"""
+
+    def __init__(self, path: str, ttl: float = 600, max_entries: int = 5000,
+                 max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max(1, int(max_entries))
+        self.max_bytes = max(1, int(max_bytes))
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._flight = SingleFlight('llm')
+        self._stats_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        # A connection inherited from a forked parent (gunicorn preload) must not be reused
+        if conn is None or self._local.pid != os.getpid():
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for key, or None if missing or expired"""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute('SELECT response, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] <= now:
+            self._count('_misses')
+            return None
+
+        with self._write_lock, conn:
+            conn.execute('UPDATE responses SET last_used_at = ?, hits = hits + 1 WHERE key = ?', (now, key))
+        self._count('_hits')
+        return row[0]
+
+    def set(self, key: str, model: str, temperature: Optional[float], response: str,
+            ttl: Optional[float] = None) -> None:
+        """Store a response and evict expired or least recently used rows over the bounds"""
+        now = time.time()
+        ttl = self.ttl if ttl is None else ttl
+        conn = self._connect()
+        with self._write_lock, conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO responses '
+                '(key, model, temperature, response, size, created_at, expires_at, last_used_at, hits) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)',
+                (key, model, temperature, response, len(response.encode('utf-8')), now, now + ttl, now)
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        removed = conn.execute('DELETE FROM responses WHERE expires_at <= ?', (now,)).rowcount
+        count, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        if count > self.max_entries or size > self.max_bytes:
+            excess_rows = max(count - self.max_entries, 0)
+            excess_bytes = max(size - self.max_bytes, 0)
+            victims = []
+            freed = 0
+            for key, row_size in conn.execute('SELECT key, size FROM responses ORDER BY last_used_at'):
+                if len(victims) >= excess_rows and freed >= excess_bytes:
+                    break
+                victims.append((key,))
+                freed += row_size
+            conn.executemany('DELETE FROM responses WHERE key = ?', victims)
+            removed += len(victims)
+        if removed:
+            self._count('_evictions', removed)
+
+    def get_or_call(self, model: str, temperature: Optional[float], prompt: str,
+                    call: Callable[[], Any]) -> Any:
+        """Return the cached text for the prompt, or run call() and cache its text
+
+        Identical prompts already in flight wait for that call instead of
+        issuing their own. A fresh result is returned as-is; cached hits
+        are returned as plain text.
+        """
+        key = prompt_key(model, temperature, prompt)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        def load():
+            result = call()
+            text = response_text(result)
+            if text.strip():
+                try:
+                    self.set(key, model, temperature, text)
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not store LLM response: {str(e)}")
+            return result
+
+        return self._flight.do(key, load)
+
+    def clear(self) -> int:
+        """Remove every cached response; returns how many were removed"""
+        conn = self._connect()
+        with self._write_lock, conn:
+            return conn.execute('DELETE FROM responses').rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._connect()
+        count, size, expired = conn.execute(
+            'SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(expires_at <= ?), 0) FROM responses',
+            (time.time(),)
+        ).fetchone()
+        with self._stats_lock:
+            lookups = self._hits + self._misses
+            return {
+                'path': self.path,
+                'entries': count,
+                'expired_entries': expired,
+                'bytes': size,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+                'evictions': self._evictions,
+                'single_flight': self._flight.stats()
+            }
+
+
+def create_llm_cache(config_class) -> Optional[LLMResponseCache]:
+    """Create the configured response cache, or None when it is disabled or unusable"""
+    if not config_class.LLM_CACHE_ENABLED:
+        return None
+    try:
+        return LLMResponseCache(
+            sqlite_path(config_class.LLM_CACHE_URL, config_class.DATA_DIR),
+            ttl=config_class.LLM_CACHE_DURATION,
+            max_entries=config_class.LLM_CACHE_MAX_ENTRIES,
+            max_bytes=config_class.LLM_CACHE_MAX_BYTES
+        )
+    except Exception as e:
+        logger.warning(f"LLM response cache disabled: {str(e)}")
+        return None
+
+
+llm_cache = create_llm_cache(get_current_config())
+
+
+def cached_run(llm, agent, task, run: Callable[[], Any]) -> Any:
+    """Run an agent/task through the response cache when it is enabled"""
+    if llm_cache is None:
+        return run()
+    model = str(getattr(llm, 'model', ''))
+    temperature = getattr(llm, 'temperature', None)
+    return llm_cache.get_or_call(model, temperature, render_prompt(agent, task), run)
+
+
+if __name__ == '__main__':
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    if llm_cache is None:
+        print("LLM response cache is disabled")
+        sys.exit(1)
+    if len(sys.argv) > 1 and sys.argv[1] == 'clear':
+        print(f"Removed {llm_cache.clear()} cached responses")
+    else:
+        print(llm_cache.stats())
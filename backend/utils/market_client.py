@@ -0,0 +1,210 @@
+"""
+Process-wide, pooled HTTP client for all yfinance traffic
+
+Every yfinance call goes through one thread-safe session, so TLS
+connections and the Yahoo cookie/crumb are reused instead of being set
+up per lookup. yfinance 1.x wants a curl_cffi session (browser TLS
+impersonation); plain requests with a pooled HTTPAdapter is the fallback
+when curl_cffi is not installed. Transient failures are retried with
+jittered exponential backoff, all within one YFINANCE_TIMEOUT deadline.
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+import pandas as pd
+import yfinance as yf
+from yfinance.exceptions import YFInvalidPeriodError, YFRateLimitError, YFTickerMissingError
+
+from config import get_current_config
+
+try:
+    from curl_cffi import CurlOpt
+    from curl_cffi import requests as curl_requests
+except ImportError:
+    curl_requests = None
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth another attempt
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Connection-level failures of either HTTP backend, plus Yahoo's throttling
+TRANSIENT_ERRORS = (
+    YFRateLimitError, ConnectionError, TimeoutError,
+    requests.exceptions.ConnectionError, requests.exceptions.Timeout
+)
+if curl_requests is not None:
+    TRANSIENT_ERRORS += (curl_requests.exceptions.ConnectionError, curl_requests.exceptions.Timeout)
+
+# Yahoo answered, but the symbol or the requested range has no data
+NOT_FOUND_ERRORS = (YFTickerMissingError, YFInvalidPeriodError)
+
+# Used by the requests fallback; curl_cffi sends the impersonated browser's headers
+FALLBACK_USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+                       '(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36')
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed upstream call is worth retrying"""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status in RETRY_STATUSES
+
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Whether an error means Yahoo failed, rather than the symbol or range not existing"""
+    if isinstance(error, NOT_FOUND_ERRORS):
+        return False
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status is None or status == 429 or status >= 500
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class MarketDataClient:
+    """Shared yfinance session with connection pooling, retries and a per-call deadline"""
+
+    def __init__(self, timeout: float = 10, retries: int = 2, backoff: float = 0.25,
+                 backoff_max: float = 2.0, max_connections: int = 32):
+        self.timeout = timeout
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.max_connections = max(1, max_connections)
+        self.backend = 'curl_cffi' if curl_requests is not None else 'requests'
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._retried = 0
+        self._failures = 0
+        # Pooled sockets must not be shared with a forked child (gunicorn preload)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self) -> None:
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """The pooled session, created on first use"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        if curl_requests is not None:
+            # curl_cffi keeps a curl handle per thread; each caches up to max_connections connections
+            return curl_requests.Session(
+                impersonate='chrome',
+                timeout=self.timeout,
+                curl_options={CurlOpt.MAXCONNECTS: self.max_connections}
+            )
+
+        session = requests.Session()
+        session.headers.update({'User-Agent': FALLBACK_USER_AGENT})
+        # Yahoo is a handful of hosts; pool_maxsize bounds the connections kept per host
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=self.max_connections)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def call(self, description: str, fn: Callable[[float], Any]) -> Any:
+        """Run fn(remaining_seconds), retrying transient errors until the deadline
+
+        The last error is re-raised once retries or the deadline run out.
+        """
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        with self._stats_lock:
+            self._calls += 1
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                return fn(max(remaining, 0.1))
+            except Exception as e:
+                delay = backoff_delay(attempt, self.backoff, self.backoff_max)
+                if (not is_transient(e) or attempt >= self.retries
+                        or time.monotonic() + delay >= deadline):
+                    with self._stats_lock:
+                        self._failures += 1
+                    raise
+                logger.warning(f"Retrying {description} in {delay:.2f}s after: {str(e)}")
+                with self._stats_lock:
+                    self._retried += 1
+                time.sleep(delay)
+                attempt += 1
+
+    def ticker(self, symbol: str) -> yf.Ticker:
+        """A yfinance Ticker bound to the shared session"""
+        return yf.Ticker(symbol, session=self.session)
+
+    def info(self, symbol: str) -> Dict[str, Any]:
+        """Ticker.info (quoteSummary) for one symbol"""
+        return self.call(f"info for {symbol}", lambda timeout: self.ticker(symbol).info)
+
+    def last_price(self, symbol: str) -> Optional[float]:
+        """Latest traded price from Ticker.fast_info"""
+        price = self.call(f"last price for {symbol}", lambda timeout: self.ticker(symbol).fast_info['lastPrice'])
+        return float(price) if price else None
+
+    def history(self, symbol: str, raise_errors: bool = False, **kwargs) -> pd.DataFrame:
+        """Ticker.history for one symbol; an empty frame if it cannot be fetched, unless raise_errors"""
+        try:
+            return self.call(
+                f"history for {symbol}",
+                lambda timeout: self.ticker(symbol).history(timeout=timeout, raise_errors=True, **kwargs)
+            )
+        except Exception as e:
+            if raise_errors:
+                raise
+            # Matches yfinance's own behaviour without raise_errors
+            logger.error(f"Error fetching history for {symbol}: {str(e)}")
+            return pd.DataFrame()
+
+    def download(self, symbols: Iterable[str], **kwargs) -> pd.DataFrame:
+        """yf.download for several symbols in one batched request"""
+        symbols = list(symbols)
+        return self.call(
+            f"download of {symbols}",
+            lambda timeout: yf.download(symbols, session=self.session, timeout=timeout, **kwargs)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'backend': self.backend,
+                'timeout': self.timeout,
+                'max_connections': self.max_connections,
+                'calls': self._calls,
+                'retried': self._retried,
+                'failures': self._failures
+            }
+
+
+_config = get_current_config()
+
+# Process-wide client shared by every yfinance call site
+market_client = MarketDataClient(
+    timeout=_config.YFINANCE_TIMEOUT,
+    retries=_config.YFINANCE_RETRIES,
+    backoff=_config.YFINANCE_BACKOFF,
+    backoff_max=_config.YFINANCE_BACKOFF_MAX,
+    max_connections=_config.YFINANCE_MAX_CONNECTIONS
+)
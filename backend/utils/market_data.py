@@ -0,0 +1,273 @@
+"""
+Batched market data access for multi-symbol endpoints
+"""
+
+import logging
+import struct
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from config import get_current_config
+from utils.bulkhead import yahoo_bulkhead
+from utils.cache import TTLCache
+from utils.market_client import market_client, is_upstream_failure
+from utils.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_symbols(symbols: Iterable[str]) -> List[str]:
+    """Upper-case, strip and de-duplicate symbols while keeping their order"""
+    seen = []
+    for symbol in symbols:
+        symbol = str(symbol).upper().strip()
+        if symbol and symbol not in seen:
+            seen.append(symbol)
+    return seen
+
+
+# Intervals whose chart labels need a time component
+INTRADAY_INTERVALS = {'1m', '2m', '5m', '15m', '30m', '60m', '90m'}
+
+# Output keys and the history columns they come from
+CHART_FIELDS = (('price', 'Close'), ('open', 'Open'), ('high', 'High'), ('low', 'Low'))
+
+
+def history_to_chart_data(history: pd.DataFrame, interval: str = '1d') -> List[Dict]:
+    """Convert an OHLCV history frame into chart records with columnar operations"""
+    if history is None or history.empty:
+        return []
+
+    date_format = '%Y-%m-%d %H:%M:%S' if interval in INTRADAY_INTERVALS else '%Y-%m-%d'
+    prices = history[[column for _, column in CHART_FIELDS]].round(2)
+
+    # Formatting wall-clock times on a naive index is far cheaper than tz-aware
+    index = history.index
+    if getattr(index, 'tz', None) is not None:
+        index = index.tz_localize(None)
+
+    keys = ('date', 'volume') + tuple(key for key, _ in CHART_FIELDS)
+    columns = (
+        index.strftime(date_format).tolist(),
+        history['Volume'].fillna(0).astype('int64').tolist(),
+        *(prices[column].tolist() for _, column in CHART_FIELDS)
+    )
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+# Supported chart data encodings
+CHART_FORMATS = ('records', 'columnar', 'binary')
+
+# Column order of the binary format; every column is little-endian float64
+BINARY_COLUMNS = ('timestamp', 'price', 'open', 'high', 'low', 'volume')
+BINARY_MAGIC = b'FAB1'
+BINARY_CONTENT_TYPE = 'application/vnd.finanalytica.bars'
+
+
+def epoch_seconds(index: pd.DatetimeIndex) -> np.ndarray:
+    """Convert a (possibly tz-aware) DatetimeIndex to UTC epoch seconds"""
+    if getattr(index, 'tz', None) is None:
+        index = index.tz_localize('UTC')
+    epoch = pd.Timestamp('1970-01-01', tz='UTC')
+    return np.asarray((index - epoch) // pd.Timedelta(seconds=1), dtype='int64')
+
+
+def history_to_columns(history: pd.DataFrame) -> Dict[str, List]:
+    """Convert an OHLCV history frame into parallel arrays keyed by field"""
+    if history is None or history.empty:
+        return {key: [] for key in BINARY_COLUMNS}
+
+    prices = history[[column for _, column in CHART_FIELDS]].round(2)
+    columns = {
+        'timestamp': epoch_seconds(history.index).tolist(),
+        'volume': history['Volume'].fillna(0).astype('int64').tolist()
+    }
+    for key, column in CHART_FIELDS:
+        columns[key] = prices[column].tolist()
+    return columns
+
+
+def history_to_binary(history: pd.DataFrame) -> bytes:
+    """Pack an OHLCV history frame into column-major float64 arrays
+
+    Layout: a 16-byte header (magic, row count, column count, reserved;
+    little-endian uint32s after the magic) followed by one float64 array
+    per BINARY_COLUMNS entry. The header keeps every array 8-byte aligned
+    so clients can view the body directly as a Float64Array.
+    """
+    rows = 0 if history is None else len(history)
+    header = struct.pack('<4sIII', BINARY_MAGIC, rows, len(BINARY_COLUMNS), 0)
+    if not rows:
+        return header
+
+    matrix = np.empty((len(BINARY_COLUMNS), rows), dtype='<f8')
+    matrix[0] = epoch_seconds(history.index)
+    for position, (_, column) in enumerate(CHART_FIELDS, start=1):
+        matrix[position] = history[column].to_numpy(dtype='f8')
+    matrix[len(BINARY_COLUMNS) - 1] = history['Volume'].fillna(0).to_numpy(dtype='f8')
+    return header + matrix.tobytes()
+
+
+def format_chart_data(history: pd.DataFrame, interval: str = '1d', fmt: str = 'records'):
+    """Encode history in the requested chart format"""
+    if fmt == 'columnar':
+        return history_to_columns(history)
+    if fmt == 'binary':
+        return history_to_binary(history)
+    return history_to_chart_data(history, interval)
+
+
+def extract_field(data: pd.DataFrame, symbols: List[str], field: str = 'Close') -> pd.DataFrame:
+    """Pull one OHLCV field out of a yf.download frame as a (date x symbol) frame"""
+    if data is None or data.empty:
+        return pd.DataFrame(columns=symbols, dtype=float)
+    if isinstance(data.columns, pd.MultiIndex):
+        frame = data[field]
+    else:
+        frame = data[[field]].rename(columns={field: symbols[0]})
+    return frame.reindex(columns=symbols)
+
+
+class MarketDataService:
+    """Bulk price/history lookups plus cached per-symbol metadata"""
+
+    def __init__(self, max_workers: int = 16, price_ttl: float = 300,
+                 metadata_ttl: float = 86400, timeout: float = 10):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='market-data')
+        self.timeout = timeout
+        self._prices = TTLCache(max_entries=10000, max_bytes=8 * 1024 * 1024, ttl=price_ttl)
+        self._metadata = TTLCache(max_entries=10000, max_bytes=16 * 1024 * 1024, ttl=metadata_ttl)
+        self._metadata_flight = SingleFlight('metadata')
+
+    def download(self, symbols: Iterable[str], period: str = '1y', interval: str = '1d', **kwargs) -> pd.DataFrame:
+        """Download OHLCV bars for all symbols in a single batched request"""
+        symbols = normalize_symbols(symbols)
+        if not symbols:
+            return pd.DataFrame()
+        try:
+            return yahoo_bulkhead.call(
+                lambda: market_client.download(
+                    symbols,
+                    period=period,
+                    interval=interval,
+                    group_by='column',
+                    threads=True,
+                    progress=False,
+                    **kwargs
+                ),
+                is_failure=is_upstream_failure
+            )
+        except Exception as e:
+            logger.error(f"Error downloading market data for {symbols}: {str(e)}")
+            return pd.DataFrame()
+
+    def get_closes(self, symbols: Iterable[str], period: str = '1y', interval: str = '1d') -> pd.DataFrame:
+        """Get a (date x symbol) frame of closing prices"""
+        symbols = normalize_symbols(symbols)
+        return extract_field(self.download(symbols, period, interval), symbols, 'Close')
+
+    def get_prices(self, symbols: Iterable[str], closes: Optional[pd.DataFrame] = None) -> Dict[str, float]:
+        """Get the latest price for each symbol, batching all cache misses
+
+        closes, a (date x symbol) close matrix the caller already loaded,
+        supplies cache misses instead of a separate download.
+        """
+        symbols = normalize_symbols(symbols)
+        prices = {}
+        missing = []
+        for symbol in symbols:
+            price = self._prices.get(symbol)
+            if price is None:
+                missing.append(symbol)
+            else:
+                prices[symbol] = price
+
+        if missing:
+            if closes is None:
+                closes = self.get_closes(missing, period='5d', interval='1d')
+            last = closes.ffill().iloc[-1] if not closes.empty else pd.Series(dtype=float)
+            for symbol in missing:
+                price = last.get(symbol)
+                if price is not None and pd.notna(price):
+                    prices[symbol] = float(price)
+                    self._prices.set(symbol, prices[symbol])
+
+            # Anything the batch missed falls back to per-symbol quotes in parallel
+            stragglers = [symbol for symbol in missing if symbol not in prices]
+            if stragglers:
+                futures = {symbol: self.executor.submit(self._fetch_last_price, symbol) for symbol in stragglers}
+                wait(futures.values(), timeout=self.timeout)
+                for symbol, future in futures.items():
+                    price = future.result() if future.done() else None
+                    if price:
+                        prices[symbol] = price
+                        self._prices.set(symbol, price)
+
+        return prices
+
+    def get_metadata(self, symbols: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """Get name and sector for each symbol from a long-lived cache"""
+        symbols = normalize_symbols(symbols)
+        metadata = {}
+        futures = {}
+        for symbol in symbols:
+            cached = self._metadata.get(symbol)
+            if cached is not None:
+                metadata[symbol] = cached
+            else:
+                futures[symbol] = self.executor.submit(
+                    self._metadata_flight.do, symbol, lambda symbol=symbol: self._fetch_metadata(symbol)
+                )
+
+        if futures:
+            wait(futures.values(), timeout=self.timeout)
+            for symbol, future in futures.items():
+                if future.done() and future.exception() is None:
+                    metadata[symbol] = future.result()
+                else:
+                    logger.warning(f"Timed out fetching metadata for {symbol}")
+                    metadata[symbol] = {'name': symbol, 'sector': 'Unknown'}
+
+        return metadata
+
+    def _fetch_metadata(self, symbol: str) -> Dict[str, str]:
+        try:
+            info = yahoo_bulkhead.call(lambda: market_client.info(symbol), is_failure=is_upstream_failure)
+        except Exception as e:
+            logger.warning(f"Error fetching metadata for {symbol}: {str(e)}")
+            return {'name': symbol, 'sector': 'Unknown'}
+
+        metadata = {
+            'name': info.get('longName', symbol),
+            'sector': info.get('sector', 'Unknown')
+        }
+        self._metadata.set(symbol, metadata)
+        return metadata
+
+    def _fetch_last_price(self, symbol: str):
+        try:
+            return yahoo_bulkhead.call(lambda: market_client.last_price(symbol), is_failure=is_upstream_failure)
+        except Exception as e:
+            logger.warning(f"Error fetching last price for {symbol}: {str(e)}")
+            return None
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            'prices': self._prices.stats(),
+            'metadata': self._metadata.stats(),
+            'metadata_flight': self._metadata_flight.stats()
+        }
+
+
+_config = get_current_config()
+
+# Process-wide service shared by the API and the portfolio blueprint
+market_data = MarketDataService(
+    max_workers=_config.MARKET_DATA_WORKERS,
+    price_ttl=_config.CACHE_DURATION,
+    metadata_ttl=_config.METADATA_CACHE_DURATION,
+    timeout=_config.YFINANCE_TIMEOUT
+)
@@ -2,16 +2,76 @@
 News Analysis AI Module using CrewAI Framework
 """
 
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from crewai import Agent, Task, Crew, Process
 from crewai.llm import LLM
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Optional
 import logging
 from datetime import datetime
 import json
+import threading
+
+from config import get_current_config
+from utils.cache import build_cache
+from utils.llm_cache import cached_run
+from utils.bulkhead import llm_bulkhead
+from utils.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+_config = get_current_config()
+
+# Crew kickoffs block on the LLM, so stages run on a shared thread pool
+stage_executor = ThreadPoolExecutor(max_workers=_config.NEWS_STAGE_WORKERS, thread_name_prefix='news-stage')
+
+# Symbols are analyzed on their own pool so they can wait on stages without starving them
+symbol_executor = ThreadPoolExecutor(max_workers=_config.NEWS_SYMBOL_WORKERS, thread_name_prefix='news-symbol')
+
+# Complete per-symbol analyses, shared by every portfolio that holds the symbol
+news_cache = build_cache(_config, ttl=_config.NEWS_CACHE_DURATION, max_entries=4096)
+news_flight = SingleFlight('news')
+
+# Pipeline stages in order, with the list each stage's crew returns entries under
+STAGE_LIST_KEYS = {'news': 'stocks', 'sentiment': 'sentiments', 'headlines': 'headlines'}
+
+# Role, goal and backstory of each agent; every crew gets a fresh Agent built from these
+AGENT_DEFINITIONS = {
+    'news': {
+        'role': 'Financial News Analyst',
+        'goal': 'Analyze and gather relevant financial news for given stock symbols',
+        'backstory': """You are an expert financial news analyst with years of experience 
+            in analyzing market trends, company performance, and financial news. You have 
+            a deep understanding of how news affects stock prices and market sentiment. 
+            You can access current financial news and provide comprehensive analysis."""
+    },
+    'sentiment': {
+        'role': 'Market Sentiment Analyst',
+        'goal': 'Analyze news sentiment and determine if it is bearish, bullish, or neutral for stock prices',
+        'backstory': """You are a specialized market sentiment analyst with deep expertise 
+            in interpreting financial news and determining its impact on stock prices. You 
+            understand market psychology and can accurately classify news sentiment. You 
+            have access to current market data and can provide real-time sentiment analysis."""
+    },
+    'headline': {
+        'role': 'Financial Headline Writer',
+        'goal': 'Create compelling and accurate headlines from financial news content in three distinct styles',
+        'backstory': """You are an expert financial journalist and headline writer with 
+            years of experience in creating engaging, accurate, and informative headlines 
+            for financial news. You specialize in three distinct headline styles:
+            
+            1. BREAKING NEWS: Urgent, time-sensitive headlines that grab immediate attention
+            2. ANALYTICAL INSIGHT: Data-driven headlines that provide market analysis
+            3. STORYTELLING: Narrative headlines that tell the broader market story
+            
+            You understand what makes each style compelling while maintaining journalistic 
+            integrity. You can adapt your writing to capture the essence of financial news 
+            and market movements in different ways for different audiences."""
+    }
+}
+
 class NewsAnalysisAgent:
     def __init__(self, groq_api_key: str = None):
         """Initialize the News Analysis Agent with Groq API"""
@@ -30,60 +90,34 @@ class NewsAnalysisAgent:
 
         # Configure CrewAI LLM to Groq (no unsupported provider field)
         self.llm = LLM(
-            model='groq/llama-3.3-70b-versatile',
+            model=_config.NEWS_LLM_MODEL,
             temperature=0.7
         )
         
-    def create_news_agent(self) -> Agent:
-        """Create the news analysis agent using CrewAI"""
+    def _build_agent(self, name: str) -> Agent:
+        # Crews attach themselves and an executor to their agents, so agents are never shared.
+        # Agent.copy() of a prebuilt agent would avoid that but costs several times more than
+        # building one here (benchmarks/bench_news_agents.py), and it copies the LLM client.
         return Agent(
-            role='Financial News Analyst',
-            goal='Analyze and gather relevant financial news for given stock symbols',
-            backstory="""You are an expert financial news analyst with years of experience 
-            in analyzing market trends, company performance, and financial news. You have 
-            a deep understanding of how news affects stock prices and market sentiment. 
-            You can access current financial news and provide comprehensive analysis.""",
+            **AGENT_DEFINITIONS[name],
             verbose=True,
             allow_delegation=False,
             llm=self.llm
         )
     
+    def create_news_agent(self) -> Agent:
+        """Create the news analysis agent using CrewAI"""
+        return self._build_agent('news')
+    
     def create_sentiment_analysis_agent(self) -> Agent:
         """Create the sentiment analysis agent using CrewAI"""
-        return Agent(
-            role='Market Sentiment Analyst',
-            goal='Analyze news sentiment and determine if it is bearish, bullish, or neutral for stock prices',
-            backstory="""You are a specialized market sentiment analyst with deep expertise 
-            in interpreting financial news and determining its impact on stock prices. You 
-            understand market psychology and can accurately classify news sentiment. You 
-            have access to current market data and can provide real-time sentiment analysis.""",
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm
-        )
+        return self._build_agent('sentiment')
     
     def create_headline_agent(self) -> Agent:
         """Create the headline generation agent using CrewAI"""
-        return Agent(
-            role='Financial Headline Writer',
-            goal='Create compelling and accurate headlines from financial news content in three distinct styles',
-            backstory="""You are an expert financial journalist and headline writer with 
-            years of experience in creating engaging, accurate, and informative headlines 
-            for financial news. You specialize in three distinct headline styles:
-            
-            1. BREAKING NEWS: Urgent, time-sensitive headlines that grab immediate attention
-            2. ANALYTICAL INSIGHT: Data-driven headlines that provide market analysis
-            3. STORYTELLING: Narrative headlines that tell the broader market story
-            
-            You understand what makes each style compelling while maintaining journalistic 
-            integrity. You can adapt your writing to capture the essence of financial news 
-            and market movements in different ways for different audiences.""",
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm
-        )
+        return self._build_agent('headline')
     
-    def create_news_analysis_task(self, symbols: List[str]) -> Task:
+    def create_news_analysis_task(self, symbols: List[str], agent: Agent = None) -> Task:
         """Create a task for analyzing news for multiple stocks using CrewAI"""
         return Task(
             description=f"""
@@ -115,11 +149,11 @@ class NewsAnalysisAgent:
                 ]
             }}
             """,
-            agent=self.create_news_agent(),
+            agent=agent or self.create_news_agent(),
             expected_output="JSON formatted news analysis for all provided stock symbols"
         )
     
-    def create_sentiment_analysis_task(self, news_data: Dict[str, Any]) -> Task:
+    def create_sentiment_analysis_task(self, news_data: Dict[str, Any], agent: Agent = None) -> Task:
         """Create a task for sentiment analysis of news data using CrewAI"""
         return Task(
             description=f"""
@@ -148,11 +182,11 @@ class NewsAnalysisAgent:
                 ]
             }}
             """,
-            agent=self.create_sentiment_analysis_agent(),
+            agent=agent or self.create_sentiment_analysis_agent(),
             expected_output="JSON formatted sentiment analysis for all stocks"
         )
     
-    def create_headline_generation_task(self, news_data: Dict[str, Any]) -> Task:
+    def create_headline_generation_task(self, news_data: Dict[str, Any], agent: Agent = None) -> Task:
         """Create a task for generating headlines from news data using CrewAI"""
         return Task(
             description=f"""
@@ -199,76 +233,43 @@ class NewsAnalysisAgent:
                 ]
             }}
             """,
-            agent=self.create_headline_agent(),
+            agent=agent or self.create_headline_agent(),
             expected_output="JSON formatted headlines for all stocks"
         )
     
-    def analyze_portfolio_news(self, portfolio_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze news for all stocks in the portfolio using CrewAI"""
+    def analyze_portfolio_news(self, portfolio_data: Dict[str, Any],
+                               progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Analyze news for all stocks in the portfolio using CrewAI
+        
+        Each symbol is analyzed (and cached) on its own, so portfolios
+        sharing holdings reuse each other's results. progress, if given,
+        is called with each symbol's stage as it completes.
+        """
         try:
-            # Extract stock symbols from portfolio data
-            symbols = []
-            if 'holdings' in portfolio_data:
-                symbols = [holding['symbol'] for holding in portfolio_data['holdings']]
-            elif 'stocks' in portfolio_data:
-                symbols = portfolio_data['stocks']
-            else:
-                raise ValueError("Portfolio data must contain 'holdings' or 'stocks'")
-            
-            if not symbols:
-                return {"error": "No stock symbols found in portfolio data"}
-            
-            # Create the crew for news analysis
-            news_crew = Crew(
-                agents=[self.create_news_agent()],
-                tasks=[self.create_news_analysis_task(symbols)],
-                verbose=True,
-                process=Process.sequential
-            )
-            
-            # Execute the news analysis
-            news_result = news_crew.kickoff()
-            
-            # Parse the news result
-            news_analysis = self._parse_crew_result(news_result)
-            
-            if 'error' in news_analysis:
-                return news_analysis
-            
-            # Create sentiment analysis crew
-            sentiment_crew = Crew(
-                agents=[self.create_sentiment_analysis_agent()],
-                tasks=[self.create_sentiment_analysis_task(news_analysis)],
-                verbose=True,
-                process=Process.sequential
-            )
-            
-            # Execute sentiment analysis
-            sentiment_result = sentiment_crew.kickoff()
-            sentiment_analysis = self._parse_crew_result(sentiment_result)
-            
-            # Create headline generation crew
-            headline_crew = Crew(
-                agents=[self.create_headline_agent()],
-                tasks=[self.create_headline_generation_task(news_analysis)],
-                verbose=True,
-                process=Process.sequential
-            )
-            
-            # Execute headline generation
-            headline_result = headline_crew.kickoff()
-            headline_analysis = self._parse_crew_result(headline_result)
-            
-            # Combine all results
-            combined_result = {
-                "analysis_timestamp": datetime.now().isoformat(),
-                "news_analysis": news_analysis,
-                "sentiment_analysis": sentiment_analysis,
-                "headline_analysis": headline_analysis
+            futures = self.submit_portfolio_news(portfolio_data, progress)
+            if isinstance(futures, dict) and 'error' in futures:
+                return futures
+            wait(futures.values(), timeout=2 * _config.NEWS_STAGE_TIMEOUT)
+            return self.combine_portfolio_news(futures)
+        
+        except Exception as e:
+            logger.error(f"Error in portfolio news analysis: {str(e)}")
+            return {
+                "error": f"Failed to analyze portfolio news: {str(e)}",
+                "analysis_timestamp": datetime.now().isoformat()
             }
-            
-            return combined_result
-                
+    
+    async def analyze_portfolio_news_async(self, portfolio_data: Dict[str, Any],
+                                           progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """analyze_portfolio_news for an event loop: awaits the symbol pool instead of blocking a thread"""
+        try:
+            futures = self.submit_portfolio_news(portfolio_data, progress)
+            if isinstance(futures, dict) and 'error' in futures:
+                return futures
+            await asyncio.wait([asyncio.wrap_future(future) for future in futures.values()],
+                               timeout=2 * _config.NEWS_STAGE_TIMEOUT)
+            return self.combine_portfolio_news(futures)
+        
         except Exception as e:
             logger.error(f"Error in portfolio news analysis: {str(e)}")
             return {
@@ -276,6 +277,240 @@ class NewsAnalysisAgent:
                 "analysis_timestamp": datetime.now().isoformat()
             }
     
+    def submit_portfolio_news(self, portfolio_data: Dict[str, Any],
+                              progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """Start every symbol's analysis on the symbol pool; returns {symbol: future} or an error dict"""
+        # Extract stock symbols from portfolio data
+        symbols = []
+        if 'holdings' in portfolio_data:
+            symbols = [holding['symbol'] for holding in portfolio_data['holdings']]
+        elif 'stocks' in portfolio_data:
+            symbols = portfolio_data['stocks']
+        else:
+            raise ValueError("Portfolio data must contain 'holdings' or 'stocks'")
+        
+        symbols = list(dict.fromkeys(str(symbol).upper().strip() for symbol in symbols if symbol))
+        if not symbols:
+            return {"error": "No stock symbols found in portfolio data"}
+        
+        # A symbol runs the news stage, then sentiment and headlines side by side
+        return {symbol: symbol_executor.submit(self.get_symbol_analysis, symbol, progress) for symbol in symbols}
+    
+    def combine_portfolio_news(self, futures: Dict[str, Any]) -> Dict[str, Any]:
+        """Merge finished symbol analyses into one portfolio-wide result; unfinished ones count as timeouts"""
+        stocks, sentiments, headlines = [], [], []
+        stage_status = {}
+        errors = []
+        for symbol, future in futures.items():
+            if not future.done():
+                errors.append(f"{symbol}: timed out")
+                stage_status[symbol] = {'status': 'timeout', 'cache': 'miss'}
+                continue
+            try:
+                analysis, cached = future.result()
+            except Exception as e:
+                errors.append(f"{symbol}: {str(e)}")
+                stage_status[symbol] = {'status': 'error', 'cache': 'miss'}
+                continue
+            
+            stage_status[symbol] = dict(analysis['stage_status'], cache='hit' if cached else 'miss',
+                                        analyzed_at=analysis['analyzed_at'])
+            if 'error' in analysis:
+                errors.append(f"{symbol}: {analysis['error']}")
+                continue
+            stocks.append(analysis['news'])
+            if analysis.get('sentiment'):
+                sentiments.append(analysis['sentiment'])
+            if analysis.get('headlines'):
+                headlines.append(analysis['headlines'])
+        
+        if not stocks:
+            return {
+                "error": f"Failed to analyze portfolio news: {'; '.join(errors)}",
+                "analysis_timestamp": datetime.now().isoformat()
+            }
+        
+        # Combine all results in the shape of a single portfolio-wide analysis
+        timestamp = datetime.now().isoformat()
+        combined_result = {
+            "analysis_timestamp": timestamp,
+            "news_analysis": {"analysis_timestamp": timestamp, "stocks": stocks},
+            "sentiment_analysis": {"sentiment_analysis_timestamp": timestamp, "sentiments": sentiments},
+            "headline_analysis": {"headlines_timestamp": timestamp, "headlines": headlines},
+            "stage_status": stage_status,
+            "partial": bool(errors) or any(not status.get('complete', False) for status in stage_status.values())
+        }
+        if errors:
+            combined_result["errors"] = errors
+        
+        return combined_result
+    
+    def get_symbol_analysis(self, symbol: str, progress: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """Get the cached analysis for a symbol or run it; returns (analysis, cache hit)"""
+        key = f"news:{symbol}"
+        cached = news_cache.get(key)
+        if cached is not None:
+            self._replay_stages(cached, progress, 'hit')
+            return cached, True
+        
+        attempt = {}
+        
+        def load():
+            attempt['analysis'] = self.analyze_symbol(symbol, progress)
+            # Partial or failed analyses are returned but not cached
+            return attempt['analysis'] if attempt['analysis']['stage_status']['complete'] else None
+        
+        analysis = news_flight.do(key, lambda: news_cache.get_or_load(key, load) or attempt.get('analysis'))
+        if 'analysis' not in attempt:
+            # Another request ran (or had cached) this symbol; report its stages now
+            self._replay_stages(analysis, progress, 'miss')
+        return analysis, False
+    
+    def analyze_symbol(self, symbol: str,
+                       progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Run the news, sentiment and headline stages for one symbol"""
+        timeout = _config.NEWS_STAGE_TIMEOUT
+        stage_status = {}
+        
+        def report(name: str, result: Dict[str, Any], status: Dict[str, Any]) -> None:
+            if progress is not None:
+                entry = None if 'error' in result else self._symbol_entry(result, STAGE_LIST_KEYS[name], symbol)
+                progress(self._stage_event(symbol, name, status, entry, 'miss', result.get('error')))
+        
+        news_analysis = self._run_stages(
+            {'news': lambda: self._run_crew(self.create_news_analysis_task([symbol]), ('news', symbol))},
+            timeout, stage_status, report
+        )['news']
+        
+        if 'error' in news_analysis:
+            stage_status['complete'] = False
+            return {
+                "symbol": symbol,
+                "error": news_analysis['error'],
+                "stage_status": stage_status,
+                "analyzed_at": datetime.now().isoformat()
+            }
+        
+        news = self._symbol_entry(news_analysis, 'stocks', symbol)
+        news_data = {"stocks": [news]}
+        
+        # Sentiment and headlines both depend on the news analysis only
+        results = self._run_stages({
+            'sentiment': lambda: self._run_crew(self.create_sentiment_analysis_task(news_data), ('sentiment', symbol)),
+            'headlines': lambda: self._run_crew(self.create_headline_generation_task(news_data), ('headlines', symbol))
+        }, timeout, stage_status, report)
+        stage_status['complete'] = all(
+            status['status'] == 'ok' for name, status in stage_status.items() if name != 'complete'
+        )
+        
+        return {
+            "symbol": symbol,
+            "news": news,
+            "sentiment": self._symbol_entry(results['sentiment'], 'sentiments', symbol)
+            if 'error' not in results['sentiment'] else None,
+            "headlines": self._symbol_entry(results['headlines'], 'headlines', symbol)
+            if 'error' not in results['headlines'] else None,
+            "stage_status": stage_status,
+            "analyzed_at": datetime.now().isoformat()
+        }
+    
+    @staticmethod
+    def _stage_event(symbol: str, stage: str, status: Dict[str, Any], result: Optional[Dict[str, Any]],
+                     cache: str, error: Optional[str] = None) -> Dict[str, Any]:
+        """Progress payload for one completed stage of a symbol"""
+        event = {'symbol': symbol, 'stage': stage, 'cache': cache, **status, 'result': result}
+        if error:
+            event['error'] = error
+        return event
+    
+    def _replay_stages(self, analysis: Dict[str, Any], progress: Optional[Callable[[Dict[str, Any]], None]],
+                       cache: str) -> None:
+        """Report every stage of an analysis that was produced elsewhere"""
+        if progress is None:
+            return
+        for stage in STAGE_LIST_KEYS:
+            status = analysis['stage_status'].get(stage)
+            if status is not None:
+                error = analysis.get('error') if stage == 'news' else None
+                progress(self._stage_event(analysis['symbol'], stage, status, analysis.get(stage), cache, error))
+    
+    @staticmethod
+    def _symbol_entry(parsed: Dict[str, Any], list_key: str, symbol: str) -> Dict[str, Any]:
+        """Pick the symbol's entry out of a parsed crew result"""
+        entries = parsed.get(list_key)
+        if isinstance(entries, list) and entries:
+            for entry in entries:
+                if isinstance(entry, dict) and str(entry.get('symbol', '')).upper() == symbol:
+                    return entry
+            if isinstance(entries[0], dict):
+                return dict(entries[0], symbol=symbol)
+        # Unstructured output is kept as-is under the symbol
+        return dict(parsed, symbol=symbol)
+    
+    def _run_crew(self, task: Task, stale_key: Optional[tuple] = None) -> Dict[str, Any]:
+        """Kick off a crew for the task's agent and parse its JSON result
+        
+        The kickoff goes through the LLM bulkhead; while the LLM is
+        unavailable the last good result for stale_key is used instead.
+        That fallback is applied outside the response cache so it is never
+        stored under the new prompt.
+        """
+        def kickoff():
+            crew = Crew(
+                agents=[task.agent],
+                tasks=[task],
+                verbose=True,
+                process=Process.sequential
+            )
+            return crew.kickoff()
+
+        def run():
+            return cached_run(self.llm, task.agent, task, lambda: llm_bulkhead.call(kickoff))
+
+        return self._parse_crew_result(run() if stale_key is None else llm_bulkhead.with_last_good(run, stale_key))
+    
+    def _run_stages(self, stages: Dict[str, Callable[[], Dict[str, Any]]], timeout: float,
+                    stage_status: Dict[str, Dict[str, Any]],
+                    on_stage: Optional[Callable[[str, Dict[str, Any], Dict[str, Any]], None]] = None
+                    ) -> Dict[str, Dict[str, Any]]:
+        """Run stages concurrently, each bounded by the same deadline
+        
+        A stage that fails or times out yields an error entry instead of
+        failing the others; stage_status records each outcome and duration.
+        on_stage(name, result, status) is called as each stage settles.
+        """
+        started = time.monotonic()
+        deadline = started + timeout
+        futures = {stage_executor.submit(stage): name for name, stage in stages.items()}
+        results = {}
+        
+        def settle(name: str, result: Dict[str, Any], status: str) -> None:
+            results[name] = result
+            stage_status[name] = {'status': status, 'seconds': round(time.monotonic() - started, 2)}
+            if on_stage is not None:
+                on_stage(name, result, stage_status[name])
+        
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                name = futures[future]
+                try:
+                    settle(name, future.result(), 'ok')
+                except Exception as e:
+                    logger.error(f"News analysis stage '{name}' failed: {str(e)}")
+                    settle(name, {"error": f"{name} stage failed: {str(e)}"}, 'error')
+        
+        for future in pending:
+            # The kickoff cannot be interrupted; it finishes in the background and is discarded
+            future.cancel()
+            name = futures[future]
+            logger.warning(f"News analysis stage '{name}' timed out after {timeout}s")
+            settle(name, {"error": f"{name} stage timed out after {timeout}s"}, 'timeout')
+        return {name: results[name] for name in stages}
+    
     def _parse_crew_result(self, result) -> Dict[str, Any]:
         """Parse crew result and extract JSON"""
         try:
@@ -315,6 +550,22 @@ class NewsAnalysisAgent:
                 "parse_error": str(e)
             }
 
+_shared_agent = None
+_shared_agent_lock = threading.Lock()
+
+def get_shared_news_agent(groq_api_key: str = None) -> NewsAnalysisAgent:
+    """Get the process-wide NewsAnalysisAgent, creating it on first use
+    
+    The agent holds the only LLM client; it is safe to share across request
+    threads because each crew builds its own Agent and Task objects.
+    """
+    global _shared_agent
+    if _shared_agent is None:
+        with _shared_agent_lock:
+            if _shared_agent is None:
+                _shared_agent = NewsAnalysisAgent(groq_api_key)
+    return _shared_agent
+
 def process_portfolio_input(portfolio_input: str) -> Dict[str, Any]:
     """Process portfolio input and return structured JSON"""
     try:
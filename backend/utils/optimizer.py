@@ -0,0 +1,428 @@
+"""
+Long-only portfolio optimization (minimum variance, risk parity, efficient frontier)
+
+Problems are solved with accelerated projected gradient descent over the
+fully invested, per-asset max weight and sector cap constraints, which
+have an exact projection. A turnover budget is then met by trading only
+part of the way from the current weights toward the optimum; the
+objective is convex, so that is the best portfolio along the path.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+
+OBJECTIVES = ('min-variance', 'risk-parity', 'efficient-frontier')
+
+# Smallest weight allowed when the objective needs strictly positive weights
+MIN_POSITIVE_WEIGHT = 1e-6
+
+
+def total_shift(values: np.ndarray, lower: np.ndarray, upper: np.ndarray, total: float,
+                floors: Optional[np.ndarray] = None) -> float:
+    """Shift s with sum(clip(values - max(s, floors), lower, upper)) == total
+
+    The sum is piecewise linear in s, with a kink wherever an asset leaves
+    or reaches a bound, so sorting the kinks gives the exact root.
+    """
+    entering = values - upper
+    leaving = values - lower
+    if floors is None:
+        start = upper.sum()
+    else:
+        start = np.clip(values - floors, lower, upper).sum()
+        entering = np.maximum(entering, floors)
+        leaving = np.maximum(leaving, floors)
+
+    kinks = np.concatenate([entering, leaving])
+    order = np.argsort(kinks, kind='stable')
+    kinks = kinks[order]
+    # Number of assets strictly between their bounds after each kink
+    free = np.cumsum(np.concatenate([np.ones(len(values)), -np.ones(len(values))])[order])
+    sums = start - np.concatenate([[0.0], np.cumsum(free[:-1] * np.diff(kinks))])
+
+    position = int(np.searchsorted(-sums, -total, side='left'))
+    if position == 0:
+        return float(kinks[0])
+    if position == len(kinks):
+        return float(kinks[-1])
+    return float(kinks[position - 1] + (sums[position - 1] - total) / free[position - 1])
+
+
+def project_capped_simplex(values: np.ndarray, lower: np.ndarray, upper: np.ndarray,
+                           total: float = 1.0) -> np.ndarray:
+    """Euclidean projection onto {lower <= w <= upper, sum(w) = total}"""
+    return np.clip(values - total_shift(values, lower, upper, total), lower, upper)
+
+
+class PortfolioConstraints:
+    """Feasible set for long-only, fully invested weights"""
+
+    def __init__(self, size: int, max_weight: float = 1.0, sectors: Optional[List[str]] = None,
+                 sector_caps: Optional[Dict[str, float]] = None, current_weights: Optional[np.ndarray] = None,
+                 max_turnover: Optional[float] = None, min_weight: float = 0.0):
+        self.size = size
+        self.max_weight = float(max_weight)
+        self.lower = np.full(size, float(min_weight))
+        self.upper = np.full(size, self.max_weight)
+        self.sector_groups: List[Tuple[str, np.ndarray, float]] = []
+        if sectors is not None and sector_caps:
+            sector_array = np.array(sectors)
+            for sector, cap in sector_caps.items():
+                members = np.nonzero(sector_array == sector)[0]
+                if len(members):
+                    self.sector_groups.append((sector, members, float(cap)))
+        self.current_weights = current_weights
+        self.max_turnover = max_turnover if current_weights is not None else None
+        self._check_feasible(sectors)
+
+    def _check_feasible(self, sectors: Optional[List[str]]) -> None:
+        if self.size == 0:
+            raise ValueError("No assets to optimize")
+        if self.lower.sum() > 1 + 1e-9 or self.upper.sum() < 1 - 1e-9:
+            raise ValueError(f"maxWeight {self.max_weight} cannot fully invest {self.size} assets")
+        if self.sector_groups:
+            capped = np.zeros(self.size, dtype=bool)
+            reachable = 0.0
+            for _, members, cap in self.sector_groups:
+                capped[members] = True
+                reachable += min(cap, self.upper[members].sum())
+            reachable += self.upper[~capped].sum()
+            if reachable < 1 - 1e-9:
+                raise ValueError("Sector caps and maxWeight cannot fully invest the portfolio")
+
+    @property
+    def signature(self) -> Tuple:
+        """Hashable description used to look up warm starts"""
+        return (
+            self.max_weight,
+            float(self.lower[0]),
+            tuple((sector, cap) for sector, _, cap in self.sector_groups)
+        )
+
+    def _project_allocation(self, values: np.ndarray) -> np.ndarray:
+        if not self.sector_groups:
+            return project_capped_simplex(values, self.lower, self.upper)
+
+        # A sector at its cap shifts by its own amount, so its members never go below that shift
+        floors = np.full(self.size, -np.inf)
+        for _, members, cap in self.sector_groups:
+            floors[members] = total_shift(values[members], self.lower[members], self.upper[members], cap)
+        shift = total_shift(values, self.lower, self.upper, 1.0, floors)
+        return np.clip(values - np.maximum(shift, floors), self.lower, self.upper)
+
+    def project(self, values: np.ndarray) -> np.ndarray:
+        """Project onto the fully invested, max weight and sector cap constraints"""
+        return self._project_allocation(values)
+
+    def limit_turnover(self, weights: np.ndarray) -> np.ndarray:
+        """Move from the current weights toward weights only as far as the turnover budget allows"""
+        if self.max_turnover is None or turnover(weights, self.current_weights) <= self.max_turnover:
+            return weights
+        # Start from the nearest allowed portfolio when the current one breaks the caps
+        start = self.project(self.current_weights)
+        if turnover(start, self.current_weights) >= self.max_turnover:
+            return start
+        low, high = 0.0, 1.0
+        for _ in range(50):
+            fraction = (low + high) / 2
+            if turnover(start + fraction * (weights - start), self.current_weights) <= self.max_turnover:
+                low = fraction
+            else:
+                high = fraction
+        return start + low * (weights - start)
+
+    def violations(self, weights: np.ndarray, tol: float = 1e-4) -> Dict[str, float]:
+        """Constraint violations larger than tol (empty when feasible)"""
+        found = {}
+        over = float(np.max(weights - self.upper))
+        if over > tol:
+            found['maxWeight'] = round(over, 6)
+        for sector, members, cap in self.sector_groups:
+            excess = float(weights[members].sum() - cap)
+            if excess > tol:
+                found[f'sector:{sector}'] = round(excess, 6)
+        if self.max_turnover is not None:
+            excess = turnover(weights, self.current_weights) - self.max_turnover
+            if excess > tol:
+                found['turnover'] = round(float(excess), 6)
+        return found
+
+
+def turnover(weights: np.ndarray, current_weights: np.ndarray) -> float:
+    """One-way turnover between two weight vectors"""
+    return float(np.abs(weights - current_weights).sum() / 2)
+
+
+def projected_gradient(objective: Callable[[np.ndarray], float], gradient: Callable[[np.ndarray], np.ndarray],
+                       project: Callable[[np.ndarray], np.ndarray], start: np.ndarray, step: float,
+                       max_iter: int = 1000, tol: float = 1e-8,
+                       step_growth: float = 1.0) -> Tuple[np.ndarray, int, bool]:
+    """Accelerated projected gradient with backtracking and adaptive restart
+
+    step_growth > 1 lets the step recover after backtracking, for objectives
+    whose curvature varies a lot over the feasible set. Returns the solution,
+    the iterations used and whether it converged.
+    """
+    current = project(start)
+    current_value = objective(current)
+    search = current
+    momentum = 1.0
+    for iteration in range(1, max_iter + 1):
+        search_value = objective(search)
+        if not np.isfinite(search_value):
+            search, search_value, momentum = current, current_value, 1.0
+        direction = gradient(search)
+        while True:
+            candidate = project(search - step * direction)
+            difference = candidate - search
+            candidate_value = objective(candidate)
+            bound = search_value + direction @ difference + difference @ difference / (2 * step)
+            if candidate_value <= bound + 1e-15 or step < 1e-16:
+                break
+            step /= 2
+
+        if candidate_value > current_value and momentum > 1.0:
+            # Momentum overshot; restart from the last accepted point
+            search, momentum = current, 1.0
+            continue
+
+        next_momentum = (1 + np.sqrt(1 + 4 * momentum * momentum)) / 2
+        search = candidate + ((momentum - 1) / next_momentum) * (candidate - current)
+        converged = np.max(np.abs(candidate - current)) < tol
+        current, current_value, momentum = candidate, candidate_value, next_momentum
+        step *= step_growth
+        if converged:
+            return current, iteration, True
+    return current, max_iter, False
+
+
+def equal_risk_contribution(covariance: np.ndarray, tol: float = 1e-10, max_iter: int = 50) -> np.ndarray:
+    """Unconstrained equal risk contribution weights (Newton on the log-barrier form)"""
+    size = len(covariance)
+    budget = np.full(size, 1.0 / size)
+    weights = 1.0 / np.sqrt(np.maximum(np.diag(covariance), 1e-12))
+    weights /= weights.sum()
+    for _ in range(max_iter):
+        gradient = covariance @ weights - budget / weights
+        hessian = covariance + np.diag(budget / (weights * weights))
+        delta = np.linalg.solve(hessian, gradient)
+        # Damp the step so every weight stays positive
+        scale = 1.0
+        shrinking = delta > 0
+        if shrinking.any():
+            scale = min(1.0, 0.95 * float(np.min(weights[shrinking] / delta[shrinking])))
+        weights = weights - scale * delta
+        if np.max(np.abs(gradient)) < tol:
+            break
+    return weights / weights.sum()
+
+
+class PortfolioOptimizer:
+    """Solves optimization problems, warm-starting from recent solutions per universe"""
+
+    def __init__(self, max_warm_starts: int = 256, max_iter: int = 1000, tol: float = 1e-7):
+        self.max_iter = max_iter
+        self.tol = tol
+        self.max_warm_starts = max_warm_starts
+        self._warm_starts: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _warm_start(self, key: Tuple, default: np.ndarray) -> np.ndarray:
+        with self._lock:
+            cached = self._warm_starts.get(key)
+            if cached is not None:
+                self._warm_starts.move_to_end(key)
+        return cached if cached is not None and len(cached) == len(default) else default
+
+    def _remember(self, key: Tuple, weights: np.ndarray) -> None:
+        with self._lock:
+            self._warm_starts[key] = weights
+            self._warm_starts.move_to_end(key)
+            while len(self._warm_starts) > self.max_warm_starts:
+                self._warm_starts.popitem(last=False)
+
+    def _solve(self, key: Tuple, objective, gradient, project, start: np.ndarray,
+               step: float, step_growth: float = 1.0) -> Tuple[np.ndarray, int, bool]:
+        weights, iterations, converged = projected_gradient(
+            objective, gradient, project, self._warm_start(key, start), step, self.max_iter, self.tol,
+            step_growth
+        )
+        self._remember(key, weights)
+        return weights, iterations, converged
+
+    def min_variance(self, covariance: np.ndarray, constraints: PortfolioConstraints, start: np.ndarray,
+                     universe: Tuple = ()) -> Tuple[np.ndarray, int, bool]:
+        """Minimum-variance weights"""
+        lipschitz = 2 * float(np.linalg.eigvalsh(covariance)[-1])
+        return self._solve(
+            (universe, 'min-variance', constraints.signature),
+            lambda w: float(w @ covariance @ w),
+            lambda w: 2 * (covariance @ w),
+            constraints.project,
+            start,
+            1.0 / max(lipschitz, 1e-12)
+        )
+
+    def mean_variance(self, mean: np.ndarray, covariance: np.ndarray, risk_aversion: float,
+                      constraints: PortfolioConstraints, start: np.ndarray,
+                      universe: Tuple = ()) -> Tuple[np.ndarray, int, bool]:
+        """Weights maximizing mean - risk_aversion / 2 * variance"""
+        lipschitz = risk_aversion * float(np.linalg.eigvalsh(covariance)[-1])
+        return self._solve(
+            (universe, ('mean-variance', round(risk_aversion, 6)), constraints.signature),
+            lambda w: float(risk_aversion / 2 * (w @ covariance @ w) - mean @ w),
+            lambda w: risk_aversion * (covariance @ w) - mean,
+            constraints.project,
+            start,
+            1.0 / max(lipschitz, 1e-12)
+        )
+
+    def risk_parity(self, covariance: np.ndarray, constraints: PortfolioConstraints, start: np.ndarray,
+                    universe: Tuple = ()) -> Tuple[np.ndarray, int, bool]:
+        """Equal risk contribution weights, as close as the constraints allow"""
+        target = equal_risk_contribution(covariance)
+        if np.allclose(constraints.project(target), target, atol=1e-9):
+            return target, 0, True
+
+        # Scale the barrier so the unconstrained optimum is the fully invested ERC portfolio
+        strength = float(target @ covariance @ target) / len(target)
+        constraints.lower = np.maximum(constraints.lower, MIN_POSITIVE_WEIGHT)
+
+        def objective(w):
+            if np.any(w <= 0):
+                return np.inf
+            return float(0.5 * (w @ covariance @ w) - strength * np.log(w).sum())
+
+        lipschitz = float(np.linalg.eigvalsh(covariance)[-1]) + strength * len(target) ** 2
+        return self._solve(
+            (universe, 'risk-parity', constraints.signature),
+            objective,
+            lambda w: covariance @ w - strength / w,
+            constraints.project,
+            start,
+            1.0 / lipschitz,
+            step_growth=1.1
+        )
+
+    def efficient_frontier(self, mean: np.ndarray, covariance: np.ndarray, constraints: PortfolioConstraints,
+                           start: np.ndarray, points: int = 12,
+                           universe: Tuple = ()) -> List[Tuple[float, np.ndarray, int, bool]]:
+        """Frontier portfolios from most to least risk-averse, each warm-started from its neighbour"""
+        frontier = []
+        previous = start
+        for risk_aversion in np.geomspace(1000.0, 0.1, points):
+            weights, iterations, converged = self.mean_variance(
+                mean, covariance, float(risk_aversion), constraints, previous, universe
+            )
+            frontier.append((float(risk_aversion), weights, iterations, converged))
+            previous = weights
+        return frontier
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'warm_starts': len(self._warm_starts)}
+
+
+def portfolio_summary(weights: np.ndarray, mean: np.ndarray, covariance: np.ndarray,
+                      risk_free_rate: float) -> Dict[str, float]:
+    """Annualized return, volatility, Sharpe ratio and risk contributions for weights"""
+    variance = float(weights @ covariance @ weights)
+    volatility = float(np.sqrt(max(variance, 0.0)))
+    expected_return = float(mean @ weights)
+    contributions = weights * (covariance @ weights) / variance if variance > 0 else np.zeros_like(weights)
+    return {
+        'expectedReturn': expected_return,
+        'volatility': volatility,
+        'sharpeRatio': (expected_return - risk_free_rate) / volatility if volatility > 0 else 0.0,
+        'riskContributions': contributions
+    }
+
+
+def optimize_weights(symbols: List[str], mean_daily: np.ndarray, covariance_daily: np.ndarray,
+                     current_weights: np.ndarray, objectives: List[str] = OBJECTIVES,
+                     max_weight: float = 1.0, sectors: Optional[List[str]] = None,
+                     sector_caps: Optional[Dict[str, float]] = None, max_turnover: Optional[float] = None,
+                     frontier_points: int = 12, risk_free_rate: float = 0.02,
+                     optimizer: Optional['PortfolioOptimizer'] = None) -> Dict[str, Dict]:
+    """Optimize the universe for each objective from daily return moments
+
+    Returns portfolios keyed by objective ('efficient-frontier' yields the
+    frontier plus its maximum-Sharpe point). Raises ValueError when the
+    constraints are infeasible.
+    """
+    optimizer = optimizer or portfolio_optimizer
+    mean = np.asarray(mean_daily, dtype=float) * TRADING_DAYS
+    covariance = np.asarray(covariance_daily, dtype=float) * TRADING_DAYS
+    universe = tuple(symbols)
+
+    def constraints():
+        return PortfolioConstraints(
+            len(symbols), max_weight, sectors, sector_caps, current_weights, max_turnover
+        )
+
+    def describe(weights, iterations, converged, problem):
+        weights = problem.limit_turnover(weights)
+        summary = portfolio_summary(weights, mean, covariance, risk_free_rate)
+        return {
+            'weights': weights,
+            'iterations': iterations,
+            'converged': converged,
+            'turnover': turnover(weights, current_weights),
+            'violations': problem.violations(weights),
+            **summary
+        }
+
+    results = {}
+    for objective in objectives:
+        started = time.perf_counter()
+        problem = constraints()
+        if objective == 'min-variance':
+            result = describe(*optimizer.min_variance(covariance, problem, current_weights, universe), problem)
+        elif objective == 'risk-parity':
+            result = describe(*optimizer.risk_parity(covariance, problem, current_weights, universe), problem)
+        elif objective == 'efficient-frontier':
+            frontier = [
+                dict(describe(weights, iterations, converged, problem), riskAversion=risk_aversion)
+                for risk_aversion, weights, iterations, converged in optimizer.efficient_frontier(
+                    mean, covariance, problem, current_weights, frontier_points, universe
+                )
+            ]
+            result = dict(max(frontier, key=lambda point: point['sharpeRatio']), frontier=frontier)
+        else:
+            raise ValueError(f"Unknown objective '{objective}'")
+        result['solveTimeMs'] = (time.perf_counter() - started) * 1000
+        results[objective] = result
+    return results
+
+
+def trade_list(symbols: List[str], current_weights: np.ndarray, target_weights: np.ndarray,
+               prices: Dict[str, float], total_value: float, min_trade_value: float = 1.0) -> List[Dict]:
+    """Buys and sells that move the portfolio from the current to the target weights"""
+    trades = []
+    for symbol, current, target in zip(symbols, current_weights, target_weights):
+        value = (target - current) * total_value
+        price = prices.get(symbol)
+        if abs(value) < min_trade_value or not price:
+            continue
+        trades.append({
+            'symbol': symbol,
+            'action': 'buy' if value > 0 else 'sell',
+            'shares': round(abs(value) / price, 4),
+            'value': round(abs(value), 2),
+            'currentWeight': round(float(current), 4),
+            'targetWeight': round(float(target), 4)
+        })
+    return sorted(trades, key=lambda trade: trade['value'], reverse=True)
+
+
+# Process-wide optimizer so repeated requests for a universe start from the last solution
+portfolio_optimizer = PortfolioOptimizer()
@@ -0,0 +1,244 @@
+"""
+Token-bucket rate limiting per client and route group
+
+Every client gets one bucket per route group holding RATE_LIMIT_REQUESTS
+tokens, refilled evenly over RATE_LIMIT_WINDOW seconds. A request takes
+its route's cost in tokens, so LLM-backed routes drain a bucket far
+faster than quote lookups. Buckets live in process memory, or in Redis
+(RATE_LIMIT_BACKEND=redis) so the limits hold across workers.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from typing import Any, Dict, Optional
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+from config import get_current_config
+
+logger = logging.getLogger(__name__)
+
+# Outcome of one check; retry_after is 0 when the request was allowed
+RateLimitDecision = namedtuple('RateLimitDecision', ['allowed', 'limit', 'remaining', 'retry_after', 'group'])
+
+# Never limited: health/status checks, polling of already accepted background
+# jobs, and static lookups (search, trending) that never reach an upstream
+EXEMPT_PREFIXES = ('/api/health', '/api/jobs/', '/api/news/status', '/api/news/health',
+                   '/api/ai/health', '/api/ai/status', '/api/cache/stats', '/api/ai/cache-stats',
+                   '/api/stocks/search', '/api/stocks/trending')
+
+# Route groups by path prefix; anything else is 'default' with a cost of 1
+GROUP_PREFIXES = (
+    ('/api/ai/analyze-', 'llm'),
+    ('/api/portfolio/news-analysis', 'llm'),
+    ('/api/portfolio/complete-analysis', 'llm'),
+    ('/api/stocks/news/', 'llm'),
+    ('/api/portfolio/simulate', 'compute'),
+    ('/api/portfolio/optimize', 'compute')
+)
+
+
+def route_group(path: str) -> Optional[str]:
+    """Route group a path is limited under, or None if it is exempt"""
+    path = path.rstrip('/').lower() or '/'
+    if any(path.startswith(prefix.rstrip('/')) for prefix in EXEMPT_PREFIXES):
+        return None
+    for prefix, group in GROUP_PREFIXES:
+        if path.startswith(prefix):
+            return group
+    return 'default'
+
+
+class MemoryTokenBuckets:
+    """In-process token buckets, dropping the least recently used past max_keys"""
+
+    def __init__(self, capacity: float, refill_rate: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_keys = max(1, max_keys)
+        # key -> (tokens, updated_at); order is least to most recently used
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, cost: float) -> tuple:
+        """Take cost tokens if available; returns (allowed, tokens left, seconds until allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.refill_rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        wait = 0.0 if allowed else (cost - tokens) / self.refill_rate
+        return allowed, tokens, wait
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RedisTokenBuckets:
+    """Token buckets shared by all workers, updated with optimistic Redis transactions"""
+
+    def __init__(self, capacity: float, refill_rate: float, url: str = None,
+                 prefix: str = 'finanalytica:ratelimit:', client=None, max_attempts: int = 5):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("redis package is required for the shared rate limit store")
+            client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+        self.client = client
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+        # An idle bucket is full again after this long, so it can expire
+        self._ttl_ms = int(math.ceil(capacity / refill_rate * 1000))
+
+    def take(self, key: str, cost: float) -> tuple:
+        """Take cost tokens if available; returns (allowed, tokens left, seconds until allowed)"""
+        key = f"{self.prefix}{key}"
+        with self.client.pipeline() as pipe:
+            for _ in range(self.max_attempts):
+                try:
+                    pipe.watch(key)
+                    now = time.time()
+                    state = pipe.hmget(key, 'tokens', 'updated_at')
+                    tokens = float(state[0]) if state[0] is not None else self.capacity
+                    updated_at = float(state[1]) if state[1] is not None else now
+                    tokens = min(self.capacity, tokens + max(now - updated_at, 0) * self.refill_rate)
+                    allowed = tokens >= cost
+                    if allowed:
+                        tokens -= cost
+                    pipe.multi()
+                    pipe.hset(key, mapping={'tokens': tokens, 'updated_at': now})
+                    pipe.pexpire(key, self._ttl_ms)
+                    pipe.execute()
+                    wait = 0.0 if allowed else (cost - tokens) / self.refill_rate
+                    return allowed, tokens, wait
+                except redis.WatchError:
+                    # Another worker updated the bucket between read and write; try again
+                    continue
+        raise RuntimeError(f"bucket {key} is too contended")
+
+    def ping(self) -> bool:
+        try:
+            return bool(self.client.ping())
+        except Exception:
+            return False
+
+
+class RateLimiter:
+    """Per-client, per-route-group token buckets with route cost weights"""
+
+    def __init__(self, buckets, limit: int, costs: Dict[str, float], backend: str = 'memory',
+                 trust_proxy: bool = False):
+        self.buckets = buckets
+        self.limit = limit
+        self.costs = costs
+        self.backend = backend
+        self.trust_proxy = trust_proxy
+        self._stats_lock = threading.Lock()
+        self._allowed = 0
+        self._limited = 0
+        self._errors = 0
+
+    def client_id(self, remote_addr: Optional[str], forwarded_for: Optional[str] = None) -> str:
+        """Identify the client by address, trusting X-Forwarded-For only behind a proxy"""
+        if forwarded_for and self.trust_proxy:
+            return forwarded_for.split(',')[0].strip()
+        return remote_addr or 'unknown'
+
+    def check(self, client: str, path: str) -> Optional[RateLimitDecision]:
+        """Charge the request to its client's bucket; None for exempt routes"""
+        group = route_group(path)
+        if group is None:
+            return None
+        # A cost above the bucket size could never be paid
+        cost = min(self.costs.get(group, 1), self.limit)
+        try:
+            allowed, tokens, wait = self.buckets.take(f"{client}:{group}", cost)
+        except Exception as e:
+            # Fail open: an unreachable shared store must not take the API down
+            logger.warning(f"Rate limit check failed for {client}: {str(e)}")
+            with self._stats_lock:
+                self._errors += 1
+            return None
+
+        with self._stats_lock:
+            if allowed:
+                self._allowed += 1
+            else:
+                self._limited += 1
+        return RateLimitDecision(allowed, self.limit, int(tokens), int(math.ceil(wait)), group)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'backend': self.backend,
+                'limit': self.limit,
+                'costs': self.costs,
+                'allowed': self._allowed,
+                'limited': self._limited,
+                'errors': self._errors
+            }
+
+
+def rate_limit_headers(decision: RateLimitDecision) -> Dict[str, str]:
+    """Headers describing the client's bucket after a check"""
+    headers = {
+        'X-RateLimit-Limit': str(decision.limit),
+        'X-RateLimit-Remaining': str(decision.remaining)
+    }
+    if not decision.allowed:
+        headers['Retry-After'] = str(max(decision.retry_after, 1))
+    return headers
+
+
+def rate_limit_error(decision: RateLimitDecision) -> Dict[str, Any]:
+    """Body of a 429 response"""
+    return {
+        'error': f'Rate limit exceeded, retry in {max(decision.retry_after, 1)} seconds',
+        'retry_after': max(decision.retry_after, 1)
+    }
+
+
+def build_rate_limiter(config_class) -> Optional[RateLimiter]:
+    """Create the configured limiter, or None when rate limiting is disabled
+
+    The shared store falls back to per-process buckets when Redis is not
+    installed or not reachable.
+    """
+    if not config_class.RATE_LIMIT_ENABLED:
+        return None
+
+    limit = max(1, config_class.RATE_LIMIT_REQUESTS)
+    refill_rate = limit / max(1, config_class.RATE_LIMIT_WINDOW)
+    costs = {
+        'default': 1,
+        'compute': config_class.RATE_LIMIT_COMPUTE_COST,
+        'llm': config_class.RATE_LIMIT_LLM_COST
+    }
+    if config_class.RATE_LIMIT_BACKEND == 'redis':
+        try:
+            buckets = RedisTokenBuckets(limit, refill_rate, config_class.REDIS_URL,
+                                        prefix=f"{config_class.CACHE_KEY_PREFIX}ratelimit:")
+            if not buckets.ping():
+                raise RuntimeError(f"cannot reach {config_class.REDIS_URL}")
+            return RateLimiter(buckets, limit, costs, backend='redis',
+                               trust_proxy=config_class.RATE_LIMIT_TRUST_PROXY)
+        except Exception as e:
+            logger.warning(f"Shared rate limit store disabled, limiting per process: {str(e)}")
+
+    return RateLimiter(MemoryTokenBuckets(limit, refill_rate), limit, costs,
+                       trust_proxy=config_class.RATE_LIMIT_TRUST_PROXY)
+
+
+rate_limiter = build_rate_limiter(get_current_config())
@@ -0,0 +1,199 @@
+"""
+Returns-based portfolio risk metrics
+"""
+
+import logging
+from statistics import NormalDist
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.backtest import BENCHMARK_SYMBOL, load_close_matrix
+from utils.covariance import covariance_cache
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+RISK_FREE_RATE = 0.02
+COVARIANCE_WINDOW = TRADING_DAYS
+
+EMPTY_RISK_METRICS = {
+    'volatility': 0.0,
+    'sharpeRatio': 0.0,
+    'beta': 0.0,
+    'maxDrawdown': 0.0,
+    'var95': 0.0,
+    'cvar95': 0.0,
+    'var95Parametric': 0.0,
+    'cvar95Parametric': 0.0
+}
+
+
+def clean_closes(closes: pd.DataFrame) -> pd.DataFrame:
+    """Forward-fill holidays, drop series without data and rows before all series start"""
+    closes = closes.ffill().dropna(axis=1, how='all')
+    return closes[closes.notna().all(axis=1)]
+
+
+# Shortest yfinance period covering a number of calendar days, for incremental loads
+UPDATE_PERIODS = ((28, '1mo'), (88, '3mo'), (180, '6mo'))
+
+
+def update_period(since: pd.Timestamp, period: str) -> str:
+    """Shortest period whose bars reach back to since, or period itself"""
+    # A week of slack covers weekends and holidays before since
+    days = (pd.Timestamp.now().normalize() - pd.Timestamp(since)).days + 7
+    return next((update for limit, update in UPDATE_PERIODS if days <= limit), period)
+
+
+def load_returns(symbols: List[str], period: str = '1y', since: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """Gap-free daily simple returns (date x symbol) for the symbols, from since onwards when given"""
+    closes = clean_closes(load_close_matrix(symbols, update_period(since, period) if since is not None else period))
+    returns = closes.pct_change().iloc[1:]
+    return returns[returns.index >= since] if since is not None else returns
+
+
+def return_moments(symbols: List[str], period: str = '1y') -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Mean daily returns and their covariance from the shared covariance cache
+
+    Returns the symbols that had history alongside their moments.
+    """
+    estimate = covariance_cache.get(symbols, lambda universe, since: load_returns(universe, period, since),
+                                    window=COVARIANCE_WINDOW)
+    available = [symbol for symbol in symbols if symbol in estimate.index]
+    if estimate.count < 2 or not available:
+        return [], np.zeros(0), np.zeros((0, 0))
+    return available, estimate.mean(available), estimate.covariance(available)
+
+
+def max_drawdown(values: np.ndarray) -> float:
+    """Largest peak-to-trough decline of a value path (as a negative fraction)"""
+    if len(values) == 0:
+        return 0.0
+    peaks = np.maximum.accumulate(values)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        drawdowns = np.where(peaks > 0, values / peaks - 1.0, 0.0)
+    return float(drawdowns.min())
+
+
+def value_at_risk(returns: np.ndarray, confidence: float = 0.95) -> Dict[str, float]:
+    """Historical and parametric (normal) one-day VaR and CVaR, as negative returns"""
+    if len(returns) == 0:
+        return {'var': 0.0, 'cvar': 0.0, 'var_parametric': 0.0, 'cvar_parametric': 0.0}
+
+    alpha = 1.0 - confidence
+    var = float(np.quantile(returns, alpha))
+    tail = returns[returns <= var]
+    cvar = float(tail.mean()) if len(tail) else var
+
+    mu = float(returns.mean())
+    sigma = float(returns.std(ddof=1)) if len(returns) > 1 else 0.0
+    normal = NormalDist()
+    z = normal.inv_cdf(alpha)
+    var_parametric = mu + z * sigma
+    cvar_parametric = mu - sigma * normal.pdf(z) / alpha
+
+    return {'var': var, 'cvar': cvar, 'var_parametric': var_parametric, 'cvar_parametric': cvar_parametric}
+
+
+def portfolio_risk(returns: np.ndarray, weights: np.ndarray, benchmark_returns: Optional[np.ndarray] = None,
+                   values: Optional[np.ndarray] = None, covariance: Optional[np.ndarray] = None,
+                   risk_free_rate: float = RISK_FREE_RATE, confidence: float = 0.95) -> Dict[str, float]:
+    """Risk metrics for a weighted portfolio over a (days x assets) daily return matrix
+
+    covariance may be supplied (daily, assets x assets) to avoid recomputing it;
+    values is the portfolio value path used for drawdown, defaulting to the
+    compounded portfolio returns.
+    """
+    weights = np.asarray(weights, dtype=float)
+    portfolio_returns = returns @ weights
+
+    if covariance is None:
+        covariance = np.cov(returns, rowvar=False, ddof=1) if len(returns) > 1 else np.zeros((len(weights),) * 2)
+    covariance = np.atleast_2d(covariance)
+    daily_variance = float(weights @ covariance @ weights)
+    volatility = float(np.sqrt(max(daily_variance, 0.0) * TRADING_DAYS))
+
+    annual_return = float(portfolio_returns.mean() * TRADING_DAYS) if len(portfolio_returns) else 0.0
+    sharpe = (annual_return - risk_free_rate) / volatility if volatility > 0 else 0.0
+
+    beta = 0.0
+    if benchmark_returns is not None and len(benchmark_returns) > 1:
+        market_variance = float(np.var(benchmark_returns, ddof=1))
+        if market_variance > 0:
+            beta = float(np.cov(portfolio_returns, benchmark_returns, ddof=1)[0, 1] / market_variance)
+
+    if values is None:
+        values = np.cumprod(1.0 + portfolio_returns)
+    tail = value_at_risk(portfolio_returns, confidence)
+
+    return {
+        'volatility': volatility,
+        'sharpeRatio': sharpe,
+        'beta': beta,
+        'maxDrawdown': max_drawdown(np.asarray(values, dtype=float)),
+        'var95': tail['var'],
+        'cvar95': tail['cvar'],
+        'var95Parametric': tail['var_parametric'],
+        'cvar95Parametric': tail['cvar_parametric']
+    }
+
+
+def holdings_risk(stock_data: List[Dict], period: str = '1y', benchmark: str = BENCHMARK_SYMBOL,
+                  closes: Optional[pd.DataFrame] = None) -> Dict[str, float]:
+    """Risk metrics for priced holdings (symbol, quantity, value) from daily history
+
+    closes, if given, is a preloaded close matrix covering the holdings and
+    the benchmark over the period.
+    """
+    positions = {}
+    for stock in stock_data:
+        symbol = str(stock['symbol']).upper().strip()
+        position = positions.setdefault(symbol, {'quantity': 0.0, 'value': 0.0})
+        position['quantity'] += float(stock.get('quantity', 0) or 0)
+        position['value'] += float(stock.get('value', 0) or 0)
+
+    total_value = sum(position['value'] for position in positions.values())
+    if not positions or total_value <= 0:
+        return dict(EMPTY_RISK_METRICS)
+
+    if closes is None:
+        closes = load_close_matrix(list(positions) + [benchmark], period)
+    else:
+        closes = closes.reindex(columns=list(positions) + [benchmark])
+    closes = clean_closes(closes)
+    symbols = [symbol for symbol in positions if symbol in closes.columns]
+    if len(closes) < 3 or not symbols:
+        logger.warning("Not enough price history to compute risk metrics")
+        return dict(EMPTY_RISK_METRICS)
+
+    missing = [symbol for symbol in positions if symbol not in symbols]
+    if missing:
+        logger.warning(f"No price history for {missing}, excluding from risk metrics")
+
+    prices = closes[symbols].to_numpy()
+    returns = prices[1:] / prices[:-1] - 1.0
+    values = np.array([positions[symbol]['value'] for symbol in symbols])
+    weights = values / values.sum() if values.sum() > 0 else np.full(len(symbols), 1.0 / len(symbols))
+    quantities = np.array([positions[symbol]['quantity'] for symbol in symbols])
+
+    benchmark_returns = None
+    if benchmark in closes.columns:
+        bench = closes[benchmark].to_numpy()
+        benchmark_returns = bench[1:] / bench[:-1] - 1.0
+
+    # Reuse the shared covariance estimate when another request already built it
+    returns_frame = pd.DataFrame(returns, index=closes.index[1:], columns=symbols)
+
+    def loader(universe: List[str], since: Optional[pd.Timestamp]) -> pd.DataFrame:
+        if set(universe).issubset(symbols):
+            frame = returns_frame[universe]
+            return frame[frame.index >= since] if since is not None else frame
+        return load_returns(universe, period, since)
+
+    estimate = covariance_cache.get(symbols, loader, window=COVARIANCE_WINDOW)
+    covariance = estimate.covariance(symbols) if all(symbol in estimate.index for symbol in symbols) else None
+
+    metrics = portfolio_risk(returns, weights, benchmark_returns, values=prices @ quantities, covariance=covariance)
+    return {key: round(value, 3) for key, value in metrics.items()}
@@ -0,0 +1,220 @@
+"""
+Monte Carlo projection of portfolio value
+"""
+
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config import get_current_config
+
+logger = logging.getLogger(__name__)
+
+MONTHS_PER_YEAR = 12
+TRADING_DAYS_PER_MONTH = 21
+PERCENTILES = (5, 25, 50, 75, 95)
+
+# Paths are seeded in fixed blocks so results do not depend on the worker count or memory budget
+BLOCK_PATHS = 1000
+
+# Below this many draws a process pool costs more than it saves
+PARALLEL_MIN_DRAWS = 2_000_000
+
+# Portfolio form time horizons mapped to simulated years
+TIME_HORIZON_YEARS = {
+    'short-term': 3,
+    'medium-term': 10,
+    'long-term': 20
+}
+
+
+def horizon_years(time_horizon, default: int = TIME_HORIZON_YEARS['long-term']) -> int:
+    """Convert a time horizon label or number of years to whole years"""
+    if isinstance(time_horizon, str) and time_horizon in TIME_HORIZON_YEARS:
+        return TIME_HORIZON_YEARS[time_horizon]
+    try:
+        years = int(float(time_horizon))
+    except (TypeError, ValueError):
+        return default
+    return years if years > 0 else default
+
+
+def monthly_parameters(mean: np.ndarray, covariance: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Monthly log-return drift and Cholesky factor from daily return moments"""
+    covariance = np.atleast_2d(np.asarray(covariance, dtype=float)) * TRADING_DAYS_PER_MONTH
+    drift = np.asarray(mean, dtype=float) * TRADING_DAYS_PER_MONTH - 0.5 * np.diag(covariance)
+    try:
+        factor = np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        # Short or collinear histories give a singular matrix; clip to the nearest PSD one
+        eigenvalues, eigenvectors = np.linalg.eigh((covariance + covariance.T) / 2)
+        eigenvalues = np.clip(eigenvalues, 1e-12, None)
+        factor = np.linalg.cholesky((eigenvectors * eigenvalues) @ eigenvectors.T)
+    return drift, factor
+
+
+def chunk_paths(steps: int, assets: int, memory_budget: int) -> int:
+    """Paths per chunk so the (paths x steps x assets) draws fit in the budget"""
+    # The normal draws and the correlated returns are alive at the same time
+    per_path = 2 * steps * max(assets, 1) * 8
+    return int(max(1, min(BLOCK_PATHS, memory_budget // per_path)))
+
+
+def simulate_block(seed: np.random.SeedSequence, paths: int, drift: np.ndarray, factor: np.ndarray,
+                   weights: np.ndarray, initial_value: float, contribution: float,
+                   steps: int, chunk: int) -> np.ndarray:
+    """Simulate one seeded block of monthly value paths (paths x steps, float32)
+
+    Each month the portfolio is rebalanced to weights, grows by the
+    correlated asset returns and then receives the contribution.
+    """
+    rng = np.random.default_rng(seed)
+    values = np.empty((paths, steps), dtype=np.float32)
+    for start in range(0, paths, chunk):
+        count = min(chunk, paths - start)
+        # Drawing along the first axis keeps the stream identical for any chunk size
+        draws = rng.standard_normal((count, steps, len(weights)))
+        returns = draws @ factor.T
+        del draws
+        returns += drift
+        np.exp(returns, out=returns)
+        growth = returns @ weights
+
+        value = np.full(count, float(initial_value))
+        for step in range(steps):
+            value = value * growth[:, step] + contribution
+            values[start:start + count, step] = value
+    return values
+
+
+def _block_args(paths: int, seed: int) -> List[Tuple[np.random.SeedSequence, int]]:
+    sizes = [BLOCK_PATHS] * (paths // BLOCK_PATHS)
+    if paths % BLOCK_PATHS:
+        sizes.append(paths % BLOCK_PATHS)
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+
+class MonteCarloSimulator:
+    """Runs seeded simulation blocks in a lazily created process pool"""
+
+    def __init__(self, workers: int = 1, memory_budget_mb: int = 64):
+        self.workers = max(1, workers)
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _reset_pool(self) -> None:
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def max_paths(self, years: int) -> int:
+        """Most paths whose monthly values (float32, kept for the summary) fit in the memory budget"""
+        return self.memory_budget // (max(int(years), 1) * MONTHS_PER_YEAR * 4)
+
+    def simulate(self, mean: np.ndarray, covariance: np.ndarray, weights: np.ndarray,
+                 initial_value: float, monthly_contribution: float, years: int,
+                 paths: int, seed: int) -> np.ndarray:
+        """Simulate monthly portfolio values (paths x months) from daily return moments"""
+        if paths > self.max_paths(years):
+            raise ValueError(f"{paths} paths over {years} years exceed the simulation memory budget")
+        drift, factor = monthly_parameters(mean, covariance)
+        weights = np.asarray(weights, dtype=float)
+        steps = int(years) * MONTHS_PER_YEAR
+        chunk = chunk_paths(steps, len(weights), self.memory_budget)
+        blocks = _block_args(paths, seed)
+        common = (drift, factor, weights, initial_value, monthly_contribution, steps, chunk)
+
+        if self.workers > 1 and len(blocks) > 1 and paths * steps * len(weights) >= PARALLEL_MIN_DRAWS:
+            try:
+                pool = self._get_pool()
+                futures = [pool.submit(simulate_block, block_seed, size, *common) for block_seed, size in blocks]
+                return np.concatenate([future.result() for future in futures])
+            except (BrokenProcessPool, OSError) as e:
+                logger.warning(f"Simulation process pool unavailable, running in-process: {str(e)}")
+                self._reset_pool()
+
+        return np.concatenate([simulate_block(block_seed, size, *common) for block_seed, size in blocks])
+
+    def shutdown(self) -> None:
+        self._reset_pool()
+
+
+def summarize_paths(values: np.ndarray, initial_value: float, monthly_contribution: float,
+                    goals: Iterable[float] = (), percentiles: Iterable[int] = PERCENTILES) -> Dict:
+    """Percentile bands, goal probabilities and downside risk of simulated paths"""
+    percentiles = list(percentiles)
+    paths, steps = values.shape
+    months = np.arange(steps + 1)
+    invested = initial_value + monthly_contribution * months
+
+    bands = np.percentile(values, percentiles, axis=0)
+    band_records = [
+        {
+            'month': 0,
+            'invested': round(float(initial_value), 2),
+            **{f'p{percentile}': round(float(initial_value), 2) for percentile in percentiles}
+        }
+    ]
+    for step in range(steps):
+        record = {'month': step + 1, 'invested': round(float(invested[step + 1]), 2)}
+        for position, percentile in enumerate(percentiles):
+            record[f'p{percentile}'] = round(float(bands[position, step]), 2)
+        band_records.append(record)
+
+    terminal = values[:, -1].astype(float)
+    total_invested = float(invested[-1])
+    goal_targets = list(goals) or [total_invested, 2 * total_invested]
+    goal_records = [
+        {
+            'target': round(float(target), 2),
+            'probability': round(float((terminal >= target).mean()), 4)
+        }
+        for target in goal_targets
+    ]
+
+    def downside(final: np.ndarray, basis: float) -> Dict[str, float]:
+        var_level = float(np.percentile(final, 5))
+        tail = final[final <= var_level]
+        return {
+            'var95': round(max(basis - var_level, 0.0), 2),
+            'cvar95': round(max(basis - float(tail.mean()), 0.0), 2) if len(tail) else 0.0,
+            'probabilityOfLoss': round(float((final < basis).mean()), 4)
+        }
+
+    one_year = min(MONTHS_PER_YEAR, steps) - 1
+    return {
+        'paths': paths,
+        'months': steps,
+        'totalInvested': round(total_invested, 2),
+        'bands': band_records,
+        'terminal': {
+            'mean': round(float(terminal.mean()), 2),
+            **{f'p{percentile}': round(float(np.percentile(terminal, percentile)), 2) for percentile in percentiles}
+        },
+        'goals': goal_records,
+        'risk': {
+            'horizon': downside(terminal, total_invested),
+            'oneYear': downside(values[:, one_year].astype(float), float(invested[one_year + 1]))
+        }
+    }
+
+
+_config = get_current_config()
+
+# Process-wide simulator; the pool is only started on the first large simulation
+simulator = MonteCarloSimulator(
+    workers=_config.SIMULATION_WORKERS,
+    memory_budget_mb=_config.SIMULATION_MEMORY_MB
+)
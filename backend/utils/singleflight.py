@@ -0,0 +1,111 @@
+"""
+Request coalescing for duplicate concurrent upstream calls
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Call:
+    """A single in-flight execution that other callers can wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and share its outcome
+
+    Callers arriving while a call for the same key is running block until
+    it finishes and receive the same result (or exception).
+    """
+
+    def __init__(self, name: str = 'default'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._executions = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Execute fn for key, or wait for the execution already in flight"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self._executions += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result
+
+    def stats(self) -> Dict[str, Any]:
+        """Return how many calls ran and how many were coalesced onto them"""
+        with self._lock:
+            total = self._executions + self._coalesced
+            return {
+                'name': self.name,
+                'executions': self._executions,
+                'coalesced': self._coalesced,
+                'coalesce_rate': round(self._coalesced / total, 4) if total else 0.0,
+                'in_flight': len(self._calls)
+            }
+
+
+class AsyncSingleFlight:
+    """Coroutine counterpart of SingleFlight for use on one event loop
+
+    Concurrent awaiters of the same key share one task; cancelling an
+    awaiter does not cancel the shared call.
+    """
+
+    def __init__(self, name: str = 'default'):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self._executions = 0
+        self._coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await fn() for key, or the call already in flight"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._executions += 1
+            task.add_done_callback(lambda _, key=key: self._calls.pop(key, None))
+        else:
+            self._coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self._executions + self._coalesced
+        return {
+            'name': self.name,
+            'executions': self._executions,
+            'coalesced': self._coalesced,
+            'coalesce_rate': round(self._coalesced / total, 4) if total else 0.0,
+            'in_flight': len(self._calls)
+        }
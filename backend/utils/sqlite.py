@@ -0,0 +1,22 @@
+"""
+Helpers shared by the SQLite-backed stores (bar store, LLM response cache)
+"""
+
+import os
+from typing import Optional
+
+
+def sqlite_path(database_url: str, base_dir: Optional[str] = None) -> str:
+    """Turn a sqlite:/// URL into a filesystem path, relative paths resolved against base_dir"""
+    if database_url.startswith('sqlite:///'):
+        path = database_url[len('sqlite:///'):]
+    elif database_url.startswith('sqlite://'):
+        path = database_url[len('sqlite://'):] or ':memory:'
+    else:
+        raise ValueError(f"Expected a sqlite:/// URL, got {database_url}")
+    # The stores open one connection per thread, and each would get its own empty in-memory database
+    if path == ':memory:':
+        raise ValueError(f"In-memory SQLite is not supported, use a file path: {database_url}")
+    if base_dir is None:
+        return path
+    return os.path.join(base_dir, os.path.expanduser(path))
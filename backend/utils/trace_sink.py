@@ -0,0 +1,197 @@
+"""
+Bounded, off-thread sink for raw LLM responses kept for debugging
+
+Request threads only sample and enqueue; a background thread renders the
+trace into an in-memory ring buffer and, when a log path is configured,
+appends it as a JSON line to a size-rotated log whose rotated files are
+gzip-compressed.
+"""
+
+import gzip
+import itertools
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import get_current_config
+
+logger = logging.getLogger(__name__)
+
+# Result attributes worth keeping besides the text (CrewOutput / TaskOutput)
+_RESULT_FIELDS = ('token_usage', 'agent', 'name', 'output_format')
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def build_trace_log(path: str, max_bytes: int, backups: int) -> logging.Logger:
+    """Logger writing one JSON trace per line, rotating into gzip files"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups,
+                                                   encoding='utf-8')
+    handler.namer = lambda name: f"{name}.gz"
+    handler.rotator = _gzip_rotator
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    trace_log = logging.getLogger(f"{__name__}.file")
+    trace_log.handlers = [handler]
+    trace_log.setLevel(logging.INFO)
+    trace_log.propagate = False
+    return trace_log
+
+
+def render_trace(trace_id: str, kind: str, created: float, result: Any, text: Optional[str],
+                 context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Turn a raw result into a JSON-ready trace record"""
+    text = str(result) if text is None else text
+    fields = {}
+    for name in _RESULT_FIELDS:
+        value = getattr(result, name, None)
+        if value is not None:
+            fields[name] = value if isinstance(value, (str, int, float, bool)) else str(value)
+    return {
+        'id': trace_id,
+        'kind': kind,
+        'timestamp': datetime.fromtimestamp(created).isoformat(),
+        'type': type(result).__name__,
+        'context': context or {},
+        'fields': fields,
+        'size': len(text),
+        'content': text
+    }
+
+
+class TraceSink:
+    """Sampled ring buffer of recent traces, filled by a background writer thread"""
+
+    def __init__(self, capacity: int = 200, sample_rate: float = 1.0, queue_size: int = 1000,
+                 log_path: Optional[str] = None, log_max_bytes: int = 10 * 1024 * 1024,
+                 log_backups: int = 5):
+        self.capacity = max(1, capacity)
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.log_path = log_path or None
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._traces: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+        self._log = None
+        if self.log_path:
+            try:
+                self._log = build_trace_log(self.log_path, log_max_bytes, log_backups)
+            except OSError as e:
+                logger.warning(f"Trace log disabled, keeping traces in memory only: {str(e)}")
+                self.log_path = None
+        self._recorded = 0
+        self._sampled_out = 0
+        self._dropped = 0
+        self._write_errors = 0
+        self._start_writer()
+        # Threads do not survive fork (gunicorn preload); give each child its own writer
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _start_writer(self) -> None:
+        self._writer = threading.Thread(target=self._drain, name='trace-sink', daemon=True)
+        self._writer.start()
+
+    def _after_fork(self) -> None:
+        # The parent's queue and lock may reference its writer thread, so start clean
+        self._queue = queue.Queue(maxsize=self._queue.maxsize)
+        self._lock = threading.Lock()
+        self._start_writer()
+
+    def record(self, kind: str, result: Any, text: Optional[str] = None,
+               context: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Queue a trace and return its id, or None if it was sampled out or dropped"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            with self._lock:
+                self._sampled_out += 1
+            return None
+
+        created = time.time()
+        trace_id = f"{kind}_{datetime.fromtimestamp(created).strftime('%Y%m%d_%H%M%S')}_{next(self._sequence)}"
+        try:
+            self._queue.put_nowait((trace_id, kind, created, result, text, context))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return None
+        return trace_id
+
+    def _drain(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                trace = render_trace(*item)
+                with self._lock:
+                    self._traces[trace['id']] = trace
+                    while len(self._traces) > self.capacity:
+                        self._traces.popitem(last=False)
+                    self._recorded += 1
+                if self._log is not None:
+                    self._log.info(json.dumps(trace, default=str))
+            except Exception as e:
+                with self._lock:
+                    self._write_errors += 1
+                logger.warning(f"Could not record trace {item[0]}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self, timeout: float = 5) -> bool:
+        """Wait until queued traces are rendered; returns False on timeout"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of buffered traces, newest first"""
+        with self._lock:
+            return [
+                {key: trace[key] for key in ('id', 'kind', 'timestamp', 'type', 'size', 'context')}
+                for trace in reversed(self._traces.values())
+            ]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._traces.get(trace_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'buffered': len(self._traces),
+                'capacity': self.capacity,
+                'sample_rate': self.sample_rate,
+                'recorded': self._recorded,
+                'sampled_out': self._sampled_out,
+                'dropped': self._dropped,
+                'write_errors': self._write_errors,
+                'pending': self._queue.qsize(),
+                'log_path': self.log_path
+            }
+
+
+_config = get_current_config()
+
+# Process-wide sink for raw AI responses
+trace_sink = TraceSink(
+    capacity=_config.AI_TRACE_CAPACITY,
+    sample_rate=_config.AI_TRACE_SAMPLE_RATE,
+    log_path=_config.AI_TRACE_LOG_PATH,
+    log_max_bytes=_config.AI_TRACE_LOG_MAX_BYTES,
+    log_backups=_config.AI_TRACE_LOG_BACKUPS
+)